@@ -1,12 +1,14 @@
-from typing import Generator
+from typing import Generator, Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from app.db.database import SessionLocal
 from app.core import security
 from app.models.user import User
+from app.utils.pricing import PriceResolver
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
 
 # database session
@@ -42,6 +44,16 @@ def get_current_active_user(
     return current_user
 
 
+# get current active user when a token is sent, None for guests
+def get_current_user_optional(
+    db: Session = Depends(get_db),
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+) -> Optional[User]:
+    if not token:
+        return None
+    return get_current_active_user(get_current_user(db, token))
+
+
 # get current active superuser
 def get_current_active_superuser(
     current_user: User = Depends(get_current_user),
@@ -51,3 +63,8 @@ def get_current_active_superuser(
             status_code=400, detail="The user doesn't have enough privileges"
         )
     return current_user
+
+
+# price resolver, FastAPI caches dependencies so one is shared per request
+def get_price_resolver(db: Session = Depends(get_db)) -> PriceResolver:
+    return PriceResolver(db)
@@ -0,0 +1,123 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import date, timedelta
+from app.api.deps import get_current_active_superuser, get_db
+from app.schemas.analytics import (
+    ProductSales,
+    SalesBreakdown,
+    SalesRollupRebuild,
+    SalesSeries,
+)
+from app.schemas.order import OrderStatus, PaymentMethod
+from app.utils.analytics import (
+    ANALYTICS_INTERVAL_REGEX,
+    DEFAULT_SALES_STATUSES,
+    TOP_PRODUCTS_SORT_REGEX,
+    rebuild_sales_rollups,
+    sales_breakdown,
+    sales_series,
+    top_products,
+)
+
+router = APIRouter()
+
+# Longest range a single analytics request may cover
+MAX_RANGE_DAYS = 3 * 366
+
+
+def date_range(
+    date_from: Optional[date] = None, date_to: Optional[date] = None
+) -> tuple:
+    """Inclusive date range, the last 30 days by default"""
+    date_to = date_to or date.today()
+    date_from = date_from or date_to - timedelta(days=29)
+    if date_from > date_to:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="date_from must not be after date_to",
+        )
+    if (date_to - date_from).days >= MAX_RANGE_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Date range must be shorter than {MAX_RANGE_DAYS} days",
+        )
+    return date_from, date_to
+
+
+@router.get(
+    "/sales",
+    response_model=SalesSeries,
+    summary="Get revenue, order count and average order value over time",
+    status_code=status.HTTP_200_OK,
+)
+def get_sales(
+    dates: tuple = Depends(date_range),
+    interval: str = Query("day", regex=ANALYTICS_INTERVAL_REGEX),
+    order_status: Optional[List[OrderStatus]] = Query(
+        None, alias="status", description="Defaults to all but cancelled"
+    ),
+    payment_method: Optional[PaymentMethod] = None,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    return sales_series(
+        db,
+        *dates,
+        interval=interval,
+        statuses=(
+            [s.value for s in order_status] if order_status else DEFAULT_SALES_STATUSES
+        ),
+        payment_method=payment_method.value if payment_method else None,
+    )
+
+
+@router.get(
+    "/sales/breakdown",
+    response_model=List[SalesBreakdown],
+    summary="Get sales by order status and payment method",
+    status_code=status.HTTP_200_OK,
+)
+def get_sales_breakdown(
+    dates: tuple = Depends(date_range),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    return sales_breakdown(db, *dates)
+
+
+@router.get(
+    "/products",
+    response_model=List[ProductSales],
+    summary="Get best selling products",
+    status_code=status.HTTP_200_OK,
+)
+def get_top_products(
+    dates: tuple = Depends(date_range),
+    sort: str = Query("revenue", regex=TOP_PRODUCTS_SORT_REGEX),
+    limit: int = Query(20, gt=0, le=100),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    return top_products(db, *dates, sort=sort, limit=limit)
+
+
+@router.post(
+    "/rebuild",
+    response_model=SalesRollupRebuild,
+    summary="Rebuild sales rollups from orders",
+    status_code=status.HTTP_200_OK,
+)
+def rebuild_rollups(
+    dates: tuple = Depends(date_range),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    try:
+        orders = rebuild_sales_rollups(db, *dates)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return {"date_from": dates[0], "date_to": dates[1], "orders": orders}
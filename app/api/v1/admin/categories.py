@@ -5,6 +5,7 @@ from typing import List
 from app.api.deps import get_current_active_superuser, get_db
 from app.models.category import Category
 from app.schemas.category import CategoryCreate, CategoryUpdate, CategoryResponse
+from app.utils.promotions import promotion_index
 
 router = APIRouter()
 
@@ -93,6 +94,8 @@ async def create_category(
         db.add(db_category)
         db.commit()
         db.refresh(db_category)
+        # Category promotions cover descendants, which may have changed
+        promotion_index.invalidate()
 
         return {"message": "Create category successfully", "data": db_category}
     except Exception as e:
@@ -157,6 +160,8 @@ async def update_category(
 
         db.commit()
         db.refresh(db_category)
+        # Category promotions cover descendants, which may have changed
+        promotion_index.invalidate()
 
         return {"message": "Update category successfully", "data": db_category}
     except Exception as e:
@@ -193,6 +198,7 @@ async def delete_category(
     try:
         db.delete(db_category)
         db.commit()
+        promotion_index.invalidate()
         return {"message": "Delete category successfully", "data": {"id": category_id}}
     except Exception as e:
         db.rollback()
@@ -0,0 +1,42 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_current_active_superuser, get_db
+from app.utils.email_queue import email_queue_stats, retry_failed_emails
+
+router = APIRouter()
+
+
+@router.get(
+    "/stats",
+    response_model=dict,
+    summary="Get email queue depth and send latency",
+    status_code=status.HTTP_200_OK,
+)
+def get_email_queue_stats(
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    return {
+        "message": "Get email queue stats successfully",
+        "data": email_queue_stats(db),
+    }
+
+
+@router.post(
+    "/retry",
+    response_model=dict,
+    summary="Retry failed emails",
+    status_code=status.HTTP_200_OK,
+)
+def retry_emails(
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    try:
+        retried = retry_failed_emails(db)
+        db.commit()
+        return {"message": "Retry emails successfully", "data": retried}
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
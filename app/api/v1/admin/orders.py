@@ -1,69 +1,323 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy import select
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Optional
 from datetime import datetime
-import uuid
-from app.models.order import Order, OrderItem
-from app.api.deps import get_current_active_superuser, get_db
-from app.schemas.order import OrderCreate, OrderInDB, OrderUpdate, OrderItemCreate
+from decimal import Decimal
+from itertools import chain, groupby
+from app.core.ids import generate_order_number
+from app.models.order import Order, OrderItem, coerce_order_enums
+from app.models.user import Address
+from app.models.order import OrderStatus as OrderStatusModel
+from app.models.order import PaymentStatus as PaymentStatusModel
+from app.utils.idempotency import IdempotentRoute
+from app.utils.inventory import InsufficientStockError, reserve_stock
+from app.utils.pricing import PriceMismatchError, PriceResolver
+from app.utils.promotions import (
+    CouponError,
+    PromotionUnavailableError,
+    price_promotions,
+    redeem_promotions,
+)
+from app.utils.rates import (
+    ShippingUnavailableError,
+    quote_rates,
+    rate_cache,
+    record_order_taxes,
+)
+from app.utils.order_lifecycle import (
+    apply_order_changes,
+    order_state,
+    transition_error,
+    transition_orders,
+)
+from app.api.deps import get_current_active_superuser, get_db, get_price_resolver
+from app.schemas.order import (
+    OrderCreate,
+    OrderInDB,
+    OrderList,
+    OrderUpdate,
+    OrderItemCreate,
+    OrderStatus,
+    OrderTransition,
+    OrderTransitionResponse,
+    PaymentStatus,
+)
+from app.utils.export import EXPORT_FORMAT_REGEX, export_response, stream_query
+from app.utils.order_archive import ORDER_TABLES, find_order, paginate_orders
 
-router = APIRouter()
+# Order creation honours the Idempotency-Key header
+router = APIRouter(route_class=IdempotentRoute)
 
+# Columns included in order exports
+ORDER_EXPORT_COLUMNS = [
+    "id",
+    "order_number",
+    "user_id",
+    "status",
+    "payment_status",
+    "payment_method",
+    "total_amount",
+    "shipping_fee",
+    "shipping_address_id",
+    "billing_address_id",
+    "is_active",
+    "created_at",
+    "updated_at",
+]
 
-def generate_order_number():
-    return f"ORD-{uuid.uuid4().hex[:8].upper()}"
+ORDER_ITEM_EXPORT_COLUMNS = [
+    "product_id",
+    "product_name",
+    "product_sku",
+    "quantity",
+    "price",
+    "total_price",
+]
+
+
+def order_filters(
+    status: Optional[OrderStatus] = None,
+    payment_status: Optional[PaymentStatus] = None,
+    user_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    model=Order,
+) -> list:
+    """Build filter conditions shared by order list and export
+
+    model is Order or OrderArchive, both have the same columns.
+    """
+    conditions = []
+    if date_from:
+        conditions.append(model.created_at >= date_from)
+    if date_to:
+        conditions.append(model.created_at < date_to)
+    if status:
+        conditions.append(model.status == OrderStatusModel(status.value))
+    if payment_status:
+        conditions.append(
+            model.payment_status == PaymentStatusModel(payment_status.value)
+        )
+    if user_id:
+        conditions.append(model.user_id == user_id)
+    return conditions
 
 
 @router.post("/", response_model=OrderInDB)
 def create_order(
     order: OrderCreate,
     db: Session = Depends(get_db),
+    pricing: PriceResolver = Depends(get_price_resolver),
     current_user=Depends(get_current_active_superuser),
 ):
+    # Price all lines from current product data
+    try:
+        lines = pricing.price_lines(order.items)
+    except PriceMismatchError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=e.errors)
+
+    # Apply automatic promotions and the coupon to the priced lines
+    try:
+        discounts = price_promotions(db, pricing, lines, order.coupon_code)
+    except CouponError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    discount = sum((promotion.amount for promotion in discounts), Decimal(0))
+
+    # Shipping and tax from the cached rate tables
+    address = db.get(Address, order.shipping_address_id)
+    if not address:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Shipping address not found",
+        )
+    try:
+        rates = quote_rates(
+            rate_cache.get(db),
+            pricing,
+            lines,
+            sum((line.total_price for line in lines), Decimal(0)) - discount,
+            address.country_id,
+            address.state_id,
+            fallback_shipping_fee=order.shipping_fee,
+        )
+    except ShippingUnavailableError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
     # Create new order
     db_order = Order(
         user_id=current_user.id,
         order_number=generate_order_number(),
-        shipping_fee=order.shipping_fee,
-        payment_method=order.payment_method,
-        shipping_address_id=order.shipping_address_id,
-        billing_address_id=order.billing_address_id,
+        shipping_fee=rates.shipping_fee,
+        **coerce_order_enums(
+            order.dict(exclude={"items", "coupon_code", "shipping_fee"})
+        ),
     )
     db.add(db_order)
 
     # Add order items
-    total_amount = 0
-    for item in order.items:
-        total_price = item.price * item.quantity
-        total_amount += total_price
+    total_amount = Decimal(0)
+    for line in lines:
+        total_amount += line.total_price
 
         db_item = OrderItem(
             order=db_order,
-            product_id=item.product_id,
-            product_name=item.product_name,
-            product_sku=item.product_sku,
-            quantity=item.quantity,
-            price=item.price,
-            total_price=total_price,
+            product_id=line.product_id,
+            product_name=line.product_name,
+            product_sku=line.product_sku,
+            quantity=line.quantity,
+            price=line.price,
+            total_price=line.total_price,
         )
         db.add(db_item)
 
     # Update order total
-    db_order.total_amount = total_amount + order.shipping_fee
+    db_order.total_amount = (
+        total_amount - discount + rates.shipping_fee + rates.tax_amount
+    )
+
+    # Reserve stock and promotion uses in the same transaction as the order
+    db.flush()
+    try:
+        reserve_stock(
+            db,
+            db_order.id,
+            [(line.product_id, line.variant_id, line.quantity) for line in lines],
+        )
+        redeem_promotions(db, db_order.id, discounts)
+    except (InsufficientStockError, PromotionUnavailableError) as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    record_order_taxes(db, db_order.id, rates.taxes)
 
+    apply_order_changes(db, [(None, order_state(db_order))])
     db.commit()
     db.refresh(db_order)
     return db_order
 
 
-@router.get("/", response_model=List[OrderInDB])
+@router.get("/", response_model=OrderList)
 def get_orders(
-    skip: int = 0,
-    limit: int = 15,
+    cursor: Optional[str] = None,
+    limit: int = Query(15, gt=0, le=100),
+    status: Optional[OrderStatus] = None,
+    payment_status: Optional[PaymentStatus] = None,
+    user_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
     db: Session = Depends(get_db),
     current_user=Depends(get_current_active_superuser),
 ):
-    return db.query(Order).offset(skip).limit(limit).all()
+    try:
+        orders, next_cursor = paginate_orders(
+            db,
+            lambda model: order_filters(
+                status, payment_status, user_id, date_from, date_to, model
+            ),
+            cursor,
+            limit,
+        )
+    except ValueError as e:
+        # The status filter shadows fastapi.status here
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "message": "Get orders successfully",
+        "data": orders,
+        "next_cursor": next_cursor,
+        "limit": limit,
+    }
+
+
+@router.get("/export")
+def export_orders(
+    format: str = Query("csv", regex=EXPORT_FORMAT_REGEX),
+    status: Optional[OrderStatus] = None,
+    payment_status: Optional[PaymentStatus] = None,
+    user_id: Optional[int] = None,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    current_user=Depends(get_current_active_superuser),
+):
+    def export_rows(order_model, item_model):
+        order_columns = [order_model.__table__.c[name] for name in ORDER_EXPORT_COLUMNS]
+        item_columns = [
+            item_model.__table__.c[name].label(f"item_{name}")
+            for name in ORDER_ITEM_EXPORT_COLUMNS
+        ]
+        statement = (
+            select(*order_columns, *item_columns)
+            .outerjoin(item_model, item_model.order_id == order_model.id)
+            .where(
+                *order_filters(
+                    status, payment_status, user_id, date_from, date_to, order_model
+                )
+            )
+            .order_by(order_model.id, item_model.id)
+        )
+        return stream_query(statement)
+
+    # Live orders first, then archived ones
+    rows = chain.from_iterable(
+        export_rows(order_model, item_model) for order_model, item_model in ORDER_TABLES
+    )
+
+    if format == "csv":
+        # One CSV line per order item
+        columns = ORDER_EXPORT_COLUMNS + [
+            f"item_{name}" for name in ORDER_ITEM_EXPORT_COLUMNS
+        ]
+        return export_response(rows, columns, format, "orders")
+
+    def orders_with_items():
+        # Rows arrive ordered by order id, so each order is one contiguous group
+        for _, group in groupby(rows, key=lambda row: row["id"]):
+            group = list(group)
+            order = {name: group[0][name] for name in ORDER_EXPORT_COLUMNS}
+            order["items"] = [
+                {name: row[f"item_{name}"] for name in ORDER_ITEM_EXPORT_COLUMNS}
+                for row in group
+                if row["item_product_id"] is not None
+            ]
+            yield order
+
+    return export_response(orders_with_items(), ORDER_EXPORT_COLUMNS, format, "orders")
+
+
+@router.post(
+    "/transitions",
+    response_model=OrderTransitionResponse,
+    summary="Change status of many orders",
+    status_code=status.HTTP_200_OK,
+)
+def transition_order_statuses(
+    transition: OrderTransition,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    try:
+        results, changes = transition_orders(
+            db,
+            transition.order_ids,
+            status=(
+                OrderStatusModel(transition.status.value) if transition.status else None
+            ),
+            payment_status=(
+                PaymentStatusModel(transition.payment_status.value)
+                if transition.payment_status
+                else None
+            ),
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return {
+        "message": "Transition orders successfully",
+        "updated": len(changes),
+        "results": results,
+    }
 
 
 @router.get("/{order_id}", response_model=OrderInDB)
@@ -72,7 +326,7 @@ def get_order(
     db: Session = Depends(get_db),
     current_user=Depends(get_current_active_superuser),
 ):
-    order = db.query(Order).filter(Order.id == order_id).first()
+    order = find_order(db, lambda model: [model.id == order_id])
     if not order:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Order not found"
@@ -87,18 +341,26 @@ def update_order(
     db: Session = Depends(get_db),
     current_user=Depends(get_current_active_superuser),
 ):
-    db_order = db.query(Order).filter(Order.id == order_id).first()
+    # Locked so concurrent changes check their transition against this one
+    db_order = db.query(Order).filter(Order.id == order_id).with_for_update().first()
     if not db_order:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Order not found"
         )
 
     # Update order fields
-    order_data = order_update.dict(exclude_unset=True)
+    before = order_state(db_order)
+    order_data = coerce_order_enums(order_update.dict(exclude_unset=True))
     for field, value in order_data.items():
         setattr(db_order, field, value)
 
     db_order.updated_at = datetime.utcnow()
+    after = order_state(db_order)
+    error = transition_error(before, after)
+    if error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error)
+
+    apply_order_changes(db, [(before, after)])
     db.commit()
     db.refresh(db_order)
     return db_order
@@ -110,13 +372,17 @@ def delete_order(
     db: Session = Depends(get_db),
     current_user=Depends(get_current_active_superuser),
 ):
-    db_order = db.query(Order).filter(Order.id == order_id).first()
+    # Locked so concurrent changes check their transition against this one
+    db_order = db.query(Order).filter(Order.id == order_id).with_for_update().first()
     if not db_order:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Order not found"
         )
 
     # Soft delete
+    before = order_state(db_order)
     db_order.is_active = False
     db_order.updated_at = datetime.utcnow()
+    after = order_state(db_order)
+    apply_order_changes(db, [(before, after)])
     db.commit()
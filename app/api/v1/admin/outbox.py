@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from app.api.deps import get_current_active_superuser, get_db
+from app.utils.outbox import outbox_stats, retry_failed_events
+
+router = APIRouter()
+
+
+@router.get(
+    "/stats",
+    response_model=dict,
+    summary="Get outbox backlog and dispatch lag",
+    status_code=status.HTTP_200_OK,
+)
+def get_outbox_stats(
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    return {"message": "Get outbox stats successfully", "data": outbox_stats(db)}
+
+
+@router.post(
+    "/retry",
+    response_model=dict,
+    summary="Retry failed outbox events",
+    status_code=status.HTTP_200_OK,
+)
+def retry_outbox_events(
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    try:
+        retried = retry_failed_events(db)
+        db.commit()
+        return {"message": "Retry outbox events successfully", "data": retried}
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
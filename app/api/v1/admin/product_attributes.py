@@ -1,7 +1,10 @@
+from collections import defaultdict
 from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 from typing import List
 from datetime import datetime
+from itertools import product as cartesian_product
 from app.api.deps import get_current_active_superuser, get_db
 from app.schemas.product import (
     ProductAttribute,
@@ -10,13 +13,23 @@ from app.schemas.product import (
     ProductVariant,
     ProductVariantCreate,
     ProductVariantUpdate,
+    ProductVariantBulkCreate,
+    ProductVariantBulkResult,
+    ProductVariantResponse,
 )
+from app.models.product import Product as ProductModel
 from app.models.product import ProductAttribute as ProductAttributeModel
 from app.models.product import ProductVariant as ProductVariantModel
 from app.models.product import ProductVariantAttribute as ProductVariantAttributeModel
+from app.utils.variant_index import variant_index, make_key
 
 router = APIRouter()
 
+# Maximum number of variants generated by one bulk request
+MAX_BULK_VARIANTS = 1000
+# Length of the variant SKU column
+MAX_VARIANT_SKU_LENGTH = ProductVariantModel.sku.type.length
+
 
 # Product Attribute Routes
 @router.post("/", response_model=ProductAttribute, status_code=status.HTTP_201_CREATED)
@@ -29,6 +42,7 @@ def create_product_attribute(
     db.add(db_attribute)
     db.commit()
     db.refresh(db_attribute)
+    variant_index.refresh(db, db_attribute.product_id)
     return db_attribute
 
 
@@ -79,6 +93,7 @@ def update_product_attribute(
 
     db.commit()
     db.refresh(db_attribute)
+    variant_index.refresh(db, db_attribute.product_id)
     return db_attribute
 
 
@@ -96,8 +111,10 @@ def delete_product_attribute(
     if not db_attribute:
         raise HTTPException(status_code=404, detail="Attribute not found")
 
+    product_id = db_attribute.product_id
     db.delete(db_attribute)
     db.commit()
+    variant_index.refresh(db, product_id)
     return None
 
 
@@ -126,9 +143,175 @@ def create_product_variant(
 
     db.commit()
     db.refresh(db_variant)
+    variant_index.refresh(db, db_variant.product_id)
     return db_variant
 
 
+@router.post(
+    "/variants/bulk",
+    response_model=ProductVariantBulkResult,
+    status_code=status.HTTP_201_CREATED,
+)
+def bulk_create_product_variants(
+    bulk: ProductVariantBulkCreate,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    # Locked so concurrent requests for a product do not both create a
+    # combination they found missing
+    product = (
+        db.query(ProductModel)
+        .filter(ProductModel.id == bulk.product_id)
+        .with_for_update()
+        .first()
+    )
+    if not product:
+        raise HTTPException(status_code=404, detail="Product not found")
+
+    combinations_count = 1
+    for group in bulk.attribute_groups:
+        combinations_count *= len(set(group))
+    if combinations_count > MAX_BULK_VARIANTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many combinations ({combinations_count}), "
+            f"the maximum is {MAX_BULK_VARIANTS}",
+        )
+
+    # Load all referenced attributes in one query
+    attribute_ids = {attr_id for group in bulk.attribute_groups for attr_id in group}
+    attributes = {
+        attr.id: attr
+        for attr in db.query(ProductAttributeModel)
+        .filter(
+            ProductAttributeModel.id.in_(attribute_ids),
+            ProductAttributeModel.product_id == bulk.product_id,
+        )
+        .all()
+    }
+    missing = sorted(attribute_ids - attributes.keys())
+    if missing:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Attributes {missing} not found for product {bulk.product_id}",
+        )
+
+    # Combinations that already have a variant are skipped, read from the
+    # database since the cached index leaves out inactive variants and
+    # products and may be stale in other workers
+    variant_attribute_ids = defaultdict(list)
+    for variant_id, attr_id in (
+        db.query(
+            ProductVariantAttributeModel.variant_id,
+            ProductVariantAttributeModel.attribute_id,
+        )
+        .join(
+            ProductVariantModel,
+            ProductVariantModel.id == ProductVariantAttributeModel.variant_id,
+        )
+        .filter(ProductVariantModel.product_id == bulk.product_id)
+        .all()
+    ):
+        variant_attribute_ids[variant_id].append(attr_id)
+    existing_keys = {make_key(ids) for ids in variant_attribute_ids.values()}
+
+    variants_data = []
+    skipped = []
+    for position, combination in enumerate(
+        cartesian_product(*[sorted(set(group)) for group in bulk.attribute_groups]),
+        start=1,
+    ):
+        key = make_key(combination)
+        if key in existing_keys:
+            skipped.append(list(key))
+            continue
+
+        combination_attrs = [attributes[attr_id] for attr_id in combination]
+        values = {
+            "sku": product.sku,
+            "name": product.name,
+            "index": position,
+            "values": "-".join(
+                attr.value.upper().replace(" ", "") for attr in combination_attrs
+            ),
+        }
+        values.update({attr.name: attr.value for attr in combination_attrs})
+        try:
+            sku = bulk.sku_template.format_map(values)
+            name = bulk.name_template.format_map(
+                {**values, "values": " / ".join(a.value for a in combination_attrs)}
+            )
+        except (KeyError, AttributeError, IndexError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=f"Invalid template: {e}")
+        if not sku or len(sku) > MAX_VARIANT_SKU_LENGTH:
+            raise HTTPException(
+                status_code=400,
+                detail=f"SKU template produces SKU {sku!r}, SKUs must be 1 to "
+                f"{MAX_VARIANT_SKU_LENGTH} characters",
+            )
+
+        variants_data.append(
+            {
+                "product_id": bulk.product_id,
+                "name": name[:100],
+                "sku": sku,
+                "price": bulk.price or product.price,
+                "stock": bulk.stock,
+                "currency": bulk.currency or product.currency,
+                "is_active": bulk.is_active,
+                "attribute_ids": key,
+            }
+        )
+
+    # Check SKU uniqueness in one query
+    skus = [data["sku"] for data in variants_data]
+    if len(skus) != len(set(skus)):
+        raise HTTPException(
+            status_code=400, detail="SKU template produces duplicate SKUs"
+        )
+    if skus:
+        conflicts = [
+            sku
+            for (sku,) in db.query(ProductVariantModel.sku)
+            .filter(ProductVariantModel.sku.in_(skus))
+            .all()
+        ]
+        if conflicts:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Variants with SKUs {sorted(conflicts)} already exist",
+            )
+
+    try:
+        # Insert variants in batches, then all variant attributes at once
+        db_variants = [
+            ProductVariantModel(
+                **{k: v for k, v in data.items() if k != "attribute_ids"}
+            )
+            for data in variants_data
+        ]
+        db.add_all(db_variants)
+        db.flush()
+
+        variant_attributes = [
+            {"variant_id": db_variant.id, "attribute_id": attr_id}
+            for db_variant, data in zip(db_variants, variants_data)
+            for attr_id in data["attribute_ids"]
+        ]
+        if variant_attributes:
+            db.execute(insert(ProductVariantAttributeModel), variant_attributes)
+
+        # Serialize before commit so expired instances are not reloaded one by one
+        created = [ProductVariantResponse.model_validate(v) for v in db_variants]
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    variant_index.refresh(db, bulk.product_id)
+    return {"created": created, "skipped": skipped}
+
+
 @router.get("/variants/", response_model=List[ProductVariant])
 def list_product_variants(
     skip: int = 0,
@@ -204,6 +387,7 @@ def update_product_variant(
 
     db.commit()
     db.refresh(db_variant)
+    variant_index.refresh(db, db_variant.product_id)
     return db_variant
 
 
@@ -227,4 +411,5 @@ def delete_product_variant(
     # Soft delete
     db_variant.deleted_at = datetime.utcnow()
     db.commit()
+    variant_index.refresh(db, db_variant.product_id)
     return None
@@ -1,21 +1,97 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, Query, File, UploadFile
+from sqlalchemy import select
+from sqlalchemy.orm import Session, undefer
 from typing import List, Optional
 from datetime import datetime
 
 from app.api.deps import get_current_active_superuser, get_db
-from app.models.product import Product
+from app.models.product import Product, ProductVariant
 from app.schemas.product import (
     ProductCreate,
     ProductUpdate,
     ProductResponse,
     ProductList,
+    ProductImportReport,
+    ProductBulkUpdate,
+    ProductBulkUpdateResult,
+    StockShardConfig,
+    StockShardSummary,
 )
 from app.models.category import Category
 from app.models.brand import Brand
+from app.utils.product_import import (
+    DEFAULT_BATCH_SIZE,
+    SUPPORTED_FORMATS,
+    detect_format,
+    import_products,
+)
+from app.utils.export import EXPORT_FORMAT_REGEX, export_response, stream_query
+from app.utils.bulk_update import update_by_sku
+from app.utils.inventory import (
+    disable_stock_shards,
+    pop_sharded_stock,
+    rebalance_stock_shards,
+    set_stock,
+    stock_shard_summary,
+)
+from app.core.events import PRODUCT_CHANGED
+from app.utils.outbox import enqueue_event, enqueue_events
+from app.utils.product_listing import (
+    BESTSELLING_WINDOW_REGEX,
+    PRODUCT_SORT_REGEX,
+    apply_product_sort,
+    filter_min_rating,
+)
 
 router = APIRouter()
 
+# Columns included in product exports
+PRODUCT_EXPORT_COLUMNS = [
+    "id",
+    "name",
+    "slug",
+    "sku",
+    "price",
+    "discount_price",
+    "currency",
+    "stock",
+    "category_id",
+    "brand_id",
+    "short_description",
+    "description",
+    "weight",
+    "width",
+    "height",
+    "depth",
+    "seo_title",
+    "seo_description",
+    "seo_keywords",
+    "is_featured",
+    "is_active",
+    "created_at",
+    "updated_at",
+    "deleted_at",
+]
+
+
+def product_filters(
+    category_id: Optional[int] = None,
+    brand_id: Optional[int] = None,
+    is_active: Optional[bool] = None,
+    search: Optional[str] = None,
+) -> list:
+    """Build filter conditions shared by product list and export"""
+    conditions = []
+    if category_id:
+        conditions.append(Product.category_id == category_id)
+    if brand_id:
+        conditions.append(Product.brand_id == brand_id)
+    if is_active is not None:
+        conditions.append(Product.is_active == is_active)
+    if search:
+        conditions.append(Product.name.ilike(f"%{search}%"))
+    return conditions
+
 
 @router.get(
     "/",
@@ -30,22 +106,24 @@ async def get_products(
     brand_id: Optional[int] = None,
     is_active: Optional[bool] = None,
     search: Optional[str] = None,
+    sort: Optional[str] = Query(None, regex=PRODUCT_SORT_REGEX),
+    window: str = Query("30d", regex=BESTSELLING_WINDOW_REGEX),
+    min_rating: Optional[float] = Query(None, ge=1, le=5),
     db: Session = Depends(get_db),
     current_user=Depends(get_current_active_superuser),
 ):
-    query = db.query(Product)
-
     # Apply filters
-    if category_id:
-        query = query.filter(Product.category_id == category_id)
-    if brand_id:
-        query = query.filter(Product.brand_id == brand_id)
-    if is_active is not None:
-        query = query.filter(Product.is_active == is_active)
-    if search:
-        query = query.filter(Product.name.ilike(f"%{search}%"))
+    query = (
+        db.query(Product)
+        .options(undefer(Product.available_stock))
+        .filter(*product_filters(category_id, brand_id, is_active, search))
+    )
+    if min_rating:
+        query = filter_min_rating(query, min_rating)
 
     total = query.count()
+    if sort:
+        query = apply_product_sort(query, sort, window)
     products = query.offset(skip).limit(limit).all()
 
     return {
@@ -57,6 +135,38 @@ async def get_products(
     }
 
 
+@router.get(
+    "/export",
+    summary="Export products",
+    status_code=status.HTTP_200_OK,
+)
+def export_products(
+    format: str = Query("csv", regex=EXPORT_FORMAT_REGEX),
+    category_id: Optional[int] = None,
+    brand_id: Optional[int] = None,
+    is_active: Optional[bool] = None,
+    search: Optional[str] = None,
+    current_user=Depends(get_current_active_superuser),
+):
+    # Sharded products keep most of their stock outside Product.stock
+    columns = [
+        (
+            Product.available_stock.label(name)
+            if name == "stock"
+            else Product.__table__.c[name]
+        )
+        for name in PRODUCT_EXPORT_COLUMNS
+    ]
+    statement = (
+        select(*columns)
+        .where(*product_filters(category_id, brand_id, is_active, search))
+        .order_by(Product.id)
+    )
+    return export_response(
+        stream_query(statement), PRODUCT_EXPORT_COLUMNS, format, "products"
+    )
+
+
 @router.get(
     "/{product_id}",
     response_model=ProductResponse,
@@ -68,7 +178,12 @@ async def get_product(
     db: Session = Depends(get_db),
     current_user=Depends(get_current_active_superuser),
 ):
-    product = db.query(Product).filter(Product.id == product_id).first()
+    product = (
+        db.query(Product)
+        .options(undefer(Product.available_stock))
+        .filter(Product.id == product_id)
+        .first()
+    )
     if not product:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -140,6 +255,9 @@ async def create_product(
                 db_attr = ProductAttribute(**attr_data)
                 db.add(db_attr)
 
+        enqueue_event(
+            db, PRODUCT_CHANGED, {"product_id": db_product.id, "action": "created"}
+        )
         db.commit()
         db.refresh(db_product)
 
@@ -149,6 +267,92 @@ async def create_product(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
 
 
+@router.post(
+    "/import",
+    response_model=ProductImportReport,
+    summary="Import products from CSV or JSONL",
+    status_code=status.HTTP_200_OK,
+)
+def import_products_file(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, regex="^(csv|jsonl)$"),
+    batch_size: int = Query(DEFAULT_BATCH_SIZE, gt=0, le=5000),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    fmt = format or detect_format(file.filename)
+    if fmt not in SUPPORTED_FORMATS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported import format: {fmt}",
+        )
+
+    # The upload is spooled to disk, rows are parsed from it incrementally
+    report = import_products(db, file.file, fmt, batch_size)
+    return report.to_dict()
+
+
+@router.patch(
+    "/bulk",
+    response_model=ProductBulkUpdateResult,
+    summary="Bulk update product and variant prices and stock by SKU",
+    status_code=status.HTTP_200_OK,
+)
+def bulk_update_products(
+    bulk_update: ProductBulkUpdate,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    now = datetime.utcnow()
+    product_updates = [item.model_dump() for item in bulk_update.products]
+    try:
+        # Stock of sharded products is spread over their shards, before
+        # update_by_sku so the shards are locked first as reservations do
+        sharded_stock = pop_sharded_stock(db, product_updates)
+        for product_id, stock in sorted(sharded_stock.items()):
+            set_stock(db, product_id, stock)
+
+        updated_products, unknown_product_skus, rejected_product_skus = update_by_sku(
+            db,
+            Product,
+            product_updates,
+            ("price", "discount_price", "stock"),
+            now,
+            returning=("sku", "id"),
+        )
+        updated_variants, unknown_variant_skus, _ = update_by_sku(
+            db,
+            ProductVariant,
+            [item.model_dump() for item in bulk_update.variants],
+            ("price", "stock"),
+            now,
+            returning=("sku", "product_id"),
+        )
+        product_ids = {row.id for row in updated_products} | {
+            row.product_id for row in updated_variants
+        }
+        enqueue_events(
+            db,
+            PRODUCT_CHANGED,
+            [
+                {"product_id": product_id, "action": "updated"}
+                for product_id in sorted(product_ids)
+            ],
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return {
+        "updated_products": len(updated_products),
+        "updated_variants": len(updated_variants),
+        "unknown_product_skus": unknown_product_skus,
+        "unknown_variant_skus": unknown_variant_skus,
+        "rejected_product_skus": rejected_product_skus,
+    }
+
+
 @router.put(
     "/{product_id}",
     response_model=ProductResponse,
@@ -202,9 +406,16 @@ async def update_product(
 
         # Update product fields
         update_data = product_update.model_dump(exclude_unset=True)
+        stock = update_data.pop("stock", None)
+        if stock is not None:
+            # Sharded products get the stock spread over their shards
+            set_stock(db, product_id, stock)
         for key, value in update_data.items():
             setattr(db_product, key, value)
 
+        enqueue_event(
+            db, PRODUCT_CHANGED, {"product_id": product_id, "action": "updated"}
+        )
         db.commit()
         db.refresh(db_product)
 
@@ -237,9 +448,104 @@ async def delete_product(
         # Set deleted_at timestamp instead of actual deletion
         db_product.deleted_at = datetime.utcnow()
         db_product.is_active = False
+        enqueue_event(
+            db, PRODUCT_CHANGED, {"product_id": product_id, "action": "deleted"}
+        )
         db.commit()
 
         return {"message": "Delete product successfully", "data": {"id": product_id}}
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+def get_product_or_404(db: Session, product_id: int) -> Product:
+    db_product = db.query(Product).filter(Product.id == product_id).first()
+    if not db_product:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Product with ID {product_id} not found",
+        )
+    return db_product
+
+
+@router.get(
+    "/{product_id}/stock-shards",
+    response_model=StockShardSummary,
+    summary="Get product stock shards",
+    status_code=status.HTTP_200_OK,
+)
+def get_stock_shards(
+    product_id: int,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    get_product_or_404(db, product_id)
+    return stock_shard_summary(db, product_id)
+
+
+@router.put(
+    "/{product_id}/stock-shards",
+    response_model=StockShardSummary,
+    summary="Enable or resize product stock shards",
+    status_code=status.HTTP_200_OK,
+)
+def enable_stock_shards(
+    product_id: int,
+    config: StockShardConfig,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    get_product_or_404(db, product_id)
+    try:
+        rebalance_stock_shards(db, product_id, config.shard_count)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return stock_shard_summary(db, product_id)
+
+
+@router.post(
+    "/{product_id}/stock-shards/rebalance",
+    response_model=StockShardSummary,
+    summary="Rebalance product stock shards",
+    status_code=status.HTTP_200_OK,
+)
+def rebalance_product_stock_shards(
+    product_id: int,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    get_product_or_404(db, product_id)
+    try:
+        rebalance_stock_shards(db, product_id)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return stock_shard_summary(db, product_id)
+
+
+@router.delete(
+    "/{product_id}/stock-shards",
+    response_model=StockShardSummary,
+    summary="Disable product stock shards",
+    status_code=status.HTTP_200_OK,
+)
+def disable_product_stock_shards(
+    product_id: int,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    get_product_or_404(db, product_id)
+    try:
+        disable_stock_shards(db, product_id)
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return stock_shard_summary(db, product_id)
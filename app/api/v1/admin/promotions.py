@@ -0,0 +1,240 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from pydantic import ValidationError
+from sqlalchemy import or_
+from sqlalchemy.orm import Session, selectinload
+from typing import Optional
+
+from app.api.deps import get_current_active_superuser, get_db
+from app.models.promotion import (
+    OrderDiscount,
+    Promotion,
+    PromotionTarget,
+    PromotionTargetType,
+    PromotionType,
+)
+from app.schemas.promotion import (
+    PromotionCreate,
+    PromotionResponse,
+    PromotionUpdate,
+)
+from app.utils.promotions import promotion_index
+
+router = APIRouter()
+
+
+def get_promotion_or_404(db: Session, promotion_id: int) -> Promotion:
+    promotion = (
+        db.query(Promotion)
+        .options(selectinload(Promotion.targets))
+        .filter(Promotion.id == promotion_id)
+        .first()
+    )
+    if not promotion:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Promotion with ID {promotion_id} not found",
+        )
+    return promotion
+
+
+def check_code_unique(
+    db: Session, code: Optional[str], promotion_id: Optional[int] = None
+) -> None:
+    if code is None:
+        return
+    query = db.query(Promotion.id).filter(Promotion.code == code)
+    if promotion_id is not None:
+        query = query.filter(Promotion.id != promotion_id)
+    if query.first():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Promotion with this code already exists",
+        )
+
+
+def apply_promotion_data(promotion: Promotion, data: PromotionCreate) -> None:
+    """Copy validated data onto the model, replacing its targets"""
+    values = data.model_dump(exclude={"targets", "type"})
+    for key, value in values.items():
+        setattr(promotion, key, value)
+    promotion.type = PromotionType(data.type.value)
+    targets = {(target.target_type.value, target.target_id) for target in data.targets}
+    # Unchanged targets keep their rows, new rows would collide with them
+    existing = {
+        (target.target_type.value, target.target_id): target
+        for target in promotion.targets
+    }
+    promotion.targets = [
+        existing.get((target_type, target_id))
+        or PromotionTarget(
+            target_type=PromotionTargetType(target_type), target_id=target_id
+        )
+        for target_type, target_id in sorted(targets)
+    ]
+
+
+@router.get(
+    "/",
+    response_model=dict,
+    summary="Get promotions list",
+    status_code=status.HTTP_200_OK,
+)
+async def get_promotions(
+    skip: int = 0,
+    limit: int = 15,
+    is_active: Optional[bool] = None,
+    search: Optional[str] = Query(None, description="Search name or code"),
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    query = db.query(Promotion)
+    if is_active is not None:
+        query = query.filter(Promotion.is_active == is_active)
+    if search:
+        query = query.filter(
+            or_(
+                Promotion.name.ilike(f"%{search}%"),
+                Promotion.code.ilike(f"%{search}%"),
+            )
+        )
+    total = query.count()
+    promotions = (
+        query.options(selectinload(Promotion.targets))
+        .order_by(Promotion.id.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+
+    return {
+        "message": "Get promotions list successfully",
+        "data": [PromotionResponse.model_validate(p) for p in promotions],
+        "total": total,
+        "skip": skip,
+        "limit": limit,
+    }
+
+
+@router.get(
+    "/{promotion_id}",
+    response_model=dict,
+    summary="Get promotion detail",
+    status_code=status.HTTP_200_OK,
+)
+async def get_promotion(
+    promotion_id: int,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    promotion = get_promotion_or_404(db, promotion_id)
+    return {
+        "message": "Get promotion detail successfully",
+        "data": PromotionResponse.model_validate(promotion),
+    }
+
+
+@router.post(
+    "/",
+    response_model=dict,
+    summary="Create promotion",
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_promotion(
+    promotion_create: PromotionCreate,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    check_code_unique(db, promotion_create.code)
+
+    try:
+        db_promotion = Promotion(used_count=0)
+        apply_promotion_data(db_promotion, promotion_create)
+        db.add(db_promotion)
+        db.commit()
+        promotion_index.invalidate()
+
+        return {
+            "message": "Create promotion successfully",
+            "data": PromotionResponse.model_validate(
+                get_promotion_or_404(db, db_promotion.id)
+            ),
+        }
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.put(
+    "/{promotion_id}",
+    response_model=dict,
+    summary="Update promotion",
+    status_code=status.HTTP_200_OK,
+)
+async def update_promotion(
+    promotion_id: int,
+    promotion_update: PromotionUpdate,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    db_promotion = get_promotion_or_404(db, promotion_id)
+
+    # Validate the promotion as a whole after applying the changes
+    data = PromotionResponse.model_validate(db_promotion).model_dump()
+    data.update(promotion_update.model_dump(exclude_unset=True))
+    try:
+        merged = PromotionCreate(**data)
+    except ValidationError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=[error["msg"] for error in e.errors()],
+        )
+    check_code_unique(db, merged.code, promotion_id)
+
+    try:
+        apply_promotion_data(db_promotion, merged)
+        db.commit()
+        promotion_index.invalidate()
+
+        return {
+            "message": "Update promotion successfully",
+            "data": PromotionResponse.model_validate(
+                get_promotion_or_404(db, promotion_id)
+            ),
+        }
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.delete(
+    "/{promotion_id}",
+    response_model=dict,
+    summary="Delete promotion",
+    status_code=status.HTTP_200_OK,
+)
+async def delete_promotion(
+    promotion_id: int,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    db_promotion = get_promotion_or_404(db, promotion_id)
+
+    try:
+        # Promotions used by orders are kept for their discount records
+        used = (
+            db.query(OrderDiscount.id)
+            .filter(OrderDiscount.promotion_id == promotion_id)
+            .first()
+        )
+        if used:
+            db_promotion.is_active = False
+            message = "Promotion is used by orders and was deactivated"
+        else:
+            db.delete(db_promotion)
+            message = "Delete promotion successfully"
+        db.commit()
+        promotion_index.invalidate()
+        return {"message": message, "data": {"id": promotion_id}}
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
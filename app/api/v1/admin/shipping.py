@@ -0,0 +1,308 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from typing import Optional, Type, Union
+
+from app.api.deps import get_current_active_superuser, get_db
+from app.models.shipping import OrderTax, ShippingZone, TaxRate
+from app.models.user import Country, State
+from app.schemas.shipping import (
+    ShippingZoneCreate,
+    ShippingZoneResponse,
+    ShippingZoneUpdate,
+    TaxRateCreate,
+    TaxRateResponse,
+    TaxRateUpdate,
+)
+from app.utils.rates import bump_rate_version, rate_cache
+
+router = APIRouter()
+
+RateModel = Union[Type[ShippingZone], Type[TaxRate]]
+
+
+def get_or_404(db: Session, model: RateModel, id: int):
+    instance = db.query(model).filter(model.id == id).first()
+    if not instance:
+        what = "Shipping zone" if model is ShippingZone else "Tax rate"
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"{what} with ID {id} not found",
+        )
+    return instance
+
+
+def check_region(
+    db: Session,
+    model: RateModel,
+    country_id: int,
+    state_id: Optional[int],
+    id: Optional[int] = None,
+) -> None:
+    """The state must belong to the country, one row per region
+
+    The unique constraint does not cover whole-country rows, NULL state
+    IDs never collide, so regions are checked here.
+    """
+    if not db.query(Country.id).filter(Country.id == country_id).first():
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Country with ID {country_id} not found",
+        )
+    if (
+        state_id is not None
+        and not db.query(State.id)
+        .filter(State.id == state_id, State.country_id == country_id)
+        .first()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"State with ID {state_id} not found in this country",
+        )
+
+    query = db.query(model.id).filter(model.country_id == country_id)
+    if state_id is None:
+        query = query.filter(model.state_id.is_(None))
+    else:
+        query = query.filter(model.state_id == state_id)
+    if id is not None:
+        query = query.filter(model.id != id)
+    if query.first():
+        what = "Shipping zone" if model is ShippingZone else "Tax rate"
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{what} for this region already exists",
+        )
+
+
+def commit_rates(db: Session) -> None:
+    """Commit a rate change together with a new rate table version"""
+    bump_rate_version(db)
+    db.commit()
+    rate_cache.invalidate()
+
+
+@router.get(
+    "/zones",
+    response_model=dict,
+    summary="Get shipping zones list",
+    status_code=status.HTTP_200_OK,
+)
+async def get_shipping_zones(
+    country_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    query = db.query(ShippingZone)
+    if country_id is not None:
+        query = query.filter(ShippingZone.country_id == country_id)
+    zones = query.order_by(ShippingZone.country_id, ShippingZone.id).all()
+
+    return {
+        "message": "Get shipping zones list successfully",
+        "data": [ShippingZoneResponse.model_validate(zone) for zone in zones],
+        "total": len(zones),
+    }
+
+
+@router.post(
+    "/zones",
+    response_model=dict,
+    summary="Create shipping zone",
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_shipping_zone(
+    zone_create: ShippingZoneCreate,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    check_region(db, ShippingZone, zone_create.country_id, zone_create.state_id)
+
+    try:
+        db_zone = ShippingZone(**zone_create.model_dump())
+        db.add(db_zone)
+        commit_rates(db)
+        db.refresh(db_zone)
+
+        return {
+            "message": "Create shipping zone successfully",
+            "data": ShippingZoneResponse.model_validate(db_zone),
+        }
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.put(
+    "/zones/{zone_id}",
+    response_model=dict,
+    summary="Update shipping zone",
+    status_code=status.HTTP_200_OK,
+)
+async def update_shipping_zone(
+    zone_id: int,
+    zone_update: ShippingZoneUpdate,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    db_zone = get_or_404(db, ShippingZone, zone_id)
+    update_data = zone_update.model_dump(exclude_unset=True)
+    check_region(
+        db,
+        ShippingZone,
+        update_data.get("country_id", db_zone.country_id),
+        update_data.get("state_id", db_zone.state_id),
+        zone_id,
+    )
+
+    try:
+        for key, value in update_data.items():
+            setattr(db_zone, key, value)
+        commit_rates(db)
+        db.refresh(db_zone)
+
+        return {
+            "message": "Update shipping zone successfully",
+            "data": ShippingZoneResponse.model_validate(db_zone),
+        }
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.delete(
+    "/zones/{zone_id}",
+    response_model=dict,
+    summary="Delete shipping zone",
+    status_code=status.HTTP_200_OK,
+)
+async def delete_shipping_zone(
+    zone_id: int,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    db_zone = get_or_404(db, ShippingZone, zone_id)
+
+    try:
+        db.delete(db_zone)
+        commit_rates(db)
+        return {"message": "Delete shipping zone successfully", "data": {"id": zone_id}}
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.get(
+    "/tax-rates",
+    response_model=dict,
+    summary="Get tax rates list",
+    status_code=status.HTTP_200_OK,
+)
+async def get_tax_rates(
+    country_id: Optional[int] = None,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    query = db.query(TaxRate)
+    if country_id is not None:
+        query = query.filter(TaxRate.country_id == country_id)
+    rates = query.order_by(TaxRate.country_id, TaxRate.id).all()
+
+    return {
+        "message": "Get tax rates list successfully",
+        "data": [TaxRateResponse.model_validate(rate) for rate in rates],
+        "total": len(rates),
+    }
+
+
+@router.post(
+    "/tax-rates",
+    response_model=dict,
+    summary="Create tax rate",
+    status_code=status.HTTP_201_CREATED,
+)
+async def create_tax_rate(
+    rate_create: TaxRateCreate,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    check_region(db, TaxRate, rate_create.country_id, rate_create.state_id)
+
+    try:
+        db_rate = TaxRate(**rate_create.model_dump())
+        db.add(db_rate)
+        commit_rates(db)
+        db.refresh(db_rate)
+
+        return {
+            "message": "Create tax rate successfully",
+            "data": TaxRateResponse.model_validate(db_rate),
+        }
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.put(
+    "/tax-rates/{tax_rate_id}",
+    response_model=dict,
+    summary="Update tax rate",
+    status_code=status.HTTP_200_OK,
+)
+async def update_tax_rate(
+    tax_rate_id: int,
+    rate_update: TaxRateUpdate,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    db_rate = get_or_404(db, TaxRate, tax_rate_id)
+    update_data = rate_update.model_dump(exclude_unset=True)
+    check_region(
+        db,
+        TaxRate,
+        update_data.get("country_id", db_rate.country_id),
+        update_data.get("state_id", db_rate.state_id),
+        tax_rate_id,
+    )
+
+    try:
+        for key, value in update_data.items():
+            setattr(db_rate, key, value)
+        commit_rates(db)
+        db.refresh(db_rate)
+
+        return {
+            "message": "Update tax rate successfully",
+            "data": TaxRateResponse.model_validate(db_rate),
+        }
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+
+@router.delete(
+    "/tax-rates/{tax_rate_id}",
+    response_model=dict,
+    summary="Delete tax rate",
+    status_code=status.HTTP_200_OK,
+)
+async def delete_tax_rate(
+    tax_rate_id: int,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_superuser),
+):
+    db_rate = get_or_404(db, TaxRate, tax_rate_id)
+
+    try:
+        # Rates charged on orders are kept for their tax records
+        used = db.query(OrderTax.id).filter(OrderTax.tax_rate_id == tax_rate_id).first()
+        if used:
+            db_rate.is_active = False
+            message = "Tax rate is used by orders and was deactivated"
+        else:
+            db.delete(db_rate)
+            message = "Delete tax rate successfully"
+        commit_rates(db)
+        return {"message": message, "data": {"id": tax_rate_id}}
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
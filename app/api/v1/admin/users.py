@@ -3,8 +3,10 @@ from sqlalchemy.orm import Session
 from typing import List
 
 from app.api.deps import get_current_active_superuser, get_db
+from app.core.events import USER_REGISTERED, USER_UPDATED
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate, UserResponse
+from app.utils.outbox import enqueue_event
 
 router = APIRouter()
 
@@ -67,6 +69,8 @@ async def create_user(
         user_data = user_create.model_dump()
         db_user = User(**user_data)
         db.add(db_user)
+        db.flush()
+        enqueue_event(db, USER_REGISTERED, {"user_id": db_user.id})
         db.commit()
         db.refresh(db_user)
 
@@ -110,6 +114,9 @@ async def update_user(
         for key, value in update_data.items():
             setattr(db_user, key, value)
 
+        enqueue_event(
+            db, USER_UPDATED, {"user_id": user_id, "fields": sorted(update_data)}
+        )
         db.commit()
         db.refresh(db_user)
 
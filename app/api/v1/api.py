@@ -3,6 +3,9 @@ from app.api.v1.endpoints.auth import router as auth_router
 from app.api.v1.endpoints.products import router as product_router
 from app.api.v1.endpoints.orders import router as order_router
 from app.api.v1.endpoints.categories import router as category_router
+from app.api.v1.endpoints.reviews import router as review_router
+from app.api.v1.endpoints.cart import router as cart_router
+from app.api.v1.endpoints.webhooks import router as webhook_router
 
 from app.api.v1.admin.products import router as admin_product_router
 from app.api.v1.admin.auth import router as admin_auth_router
@@ -13,6 +16,11 @@ from app.api.v1.admin.images import router as auth_image_router
 from app.api.v1.admin.product_images import router as admin_image_router
 from app.api.v1.admin.product_attributes import router as admin_product_attribute_router
 from app.api.v1.admin.orders import router as admin_order_router
+from app.api.v1.admin.analytics import router as admin_analytics_router
+from app.api.v1.admin.promotions import router as admin_promotion_router
+from app.api.v1.admin.shipping import router as admin_shipping_router
+from app.api.v1.admin.outbox import router as admin_outbox_router
+from app.api.v1.admin.emails import router as admin_email_router
 
 api_router = APIRouter()
 
@@ -28,6 +36,15 @@ api_router.include_router(order_router, prefix="/orders", tags=["orders"])
 # Add category router
 api_router.include_router(category_router, prefix="/categories", tags=["categories"])
 
+# Add review router
+api_router.include_router(review_router, prefix="/reviews", tags=["reviews"])
+
+# Add cart router
+api_router.include_router(cart_router, prefix="/cart", tags=["cart"])
+
+# Add payment webhook router
+api_router.include_router(webhook_router, prefix="/webhooks", tags=["webhooks"])
+
 
 # Add admin auth router
 api_router.include_router(admin_auth_router, prefix="/admin/auth", tags=["admin-login"])
@@ -75,3 +92,28 @@ api_router.include_router(
 api_router.include_router(
     admin_order_router, prefix="/admin/orders", tags=["order-management"]
 )
+
+# Add admin analytics router
+api_router.include_router(
+    admin_analytics_router, prefix="/admin/analytics", tags=["analytics"]
+)
+
+# Add admin promotion router
+api_router.include_router(
+    admin_promotion_router, prefix="/admin/promotions", tags=["promotion-management"]
+)
+
+# Add admin shipping and tax router
+api_router.include_router(
+    admin_shipping_router, prefix="/admin/shipping", tags=["shipping-management"]
+)
+
+# Add admin outbox router
+api_router.include_router(
+    admin_outbox_router, prefix="/admin/outbox", tags=["outbox-management"]
+)
+
+# Add admin email queue router
+api_router.include_router(
+    admin_email_router, prefix="/admin/emails", tags=["email-management"]
+)
@@ -1,5 +1,6 @@
 from datetime import timedelta
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from app.api import deps
@@ -17,13 +18,17 @@ from app.core.security import (
     create_access_token,
     ACCESS_TOKEN_EXPIRE_MINUTES,
 )
-from app.core import email
+from app.core.events import USER_REGISTERED, USER_UPDATED
 from app.core.settings import settings
 import uuid
 import random
 import string
 from datetime import datetime, timedelta
 from app.core.logger import logger
+from app.utils.cart_store import get_cart_store
+from app.utils.carts import guest_cart_key, merge_carts, user_cart_key
+from app.utils.email_queue import enqueue_email
+from app.utils.outbox import enqueue_event
 
 router = APIRouter()
 
@@ -35,7 +40,9 @@ VERIFICATION_CODE_EXPIRE = 10  # Verification code expiration time (minutes)
 
 @router.post("/token")
 async def login_for_access_token(
-    form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(deps.get_db)
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: Session = Depends(deps.get_db),
+    cart_token: Optional[str] = Header(None, alias="X-Cart-Token", max_length=64),
 ):
     user = db.query(User).filter(User.email == form_data.username).first()
     if not user or not verify_password(form_data.password, user.hashed_password):
@@ -50,13 +57,18 @@ async def login_for_access_token(
         data={"sub": str(user.id)}, expires_delta=access_token_expires
     )
 
+    # Move the cart built as a guest into the user's cart
+    if cart_token:
+        merge_carts(
+            db, get_cart_store(), guest_cart_key(cart_token), user_cart_key(user.id)
+        )
+
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 @router.post("/register", response_model=UserResponse)
 async def register(
     user: UserCreate,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(deps.get_db),
 ):
     # check if email already exists
@@ -72,19 +84,13 @@ async def register(
         verification_code=verification_code,
     )
     db.add(db_user)
+    db.flush()
+
+    # The verification email is sent by the user.registered handler
+    enqueue_event(db, USER_REGISTERED, {"user_id": db_user.id})
     db.commit()
     db.refresh(db_user)
 
-    # send verification email
-    verification_url = f"{settings.FRONTEND_URL}/verify-email?code={verification_code}"
-    background_tasks.add_task(
-        email.send_email,
-        email_to=user.email,
-        subject="Verify your email",
-        template_name="verify_email",
-        data={"verification_url": verification_url},
-    )
-
     return db_user
 
 
@@ -96,6 +102,7 @@ async def verify_email(code: str, db: Session = Depends(deps.get_db)):
 
     user.is_verified = True
     user.verification_code = None
+    enqueue_event(db, USER_UPDATED, {"user_id": user.id, "fields": ["is_verified"]})
     db.commit()
 
     return {"message": "Email verified successfully"}
@@ -104,7 +111,6 @@ async def verify_email(code: str, db: Session = Depends(deps.get_db)):
 @router.post("/forgot-password")
 async def forgot_password(
     request: PasswordReset,
-    background_tasks: BackgroundTasks,
     db: Session = Depends(deps.get_db),
 ):
     logger.info(f"Forgot password request: {request}")
@@ -114,16 +120,16 @@ async def forgot_password(
 
     reset_code = generate_verification_code()
     user.reset_password_code = reset_code
-    db.commit()
 
     # Send verification code email
-    background_tasks.add_task(
-        email.send_email,
-        email_to=request.email,
-        subject="Email verification code",
-        template_name="verification_code",
-        data={"verification_code": reset_code},
+    enqueue_email(
+        db,
+        request.email,
+        "Email verification code",
+        "verification_code",
+        {"verification_code": reset_code},
     )
+    db.commit()
     # reset_url = f"{settings.FRONTEND_URL}/reset-password?code={reset_code}"
     # background_tasks.add_task(
     #     email.send_email,
@@ -152,6 +158,7 @@ async def reset_password(
 
     user.hashed_password = get_password_hash(request.new_password)
     user.reset_password_code = None
+    enqueue_event(db, USER_UPDATED, {"user_id": user.id, "fields": ["password"]})
     db.commit()
 
     return {"message": "Password reset successfully"}
@@ -163,9 +170,7 @@ def generate_verification_code():
 
 
 @router.post("/send-verification-code")
-async def send_verification_code(
-    email: str, background_tasks: BackgroundTasks, db: Session = Depends(deps.get_db)
-):
+async def send_verification_code(email: str, db: Session = Depends(deps.get_db)):
     # Get user
     user = db.query(User).filter(User.email == email).first()
     if not user:
@@ -195,16 +200,16 @@ async def send_verification_code(
     )
     user.verification_attempts = 0
     user.last_verification_sent_at = datetime.utcnow()
-    db.commit()
 
     # Send verification code email
-    background_tasks.add_task(
-        email.send_email,
-        email_to=email,
-        subject="Email verification code",
-        template_name="verification_code",
-        data={"verification_code": verification_code},
+    enqueue_email(
+        db,
+        email,
+        "Email verification code",
+        "verification_code",
+        {"verification_code": verification_code},
     )
+    db.commit()
 
     return {
         "message": "Verification code sent",
@@ -255,6 +260,9 @@ async def verify_email(verify_data: VerifyEmail, db: Session = Depends(deps.get_
     user.verification_code_expires_at = None
     user.verification_attempts = 0
     user.last_verification_sent_at = None
+    enqueue_event(
+        db, USER_UPDATED, {"user_id": user.id, "fields": ["is_active", "is_verified"]}
+    )
     db.commit()
 
     return {
@@ -0,0 +1,252 @@
+import secrets
+from decimal import Decimal
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
+from sqlalchemy.orm import Session
+from app.api.deps import (
+    get_current_active_user,
+    get_current_user_optional,
+    get_db,
+    get_price_resolver,
+)
+from app.models.user import User
+from app.schemas.cart import CartItemAdd, CartItemUpdate, CartQuote, CartResponse
+from app.utils.cart_store import BaseCartStore, get_cart_store
+from app.utils.carts import (
+    add_to_cart,
+    clear_cart,
+    get_cart,
+    guest_cart_key,
+    merge_carts,
+    set_cart_quantity,
+    user_cart_key,
+)
+from app.utils.pricing import PriceResolver
+from app.utils.promotions import CouponError, price_promotions
+from app.utils.rates import ShippingUnavailableError, quote_rates, rate_cache
+
+router = APIRouter()
+
+CART_TOKEN_HEADER = "X-Cart-Token"
+
+
+class CartOwner:
+    """The signed in user or the guest cart token of a request"""
+
+    def __init__(
+        self,
+        current_user: Optional[User] = Depends(get_current_user_optional),
+        cart_token: Optional[str] = Header(
+            None, alias=CART_TOKEN_HEADER, min_length=16, max_length=64
+        ),
+    ):
+        self.user = current_user
+        self.cart_token = None if current_user else cart_token
+
+    @property
+    def cart_key(self) -> Optional[str]:
+        if self.user:
+            return user_cart_key(self.user.id)
+        if self.cart_token:
+            return guest_cart_key(self.cart_token)
+        return None
+
+    def ensure_cart_key(self, response: Response) -> str:
+        """Cart key of the request, starting a guest cart if there is none"""
+        if self.cart_key is None:
+            self.cart_token = secrets.token_urlsafe(24)
+            response.headers[CART_TOKEN_HEADER] = self.cart_token
+        return self.cart_key
+
+
+def cart_response(
+    db: Session,
+    store: BaseCartStore,
+    resolver: PriceResolver,
+    owner: CartOwner,
+    coupon_code: Optional[str] = None,
+) -> dict:
+    if owner.cart_key is None:
+        return {"items": [], "total_items": 0, "total_price": 0}
+    cart = get_cart(db, store, resolver, owner.cart_key)
+    try:
+        discounts = price_promotions(db, resolver, cart["items"], coupon_code)
+    except CouponError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return {
+        "cart_token": owner.cart_token,
+        "items": [line._asdict() for line in cart["items"]],
+        "total_items": cart["total_items"],
+        "total_price": cart["total_price"],
+        "discounts": [discount._asdict() for discount in discounts],
+        "total_discount": sum((discount.amount for discount in discounts), 0),
+    }
+
+
+@router.get("/", response_model=CartResponse, summary="Get cart")
+def read_cart(
+    coupon_code: Optional[str] = Query(None, max_length=50),
+    db: Session = Depends(get_db),
+    store: BaseCartStore = Depends(get_cart_store),
+    resolver: PriceResolver = Depends(get_price_resolver),
+    owner: CartOwner = Depends(),
+):
+    return cart_response(db, store, resolver, owner, coupon_code)
+
+
+@router.get("/quote", response_model=CartQuote, summary="Quote shipping and tax")
+def quote_cart(
+    country_id: int = Query(..., gt=0),
+    state_id: Optional[int] = Query(None, gt=0),
+    coupon_code: Optional[str] = Query(None, max_length=50),
+    db: Session = Depends(get_db),
+    store: BaseCartStore = Depends(get_cart_store),
+    resolver: PriceResolver = Depends(get_price_resolver),
+    owner: CartOwner = Depends(),
+):
+    if owner.cart_key is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Cart is empty"
+        )
+    cart = get_cart(db, store, resolver, owner.cart_key)
+    if not cart["items"]:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Cart is empty"
+        )
+    try:
+        discounts = price_promotions(db, resolver, cart["items"], coupon_code)
+    except CouponError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    discount = sum((discount.amount for discount in discounts), Decimal(0))
+
+    # Rates come from the in-memory tables, lines reuse the cart's snapshots
+    tables = rate_cache.get(db)
+    try:
+        rates = quote_rates(
+            tables,
+            resolver,
+            cart["items"],
+            cart["total_price"] - discount,
+            country_id,
+            state_id,
+        )
+    except ShippingUnavailableError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return {
+        "subtotal": cart["total_price"],
+        "discounts": [discount._asdict() for discount in discounts],
+        "total_discount": discount,
+        "shipping_fee": rates.shipping_fee,
+        "billable_weight": rates.billable_weight,
+        "taxes": [tax._asdict() for tax in rates.taxes],
+        "tax_amount": rates.tax_amount,
+        "total": cart["total_price"] - discount + rates.shipping_fee + rates.tax_amount,
+        "rates_version": tables.version,
+    }
+
+
+@router.post("/items", response_model=CartResponse, summary="Add item to cart")
+def add_cart_item(
+    item: CartItemAdd,
+    response: Response,
+    db: Session = Depends(get_db),
+    store: BaseCartStore = Depends(get_cart_store),
+    resolver: PriceResolver = Depends(get_price_resolver),
+    owner: CartOwner = Depends(),
+):
+    try:
+        add_to_cart(
+            db,
+            store,
+            resolver,
+            owner.ensure_cart_key(response),
+            item.product_id,
+            item.variant_id,
+            item.quantity,
+        )
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    return cart_response(db, store, resolver, owner)
+
+
+@router.put(
+    "/items/{product_id}",
+    response_model=CartResponse,
+    summary="Update cart item quantity",
+)
+def update_cart_item(
+    product_id: int,
+    item: CartItemUpdate,
+    variant_id: Optional[int] = Query(None, gt=0),
+    db: Session = Depends(get_db),
+    store: BaseCartStore = Depends(get_cart_store),
+    resolver: PriceResolver = Depends(get_price_resolver),
+    owner: CartOwner = Depends(),
+):
+    if owner.cart_key is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Item is not in the cart"
+        )
+    try:
+        set_cart_quantity(
+            db, store, owner.cart_key, product_id, variant_id, item.quantity
+        )
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    return cart_response(db, store, resolver, owner)
+
+
+@router.delete(
+    "/items/{product_id}",
+    response_model=CartResponse,
+    summary="Remove item from cart",
+)
+def remove_cart_item(
+    product_id: int,
+    variant_id: Optional[int] = Query(None, gt=0),
+    db: Session = Depends(get_db),
+    store: BaseCartStore = Depends(get_cart_store),
+    resolver: PriceResolver = Depends(get_price_resolver),
+    owner: CartOwner = Depends(),
+):
+    if owner.cart_key is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Item is not in the cart"
+        )
+    try:
+        set_cart_quantity(db, store, owner.cart_key, product_id, variant_id, 0)
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    return cart_response(db, store, resolver, owner)
+
+
+@router.delete("/", response_model=CartResponse, summary="Clear cart")
+def delete_cart(
+    db: Session = Depends(get_db),
+    store: BaseCartStore = Depends(get_cart_store),
+    resolver: PriceResolver = Depends(get_price_resolver),
+    owner: CartOwner = Depends(),
+):
+    if owner.cart_key is not None:
+        clear_cart(db, store, owner.cart_key)
+    return cart_response(db, store, resolver, owner)
+
+
+@router.post(
+    "/merge",
+    response_model=CartResponse,
+    summary="Merge guest cart into the user's cart",
+)
+def merge_guest_cart(
+    cart_token: str = Header(
+        ..., alias=CART_TOKEN_HEADER, min_length=16, max_length=64
+    ),
+    db: Session = Depends(get_db),
+    store: BaseCartStore = Depends(get_cart_store),
+    resolver: PriceResolver = Depends(get_price_resolver),
+    current_user: User = Depends(get_current_active_user),
+):
+    merge_carts(db, store, guest_cart_key(cart_token), user_cart_key(current_user.id))
+    owner = CartOwner(current_user, None)
+    return cart_response(db, store, resolver, owner)
@@ -7,6 +7,12 @@ from app.models.category import Category
 from app.models.product import Product
 from app.api.deps import get_db
 from app.schemas.category import CategoryResponse, PaginatedProductResponse
+from app.utils.product_listing import (
+    BESTSELLING_WINDOW_REGEX,
+    PRODUCT_SORT_REGEX,
+    apply_product_sort,
+    filter_min_rating,
+)
 
 router = APIRouter()
 
@@ -53,7 +59,9 @@ def get_products_by_category(
     db: Session = Depends(get_db),
     page: int = Query(1, gt=0),
     size: int = Query(10, gt=0),
-    sort: Optional[str] = Query(None, regex="^(price|name|created_at)_(asc|desc)$"),
+    sort: Optional[str] = Query(None, regex=PRODUCT_SORT_REGEX),
+    window: str = Query("30d", regex=BESTSELLING_WINDOW_REGEX),
+    min_rating: Optional[float] = Query(None, ge=1, le=5),
     is_active: Optional[bool] = Query(True),
 ):
     # Check if category exists
@@ -73,14 +81,12 @@ def get_products_by_category(
     query = db.query(Product).filter(
         Product.category_id == category_id, Product.is_active == is_active
     )
+    if min_rating:
+        query = filter_min_rating(query, min_rating)
 
     # Apply sorting if specified
     if sort:
-        field, direction = sort.split("_")
-        order_by = getattr(Product, field)
-        if direction == "desc":
-            order_by = order_by.desc()
-        query = query.order_by(order_by)
+        query = apply_product_sort(query, sort, window)
 
     # Get total count for pagination
     total = query.count()
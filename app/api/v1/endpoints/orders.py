@@ -1,75 +1,163 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import Optional
 from datetime import datetime
-import uuid
-from app.models.order import Order, OrderItem
-from app.api.deps import get_current_active_user, get_db
-from app.schemas.order import OrderCreate, OrderInDB, OrderUpdate
+from decimal import Decimal
+from app.core.ids import generate_order_number
+from app.models.order import (
+    Order,
+    OrderItem,
+    OrderStatus,
+    PaymentStatus,
+    coerce_order_enums,
+)
+from app.models.user import Address
+from app.utils.idempotency import IdempotentRoute
+from app.utils.inventory import InsufficientStockError, reserve_stock
+from app.utils.pricing import PriceMismatchError, PriceResolver
+from app.utils.promotions import (
+    CouponError,
+    PromotionUnavailableError,
+    price_promotions,
+    redeem_promotions,
+)
+from app.utils.rates import (
+    ShippingUnavailableError,
+    quote_rates,
+    rate_cache,
+    record_order_taxes,
+)
+from app.utils.order_lifecycle import (
+    CUSTOMER_ORDER_STATUS_TRANSITIONS,
+    apply_order_changes,
+    order_state,
+    transition_error,
+)
+from app.api.deps import get_current_active_user, get_db, get_price_resolver
+from app.schemas.order import (
+    CustomerOrderUpdate,
+    OrderCreate,
+    OrderInDB,
+    OrderList,
+)
+from app.utils.order_archive import find_order, paginate_orders
 
-router = APIRouter()
-
-
-def generate_order_number():
-    return f"ORD-{uuid.uuid4().hex[:8].upper()}"
+# Order creation honours the Idempotency-Key header
+router = APIRouter(route_class=IdempotentRoute)
 
 
 @router.post("/", response_model=OrderInDB)
 def create_order(
     order: OrderCreate,
     db: Session = Depends(get_db),
+    pricing: PriceResolver = Depends(get_price_resolver),
     current_user=Depends(get_current_active_user),
 ):
+    # Price all lines from current product data
+    try:
+        lines = pricing.price_lines(order.items)
+    except PriceMismatchError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=e.errors)
+
+    # Apply automatic promotions and the coupon to the priced lines
+    try:
+        discounts = price_promotions(db, pricing, lines, order.coupon_code)
+    except CouponError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    discount = sum((promotion.amount for promotion in discounts), Decimal(0))
+
+    # Shipping and tax from the cached rate tables
+    address = db.get(Address, order.shipping_address_id)
+    if not address:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Shipping address not found",
+        )
+    try:
+        rates = quote_rates(
+            rate_cache.get(db),
+            pricing,
+            lines,
+            sum((line.total_price for line in lines), Decimal(0)) - discount,
+            address.country_id,
+            address.state_id,
+            fallback_shipping_fee=order.shipping_fee,
+        )
+    except ShippingUnavailableError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
     # Create new order
     db_order = Order(
         user_id=current_user.id,
         order_number=generate_order_number(),
-        shipping_fee=order.shipping_fee,
-        payment_method=order.payment_method,
-        shipping_address_id=order.shipping_address_id,
-        billing_address_id=order.billing_address_id,
+        shipping_fee=rates.shipping_fee,
+        **coerce_order_enums(
+            order.dict(exclude={"items", "coupon_code", "shipping_fee"})
+        ),
     )
     db.add(db_order)
 
     # Add order items
-    total_amount = 0
-    for item in order.items:
-        total_price = item.price * item.quantity
-        total_amount += total_price
+    total_amount = Decimal(0)
+    for line in lines:
+        total_amount += line.total_price
 
         db_item = OrderItem(
             order=db_order,
-            product_id=item.product_id,
-            product_name=item.product_name,
-            product_sku=item.product_sku,
-            quantity=item.quantity,
-            price=item.price,
-            total_price=total_price,
+            product_id=line.product_id,
+            product_name=line.product_name,
+            product_sku=line.product_sku,
+            quantity=line.quantity,
+            price=line.price,
+            total_price=line.total_price,
         )
         db.add(db_item)
 
     # Update order total
-    db_order.total_amount = total_amount + order.shipping_fee
+    db_order.total_amount = (
+        total_amount - discount + rates.shipping_fee + rates.tax_amount
+    )
+
+    # Reserve stock and promotion uses in the same transaction as the order
+    db.flush()
+    try:
+        reserve_stock(
+            db,
+            db_order.id,
+            [(line.product_id, line.variant_id, line.quantity) for line in lines],
+        )
+        redeem_promotions(db, db_order.id, discounts)
+    except (InsufficientStockError, PromotionUnavailableError) as e:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    record_order_taxes(db, db_order.id, rates.taxes)
 
+    apply_order_changes(db, [(None, order_state(db_order))])
     db.commit()
     db.refresh(db_order)
     return db_order
 
 
-@router.get("/", response_model=List[OrderInDB])
+@router.get("/", response_model=OrderList)
 def get_orders(
-    skip: int = 0,
-    limit: int = 15,
+    cursor: Optional[str] = None,
+    limit: int = Query(15, gt=0, le=100),
     db: Session = Depends(get_db),
     current_user=Depends(get_current_active_user),
 ):
-    return (
-        db.query(Order)
-        .filter(Order.user_id == current_user.id)
-        .offset(skip)
-        .limit(limit)
-        .all()
-    )
+    try:
+        orders, next_cursor = paginate_orders(
+            db, lambda model: [model.user_id == current_user.id], cursor, limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    return {
+        "message": "Get orders successfully",
+        "data": orders,
+        "next_cursor": next_cursor,
+        "limit": limit,
+    }
 
 
 @router.get("/{order_id}", response_model=OrderInDB)
@@ -78,10 +166,8 @@ def get_order(
     db: Session = Depends(get_db),
     current_user=Depends(get_current_active_user),
 ):
-    order = (
-        db.query(Order)
-        .filter(Order.id == order_id, Order.user_id == current_user.id)
-        .first()
+    order = find_order(
+        db, lambda model: [model.id == order_id, model.user_id == current_user.id]
     )
     if not order:
         raise HTTPException(
@@ -93,13 +179,15 @@ def get_order(
 @router.patch("/{order_id}", response_model=OrderInDB)
 def update_order(
     order_id: int,
-    order_update: OrderUpdate,
+    order_update: CustomerOrderUpdate,
     db: Session = Depends(get_db),
     current_user=Depends(get_current_active_user),
 ):
+    # Locked so concurrent changes check their transition against this one
     db_order = (
         db.query(Order)
         .filter(Order.id == order_id, Order.user_id == current_user.id)
+        .with_for_update()
         .first()
     )
     if not db_order:
@@ -107,12 +195,28 @@ def update_order(
             status_code=status.HTTP_404_NOT_FOUND, detail="Order not found"
         )
 
+    if order_update.billing_address_id is not None:
+        address = db.get(Address, order_update.billing_address_id)
+        if not address or address.user_id != current_user.id:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Billing address not found",
+            )
+
     # Update order fields
-    order_data = order_update.dict(exclude_unset=True)
+    before = order_state(db_order)
+    order_data = coerce_order_enums(order_update.dict(exclude_unset=True))
     for field, value in order_data.items():
         setattr(db_order, field, value)
 
     db_order.updated_at = datetime.utcnow()
+    after = order_state(db_order)
+    # Customers can only cancel, payment and fulfilment are up to staff
+    error = transition_error(before, after, CUSTOMER_ORDER_STATUS_TRANSITIONS)
+    if error:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error)
+
+    apply_order_changes(db, [(before, after)])
     db.commit()
     db.refresh(db_order)
     return db_order
@@ -124,9 +228,11 @@ def delete_order(
     db: Session = Depends(get_db),
     current_user=Depends(get_current_active_user),
 ):
+    # Locked so concurrent changes check their transition against this one
     db_order = (
         db.query(Order)
         .filter(Order.id == order_id, Order.user_id == current_user.id)
+        .with_for_update()
         .first()
     )
     if not db_order:
@@ -134,7 +240,20 @@ def delete_order(
             status_code=status.HTTP_404_NOT_FOUND, detail="Order not found"
         )
 
-    # Soft delete
+    # Only orders that were never paid can be deleted, a pending order is
+    # cancelled on the way so its stock and promotion uses are released
+    before = order_state(db_order)
+    if (
+        before.status not in (OrderStatus.PENDING, OrderStatus.CANCELLED)
+        or before.payment_status == PaymentStatus.PAID
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Only unpaid or cancelled orders can be deleted",
+        )
+    db_order.status = OrderStatus.CANCELLED
     db_order.is_active = False
     db_order.updated_at = datetime.utcnow()
+    after = order_state(db_order)
+    apply_order_changes(db, [(before, after)])
     db.commit()
@@ -1,4 +1,12 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy.orm import Session
+from typing import List
+from app.api.deps import get_db
+from app.models.product import Product
+from app.models.recommendation import ProductRecommendation
+from app.schemas.product import RelatedProduct, VariantResolveResponse
+from app.utils.recommendations import RELATED_TOP_K
+from app.utils.variant_index import variant_index
 
 router = APIRouter()
 
@@ -11,3 +19,71 @@ async def get_products():
 @router.get("/{product_id}", summary="Get product detail")
 async def get_product(product_id: int):
     return {"message": f"普通用户可以查看的产品详情，产品ID: {product_id}"}
+
+
+@router.get(
+    "/{product_id}/variants/resolve",
+    response_model=VariantResolveResponse,
+    summary="Resolve product variant by attributes",
+    status_code=status.HTTP_200_OK,
+)
+def resolve_product_variant(
+    product_id: int,
+    attribute_ids: List[int] = Query([]),
+    db: Session = Depends(get_db),
+):
+    index = variant_index.get(db, product_id)
+    if index is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Product with ID {product_id} not found",
+        )
+
+    variant = index.resolve(attribute_ids) if attribute_ids else None
+
+    return {
+        "product_id": product_id,
+        "attribute_ids": attribute_ids,
+        "variant": variant._asdict() if variant else None,
+        "availability": index.availability(attribute_ids),
+    }
+
+
+@router.get(
+    "/{product_id}/related",
+    response_model=List[RelatedProduct],
+    summary="Get products frequently bought together",
+    status_code=status.HTTP_200_OK,
+)
+def get_related_products(
+    product_id: int,
+    limit: int = Query(10, gt=0, le=RELATED_TOP_K),
+    db: Session = Depends(get_db),
+):
+    # Precomputed by the recommendation job, read by (product_id, rank) index
+    rows = (
+        db.query(Product, ProductRecommendation.score)
+        .join(
+            ProductRecommendation,
+            ProductRecommendation.related_product_id == Product.id,
+        )
+        .filter(
+            ProductRecommendation.product_id == product_id,
+            Product.is_active == True,
+            Product.deleted_at.is_(None),
+        )
+        .order_by(ProductRecommendation.rank)
+        .limit(limit)
+        .all()
+    )
+    return [
+        {
+            "id": product.id,
+            "name": product.name,
+            "slug": product.slug,
+            "price": product.price,
+            "discount_price": product.discount_price,
+            "score": score,
+        }
+        for product, score in rows
+    ]
@@ -0,0 +1,207 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.orm import Session
+from datetime import datetime
+from app.api.deps import get_current_active_user, get_db
+from app.models.product import Product, ProductRatingStats, ProductReview
+from app.schemas.review import (
+    ProductReviewList,
+    ReviewCreate,
+    ReviewResponse,
+    ReviewUpdate,
+)
+from app.utils.ratings import RATING_VALUES, apply_rating_change
+from app.utils.vote_buffer import helpful_votes
+
+router = APIRouter()
+
+
+def get_own_review(db: Session, review_id: int, user_id: int) -> ProductReview:
+    """Active review of the user, locked for an update or delete
+
+    Concurrent changes of one review wait for each other, so each moves the
+    product's rating stats from the rating the previous one stored, and a
+    review deleted meanwhile is not found.
+    """
+    review = (
+        db.query(ProductReview)
+        .filter(
+            ProductReview.id == review_id,
+            ProductReview.user_id == user_id,
+            ProductReview.is_active == True,
+        )
+        .with_for_update()
+        .first()
+    )
+    if not review:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Review not found"
+        )
+    return review
+
+
+@router.post(
+    "/",
+    response_model=ReviewResponse,
+    summary="Create product review",
+    status_code=status.HTTP_201_CREATED,
+)
+def create_review(
+    review_create: ReviewCreate,
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_user),
+):
+    product = (
+        db.query(Product)
+        .filter(
+            Product.id == review_create.product_id,
+            Product.is_active == True,
+            Product.deleted_at.is_(None),
+        )
+        .first()
+    )
+    if not product:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Product with ID {review_create.product_id} not found",
+        )
+
+    if (
+        db.query(ProductReview.id)
+        .filter(
+            ProductReview.product_id == review_create.product_id,
+            ProductReview.user_id == current_user.id,
+            ProductReview.is_active == True,
+        )
+        .first()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="You have already reviewed this product",
+        )
+
+    db_review = ProductReview(
+        **review_create.model_dump(),
+        user_id=current_user.id,
+        ip_address=request.client.host if request.client else None,
+    )
+    db.add(db_review)
+    apply_rating_change(db, review_create.product_id, None, review_create.rating)
+    db.commit()
+    db.refresh(db_review)
+    return db_review
+
+
+@router.get(
+    "/product/{product_id}",
+    response_model=ProductReviewList,
+    summary="Get product reviews",
+    status_code=status.HTTP_200_OK,
+)
+def get_product_reviews(
+    product_id: int,
+    skip: int = 0,
+    limit: int = 15,
+    db: Session = Depends(get_db),
+):
+    reviews = (
+        db.query(ProductReview)
+        .filter(ProductReview.product_id == product_id, ProductReview.is_active == True)
+        .order_by(ProductReview.created_at.desc())
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
+
+    stats = db.get(ProductRatingStats, product_id)
+    summary = {"rating_count": 0, "average_rating": None, "histogram": {}}
+    if stats and stats.rating_count:
+        summary = {
+            "rating_count": stats.rating_count,
+            "average_rating": round(stats.rating_sum / stats.rating_count, 2),
+            "histogram": {
+                rating: getattr(stats, f"rating_{rating}") for rating in RATING_VALUES
+            },
+        }
+
+    return {
+        "message": "Get product reviews successfully",
+        "data": reviews,
+        "summary": summary,
+        "skip": skip,
+        "limit": limit,
+    }
+
+
+@router.put(
+    "/{review_id}",
+    response_model=ReviewResponse,
+    summary="Update product review",
+    status_code=status.HTTP_200_OK,
+)
+def update_review(
+    review_id: int,
+    review_update: ReviewUpdate,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_user),
+):
+    db_review = get_own_review(db, review_id, current_user.id)
+
+    old_rating = db_review.rating
+    for key, value in review_update.model_dump(exclude_unset=True).items():
+        if value is not None:
+            setattr(db_review, key, value)
+
+    apply_rating_change(db, db_review.product_id, old_rating, db_review.rating)
+    db.commit()
+    db.refresh(db_review)
+    return db_review
+
+
+@router.delete(
+    "/{review_id}",
+    response_model=dict,
+    summary="Delete product review",
+    status_code=status.HTTP_200_OK,
+)
+def delete_review(
+    review_id: int,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_user),
+):
+    db_review = get_own_review(db, review_id, current_user.id)
+
+    # Deactivate instead of deleting
+    db_review.is_active = False
+    db_review.updated_at = datetime.utcnow()
+    apply_rating_change(db, db_review.product_id, db_review.rating, None)
+    db.commit()
+
+    return {"message": "Delete review successfully", "data": {"id": review_id}}
+
+
+@router.post(
+    "/{review_id}/helpful",
+    response_model=dict,
+    summary="Mark product review as helpful",
+    status_code=status.HTTP_202_ACCEPTED,
+)
+def vote_review_helpful(
+    review_id: int,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_user),
+):
+    review = (
+        db.query(ProductReview.id)
+        .filter(ProductReview.id == review_id, ProductReview.is_active == True)
+        .first()
+    )
+    if not review:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Review not found"
+        )
+
+    # Counted in memory and written to the database in periodic batches
+    helpful_votes.add(review_id, current_user.id)
+
+    return {"message": "Helpful vote recorded", "data": {"review_id": review_id}}
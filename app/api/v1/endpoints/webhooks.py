@@ -0,0 +1,45 @@
+from typing import Optional
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, status
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.api.deps import get_db
+from app.utils.payments import (
+    WebhookEvent,
+    WebhookVerificationError,
+    store_payment_event,
+    verify_paypal_webhook,
+    verify_stripe_webhook,
+)
+
+router = APIRouter()
+
+
+async def acknowledge(db: Session, event: WebhookEvent) -> dict:
+    # Events are applied to orders by the payment event worker
+    stored = await run_in_threadpool(store_payment_event, db, event)
+    return {"received": True, "duplicate": not stored}
+
+
+@router.post("/stripe", summary="Receive Stripe webhook")
+async def stripe_webhook(
+    request: Request,
+    stripe_signature: Optional[str] = Header(None, alias="Stripe-Signature"),
+    db: Session = Depends(get_db),
+):
+    body = await request.body()
+    try:
+        event = verify_stripe_webhook(body, stripe_signature)
+    except WebhookVerificationError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return await acknowledge(db, event)
+
+
+@router.post("/paypal", summary="Receive PayPal webhook")
+async def paypal_webhook(request: Request, db: Session = Depends(get_db)):
+    body = await request.body()
+    try:
+        # Verification fetches PayPal's signing certificate
+        event = await run_in_threadpool(verify_paypal_webhook, body, request.headers)
+    except WebhookVerificationError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    return await acknowledge(db, event)
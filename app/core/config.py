@@ -17,3 +17,17 @@ class StorageSettings(BaseSettings):
     ALIYUN_ACCESS_KEY_SECRET: str = ""
     ALIYUN_ENDPOINT: str = ""
     ALIYUN_BUCKET_NAME: str = ""
+
+
+class CartStoreSettings(BaseSettings):
+    """Cart store settings"""
+
+    CART_STORE_TYPE: str = "memory"  # Option: memory, redis
+
+    # Redis configuration
+    REDIS_URL: str = "redis://localhost:6379/0"
+    REDIS_KEY_PREFIX: str = "cart:"
+
+    # Days an untouched cart is kept in the store, user carts are reloaded
+    # from the database afterwards while guest carts are gone
+    CART_TTL_DAYS: int = 30
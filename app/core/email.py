@@ -1,8 +1,20 @@
+import threading
 from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
 from pydantic import EmailStr
-from jinja2 import Environment, select_autoescape, PackageLoader
+from jinja2 import (
+    Environment,
+    FileSystemBytecodeCache,
+    PackageLoader,
+    Template,
+    select_autoescape,
+)
+from markupsafe import Markup
+from starlette.concurrency import run_in_threadpool
+from app.core.logger import logger
 from app.core.settings import settings
 from datetime import datetime
+from functools import lru_cache
+from typing import Dict
 
 email_conf = ConnectionConfig(
     MAIL_USERNAME=settings.MAIL_USERNAME,
@@ -11,22 +23,81 @@ email_conf = ConnectionConfig(
     MAIL_PORT=settings.MAIL_PORT,
     MAIL_SERVER=settings.MAIL_SERVER,
     MAIL_FROM_NAME=settings.MAIL_FROM_NAME,
-    MAIL_STARTTLS=True,
-    MAIL_SSL_TLS=False,
-    USE_CREDENTIALS=True,
+    MAIL_STARTTLS=settings.MAIL_STARTTLS,
+    MAIL_SSL_TLS=settings.MAIL_SSL_TLS,
+    USE_CREDENTIALS=settings.MAIL_USE_CREDENTIALS,
 )
 
 fastmail = FastMail(email_conf)
 
+# Compiled templates are written to the bytecode cache, so restarted
+# workers load them instead of compiling the sources again
 env = Environment(
     loader=PackageLoader("app", "templates/email"),
     autoescape=select_autoescape(["html", "xml"]),
+    bytecode_cache=FileSystemBytecodeCache(settings.EMAIL_TEMPLATE_CACHE_DIR or None),
 )
 
 
+@lru_cache(maxsize=None)
+def email_fragment(name: str) -> Markup:
+    """Static fragment under fragments/, rendered once per process"""
+    return Markup(env.get_template(f"fragments/{name}.html").render())
+
+
+env.globals["fragment"] = email_fragment
+
+
+class EmailTemplates:
+    """Registry of the compiled email templates
+
+    load compiles every template once, and renders then look templates up
+    in a dict instead of going through the loader, which checks the
+    source file on every get_template call.
+    """
+
+    def __init__(self, environment: Environment):
+        self.env = environment
+        self._templates: Dict[str, Template] = {}
+        self._lock = threading.Lock()
+
+    def load(self) -> int:
+        """Compile all templates, returns the number of templates"""
+        templates = {
+            name: self.env.get_template(name)
+            for name in self.env.list_templates(extensions=["html"])
+        }
+        with self._lock:
+            self._templates = templates
+        email_fragment.cache_clear()
+        return len(templates)
+
+    def get(self, template_name: str) -> Template:
+        name = f"{template_name}.html"
+        template = self._templates.get(name)
+        if template is None:
+            template = self.env.get_template(name)
+            with self._lock:
+                self._templates[name] = template
+        return template
+
+
+email_templates = EmailTemplates(env)
+
+
+def load_email_templates() -> None:
+    """Precompile the email templates, run at startup"""
+    count = email_templates.load()
+    logger.info(f"Compiled {count} email templates")
+
+
+def render_email(template_name: str, data: dict) -> str:
+    return email_templates.get(template_name).render(**data)
+
+
 async def send_email(email_to: EmailStr, subject: str, template_name: str, data: dict):
-    template = env.get_template(f"{template_name}.html")
-    html = template.render(**data)
+    # Rendering is CPU bound, keep it off the event loop
+    html = await run_in_threadpool(render_email, template_name, data)
 
     message = MessageSchema(
         subject=subject, recipients=[email_to], body=html, subtype="html"
@@ -38,13 +109,16 @@ async def send_email(email_to: EmailStr, subject: str, template_name: str, data:
 async def send_payment_confirmation_email(
     email_to, username, order_number, amount, plan_name, expiry_date
 ):
-    template = env.get_template("payment_confirmation.html")
-    html = template.render(
-        username=username,
-        order_number=order_number,
-        amount=amount,
-        plan_name=plan_name,
-        expiry_date=expiry_date,
+    html = await run_in_threadpool(
+        render_email,
+        "payment_confirmation",
+        {
+            "username": username,
+            "order_number": order_number,
+            "amount": amount,
+            "plan_name": plan_name,
+            "expiry_date": expiry_date,
+        },
     )
     subject = "Success Payment Confirmation"
     message = MessageSchema(
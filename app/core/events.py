@@ -0,0 +1,28 @@
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+# Event names
+ORDER_CREATED = "order.created"
+ORDER_STATUS_CHANGED = "order.status_changed"
+PRODUCT_CHANGED = "product.changed"
+USER_REGISTERED = "user.registered"
+USER_UPDATED = "user.updated"
+
+# Handlers may return an awaitable, the outbox dispatcher awaits it
+EventHandler = Callable[[str, dict], object]
+
+_handlers: Dict[str, List[EventHandler]] = defaultdict(list)
+
+
+def subscribe(event: str, handler: EventHandler) -> None:
+    """Call handler(event, payload) for every outbox event of this name
+
+    Handlers are subscribed in app.utils.event_handlers, which the API and
+    the outbox dispatcher both import.
+    """
+    _handlers[event].append(handler)
+
+
+def handlers(event: str) -> List[EventHandler]:
+    """Handlers subscribed to an event"""
+    return list(_handlers.get(event, ()))
@@ -0,0 +1,107 @@
+import os
+import socket
+import threading
+import time
+import zlib
+from typing import Optional
+from app.core.logger import logger
+from app.core.settings import settings
+
+# Crockford base32, no I, L, O or U so numbers are easy to read out
+BASE32_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+# 2024-01-01T00:00:00Z in milliseconds
+ID_EPOCH_MS = 1704067200000
+WORKER_ID_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_ID_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+# 63 bit ids fit in 13 base32 characters
+ENCODED_ID_LENGTH = 13
+
+
+def encode_base32(value: int, length: int = ENCODED_ID_LENGTH) -> str:
+    """Encode a non-negative integer as fixed width Crockford base32
+
+    Fixed width keeps string order the same as numeric order.
+    """
+    chars = []
+    for _ in range(length):
+        value, index = divmod(value, 32)
+        chars.append(BASE32_ALPHABET[index])
+    return "".join(reversed(chars))
+
+
+class SnowflakeGenerator:
+    """Time ordered 63 bit id generator
+
+    Ids are made of milliseconds since ID_EPOCH_MS, the worker id and a
+    per-millisecond sequence, so they are unique across workers with
+    distinct worker ids, increase monotonically within a worker and need
+    no database round trip.
+    """
+
+    def __init__(self, worker_id: int):
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"Worker id must be between 0 and {MAX_WORKER_ID}")
+        self.worker_id = worker_id
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._sequence = 0
+
+    def next_id(self) -> int:
+        with self._lock:
+            now_ms = time.time_ns() // 1_000_000 - ID_EPOCH_MS
+            # Never go back in time if the wall clock is adjusted
+            if now_ms <= self._last_ms:
+                now_ms = self._last_ms
+                self._sequence = (self._sequence + 1) & MAX_SEQUENCE
+                if self._sequence == 0:
+                    # Sequence exhausted, borrow the next millisecond
+                    now_ms += 1
+            else:
+                self._sequence = 0
+            self._last_ms = now_ms
+
+            return (
+                (now_ms << (WORKER_ID_BITS + SEQUENCE_BITS))
+                | (self.worker_id << SEQUENCE_BITS)
+                | self._sequence
+            )
+
+
+def default_worker_id(
+    worker_id: Optional[int] = settings.WORKER_ID,
+    environment: str = settings.ENVIRONMENT,
+) -> int:
+    """Worker id of this process
+
+    Deployments should set a unique WORKER_ID per process. Without it the
+    id is derived from the host name and the process id, container
+    replicas all run as the same process id but have their own host name.
+    Derived ids of different processes can still collide, so outside
+    development a missing WORKER_ID is logged as an error.
+    """
+    if worker_id is not None:
+        return worker_id
+    derived = (
+        zlib.crc32(f"{socket.gethostname()}:{os.getpid()}".encode()) & MAX_WORKER_ID
+    )
+    if environment == "development":
+        logger.warning(f"WORKER_ID is not set, using derived worker id {derived}")
+    else:
+        logger.error(
+            f"WORKER_ID is not set, using worker id {derived} derived from the "
+            "host name and process id. Order numbers of processes with the "
+            f"same derived id collide, set a unique WORKER_ID (0-{MAX_WORKER_ID}) "
+            "per process."
+        )
+    return derived
+
+
+id_generator = SnowflakeGenerator(default_worker_id())
+
+
+def generate_order_number() -> str:
+    """Order number such as ORD-0G5QK1ZB0C000"""
+    return f"ORD-{encode_base32(id_generator.next_id())}"
@@ -36,15 +36,21 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     return encoded_jwt
 
 
-# Get current user
-def get_current_user(db: Session, token: str) -> Optional[User]:
+# Get the user ID of a valid token
+def get_token_user_id(token: str) -> Optional[str]:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: int = payload.get("sub")
-        if user_id is None:
-            return None
     except JWTError:
         return None
+    user_id = payload.get("sub")
+    return None if user_id is None else str(user_id)
+
+
+# Get current user
+def get_current_user(db: Session, token: str) -> Optional[User]:
+    user_id = get_token_user_id(token)
+    if user_id is None:
+        return None
 
     user = db.query(User).filter(User.id == user_id).first()
     return user
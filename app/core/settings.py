@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 
@@ -12,6 +13,30 @@ class Settings(BaseSettings):
     # Database settings
     DATABASE_URL: str
 
+    # "development" quiets warnings meant for deployments, such as a missing
+    # WORKER_ID
+    ENVIRONMENT: str = "production"
+
+    # Id generator worker id (0-1023), must be unique per running process.
+    # When unset it is derived from the host name and process id, which is
+    # logged as an error outside development
+    WORKER_ID: Optional[int] = None
+
+    # Unpaid card and PayPal orders holding reserved stock are cancelled and
+    # their stock released after this many minutes, 0 disables expiry
+    ORDER_RESERVATION_TTL_MINUTES: int = 0
+
+    # Delivered, cancelled and deleted orders are moved to the archive
+    # tables after this many days, 0 disables archiving
+    ORDER_ARCHIVE_AFTER_DAYS: int = 365
+
+    # Deliver outbox events from the API process, turn off when running
+    # python -m app.utils.outbox as a separate dispatcher
+    OUTBOX_DISPATCH_IN_API: bool = True
+
+    # Hours responses of requests with an Idempotency-Key are replayed
+    IDEMPOTENCY_KEY_TTL_HOURS: int = 24
+
     # Email settings
     # SERVER_EMAIL: str
     MAIL_USERNAME: str
@@ -20,8 +45,23 @@ class Settings(BaseSettings):
     MAIL_PORT: int = 587
     MAIL_SERVER: str
     MAIL_FROM_NAME: str
+    MAIL_STARTTLS: bool = True
+    MAIL_SSL_TLS: bool = False
+    MAIL_USE_CREDENTIALS: bool = True
+    # SMTP connections kept open by the email worker, bounds concurrent sends
+    MAIL_POOL_SIZE: int = 4
+    # Run the email worker in the API process, turn off when running
+    # python -m app.utils.email_queue separately
+    EMAIL_WORKER_IN_API: bool = True
+    # Directory of the compiled email template cache, empty uses the system
+    # temp directory
+    EMAIL_TEMPLATE_CACHE_DIR: str = ""
     FRONTEND_URL: str = "http://localhost:3000"
 
+    # Currency order totals are charged in, payments in another currency or
+    # for another amount do not mark an order paid
+    ORDER_CURRENCY: str = "USD"
+
     # Stripe settings
     STRIPE_SECRET_KEY: str
     STRIPE_PUBLISHABLE_KEY: str
@@ -31,6 +71,8 @@ class Settings(BaseSettings):
     PAYPAL_CLIENT_ID: str
     PAYPAL_CLIENT_SECRET: str
     PAYPAL_SANDBOX: bool = True
+    # ID of the webhook registered with PayPal, webhooks are rejected when empty
+    PAYPAL_WEBHOOK_ID: str = ""
 
     # API URL
     API_URL: str
@@ -0,0 +1,72 @@
+from typing import List
+from sqlalchemy import Index, inspect, text
+from app.core.logger import logger
+from app.db.database import Base, engine
+import app.models.order  # noqa: F401, registers the order tables
+
+# Indexes declared on tables that already exist in deployed databases.
+# create_all skips existing tables, so run python -m app.db.indexes once
+# per deploy to build them with CREATE INDEX CONCURRENTLY, which does not
+# block writes to the table while it runs.
+ONLINE_INDEXES = (
+    "ix_orders_created_id",
+    "ix_orders_user_created_id",
+    "ix_orders_status_created_id",
+    "ix_orders_updated_at",
+)
+
+
+def online_indexes() -> List[Index]:
+    indexes = {
+        index.name: index
+        for table in Base.metadata.tables.values()
+        for index in table.indexes
+    }
+    return [indexes[name] for name in ONLINE_INDEXES]
+
+
+def create_index_sql(index: Index) -> str:
+    columns = ", ".join(column.name for column in index.columns)
+    return (
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {index.name} "
+        f"ON {index.table.name} ({columns})"
+    )
+
+
+def create_online_indexes() -> int:
+    """Build missing or invalid indexes, returns the number built
+
+    Tables that do not exist yet are skipped, create_all builds them with
+    their indexes. A concurrent build that was interrupted leaves an invalid index behind,
+    which is dropped and built again.
+    """
+    built = 0
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        for index in online_indexes():
+            if not inspect(conn).has_table(index.table.name):
+                continue
+            valid = conn.execute(
+                text(
+                    "SELECT i.indisvalid FROM pg_index i "
+                    "JOIN pg_class c ON c.oid = i.indexrelid "
+                    "WHERE c.relname = :name"
+                ),
+                {"name": index.name},
+            ).scalar()
+            if valid:
+                continue
+            if valid is False:
+                conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index.name}"))
+            logger.info(f"Creating index {index.name} on {index.table.name}")
+            conn.execute(text(create_index_sql(index)))
+            built += 1
+    return built
+
+
+def main():
+    built = create_online_indexes()
+    logger.info(f"Created {built} indexes")
+
+
+if __name__ == "__main__":
+    main()
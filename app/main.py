@@ -1,8 +1,25 @@
+import asyncio
 from fastapi import FastAPI
 from app.api.v1.api import api_router
 from fastapi.middleware.cors import CORSMiddleware
+from app.core.email import load_email_templates
+from app.core.settings import settings
 from app.db.database import Base, engine, SessionLocal
 from app.init.init_db import populate_initial_data
+from app.utils.carts import CART_FLUSH_INTERVAL, flush_carts
+from app.utils import event_handlers  # noqa: F401, subscribes the handlers
+from app.utils.email_queue import run_email_worker
+from app.utils.idempotency import (
+    IDEMPOTENCY_PURGE_INTERVAL,
+    purge_expired_idempotency_keys,
+)
+from app.utils.order_archive import ORDER_ARCHIVE_INTERVAL, archive_orders_job
+from app.utils.order_lifecycle import ORDER_EXPIRY_INTERVAL, expire_pending_orders_job
+from app.utils.outbox import OUTBOX_POLL_INTERVAL, dispatch_outbox_job
+from app.utils.payments import PAYMENT_EVENT_INTERVAL, process_payment_events_job
+from app.utils.periodic import run_periodically
+from app.utils.rates import load_rate_cache
+from app.utils.vote_buffer import HELPFUL_VOTE_FLUSH_INTERVAL, flush_helpful_votes
 
 app = FastAPI(
     title="FastAPI Ecommerce API",
@@ -33,6 +50,51 @@ Base.metadata.create_all(bind=engine)
 #         print(f"Error initializing database: {e}")
 
 
+# Periodic background jobs running inside the API process
+PERIODIC_JOBS = [
+    (flush_helpful_votes, HELPFUL_VOTE_FLUSH_INTERVAL),
+    (expire_pending_orders_job, ORDER_EXPIRY_INTERVAL),
+    (archive_orders_job, ORDER_ARCHIVE_INTERVAL),
+    (purge_expired_idempotency_keys, IDEMPOTENCY_PURGE_INTERVAL),
+    (process_payment_events_job, PAYMENT_EVENT_INTERVAL),
+    (flush_carts, CART_FLUSH_INTERVAL),
+]
+if settings.OUTBOX_DISPATCH_IN_API:
+    PERIODIC_JOBS.append((dispatch_outbox_job, OUTBOX_POLL_INTERVAL))
+background_jobs = []
+
+
+@app.on_event("startup")
+async def start_background_jobs():
+    for func, interval in PERIODIC_JOBS:
+        background_jobs.append(asyncio.create_task(run_periodically(func, interval)))
+    if settings.EMAIL_WORKER_IN_API:
+        background_jobs.append(asyncio.create_task(run_email_worker()))
+
+
+@app.on_event("startup")
+async def load_rate_tables():
+    # Checkout quotes read shipping zones and tax rates from memory
+    load_rate_cache()
+
+
+@app.on_event("startup")
+async def precompile_email_templates():
+    # Compile templates once instead of on the first email of every worker
+    load_email_templates()
+
+
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    for job in background_jobs:
+        job.cancel()
+    background_jobs.clear()
+
+    # Do not lose buffered votes and cart changes on shutdown
+    flush_helpful_votes()
+    flush_carts()
+
+
 # Include API routes
 app.include_router(api_router)
 
@@ -0,0 +1,41 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index, JSON, Text
+from datetime import datetime
+from app.db.database import Base
+
+
+class QueuedEmail(Base):
+    """Queued email model
+
+    Email written in the transaction that requests it and sent by the
+    email worker. Sent emails are deleted, emails that keep failing stay
+    with failed_at set.
+    """
+
+    __tablename__ = "email_queue"
+    __table_args__ = (
+        # The worker claims due emails in order, failed emails are skipped
+        Index(
+            "ix_email_queue_due",
+            "available_at",
+            "id",
+            postgresql_where="failed_at IS NULL",
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    email_to = Column(String(255), nullable=False, comment="recipient")
+    subject = Column(String(255), nullable=False, comment="subject")
+    template_name = Column(String(100), nullable=False, comment="template name")
+    data = Column(JSON, nullable=False, comment="template data")
+    attempts = Column(Integer, default=0, nullable=False, comment="failed attempts")
+    last_error = Column(Text, nullable=True, comment="last send error")
+    available_at = Column(
+        DateTime,
+        default=datetime.utcnow,
+        nullable=False,
+        comment="time the email is due, pushed back while claimed or after failures",
+    )
+    failed_at = Column(DateTime, nullable=True, comment="time sending was given up")
+    created_at = Column(
+        DateTime, default=datetime.utcnow, nullable=False, comment="creation time"
+    )
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, String, DateTime, LargeBinary
+from datetime import datetime
+from app.db.database import Base
+
+
+class IdempotencyKey(Base):
+    """Idempotency key model
+
+    Store the response of a request sent with an Idempotency-Key header, so
+    a retry of the same request replays it instead of running it again.
+    A row without status_code marks a request that is still in progress,
+    created_at starts its lease.
+    """
+
+    __tablename__ = "idempotency_keys"
+
+    owner = Column(String(64), primary_key=True, comment="user ID of the caller")
+    scope = Column(String(255), primary_key=True, comment="request method and path")
+    key = Column(String(255), primary_key=True, comment="client idempotency key")
+    request_hash = Column(String(64), nullable=False, comment="hash of request body")
+    status_code = Column(Integer, nullable=True, comment="response status code")
+    media_type = Column(String(100), nullable=True, comment="response content type")
+    response_body = Column(LargeBinary, nullable=True, comment="response body")
+    created_at = Column(
+        DateTime, default=datetime.utcnow, nullable=False, comment="creation time"
+    )
+    expires_at = Column(
+        DateTime, index=True, nullable=False, comment="time the key can be reused"
+    )
@@ -0,0 +1,29 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from datetime import datetime
+from app.db.database import Base
+
+
+class JobCheckpoint(Base):
+    """Job checkpoint model
+
+    Store how far an incremental batch job has processed, so the next run
+    only picks up new rows.
+    """
+
+    __tablename__ = "job_checkpoints"
+
+    name = Column(String(100), primary_key=True, comment="job name")
+    last_id = Column(Integer, nullable=True, comment="last processed row ID")
+    last_timestamp = Column(
+        DateTime, nullable=True, comment="last processed row timestamp"
+    )
+    created_at = Column(
+        DateTime, default=datetime.utcnow, nullable=False, comment="creation time"
+    )
+    updated_at = Column(
+        DateTime,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        nullable=False,
+        comment="update time",
+    )
@@ -7,6 +7,7 @@ from sqlalchemy import (
     Boolean,
     Enum,
     DECIMAL,
+    Index,
 )
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -35,8 +36,32 @@ class PaymentMethod(enum.Enum):
     BANK_TRANSFER = "Bank Transfer"
 
 
+ORDER_ENUM_FIELDS = {
+    "status": OrderStatus,
+    "payment_status": PaymentStatus,
+    "payment_method": PaymentMethod,
+}
+
+
+def coerce_order_enums(data: dict) -> dict:
+    """Convert schema enum values in order data to the model enums"""
+    for field, enum_class in ORDER_ENUM_FIELDS.items():
+        value = data.get(field)
+        if value is not None and not isinstance(value, enum_class):
+            data[field] = enum_class(getattr(value, "value", value))
+    return data
+
+
 class Order(Base):
     __tablename__ = "orders"
+    # Keyset pagination of order lists, newest first
+    __table_args__ = (
+        Index("ix_orders_created_id", "created_at", "id"),
+        Index("ix_orders_user_created_id", "user_id", "created_at", "id"),
+        Index("ix_orders_status_created_id", "status", "created_at", "id"),
+        # Orders changed since the last run of the recommendation job
+        Index("ix_orders_updated_at", "updated_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -77,3 +102,96 @@ class OrderItem(Base):
 
     order = relationship("Order", back_populates="items")
     product = relationship("Product")
+
+
+class OrderArchive(Base):
+    """Archived order model
+
+    Delivered, cancelled and deleted orders past the archive age are moved
+    here with their items, so the indexes of orders only cover recent and
+    open orders. Columns mirror orders and rows keep their order ID.
+    """
+
+    __tablename__ = "orders_archive"
+    __table_args__ = (
+        Index("ix_orders_archive_created_id", "created_at", "id"),
+        Index("ix_orders_archive_user_created_id", "user_id", "created_at", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, comment="order ID")
+    user_id = Column(Integer, ForeignKey("users.id"), comment="user ID")
+    order_number = Column(String(100), unique=True, comment="order number")
+    total_amount = Column(DECIMAL, nullable=False, comment="total amount")
+    shipping_fee = Column(DECIMAL, nullable=True, comment="shipping fee")
+    status = Column(Enum(OrderStatus), nullable=False, comment="order status")
+    payment_status = Column(
+        Enum(PaymentStatus), nullable=False, comment="payment status"
+    )
+    payment_method = Column(
+        Enum(PaymentMethod), nullable=True, comment="payment method"
+    )
+    shipping_address_id = Column(
+        Integer, ForeignKey("addresses.id"), comment="shipping address ID"
+    )
+    billing_address_id = Column(
+        Integer, ForeignKey("addresses.id"), comment="billing address ID"
+    )
+    is_active = Column(Boolean, comment="whether it is active")
+    created_at = Column(DateTime, comment="order creation time")
+    updated_at = Column(DateTime, comment="order update time")
+    archived_at = Column(
+        DateTime, default=datetime.utcnow, nullable=False, comment="archive time"
+    )
+
+    items = relationship("OrderItemArchive", back_populates="order")
+
+
+class OrderItemArchive(Base):
+    """Archived order item model, columns mirror order_items"""
+
+    __tablename__ = "order_items_archive"
+
+    id = Column(Integer, primary_key=True, comment="order item ID")
+    order_id = Column(
+        Integer, ForeignKey("orders_archive.id"), index=True, comment="order ID"
+    )
+    product_id = Column(Integer, ForeignKey("products.id"), comment="product ID")
+    product_name = Column(String(100), nullable=False, comment="product name")
+    product_sku = Column(String(100), nullable=True, comment="product SKU")
+    quantity = Column(Integer, nullable=False, comment="quantity")
+    price = Column(DECIMAL, nullable=False, comment="unit price")
+    total_price = Column(DECIMAL, nullable=False, comment="quantity * price")
+    is_active = Column(Boolean, comment="whether it is active")
+    created_at = Column(DateTime, comment="creation time")
+    updated_at = Column(DateTime, comment="update time")
+
+    order = relationship("OrderArchive", back_populates="items")
+
+
+class StockReservation(Base):
+    """Stock reservation model
+
+    Stock taken from a product or variant for an order line, so exactly the
+    reserved quantity is put back when the order is cancelled or expires.
+    """
+
+    __tablename__ = "stock_reservations"
+
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(
+        Integer, ForeignKey("orders.id"), index=True, nullable=False, comment="order ID"
+    )
+    product_id = Column(
+        Integer, ForeignKey("products.id"), nullable=False, comment="product ID"
+    )
+    variant_id = Column(
+        Integer,
+        ForeignKey("product_variants.id"),
+        nullable=True,
+        comment="variant ID, stock is taken from the product when empty",
+    )
+    quantity = Column(Integer, nullable=False, comment="reserved quantity")
+    created_at = Column(
+        DateTime, default=datetime.utcnow, nullable=False, comment="creation time"
+    )
+    released_at = Column(DateTime, nullable=True, comment="time the stock was put back")
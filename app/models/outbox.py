@@ -0,0 +1,39 @@
+from sqlalchemy import Column, Integer, String, DateTime, Index, JSON, Text
+from datetime import datetime
+from app.db.database import Base
+
+
+class OutboxEvent(Base):
+    """Outbox event model
+
+    Side effects of a change, written in the transaction of the change and
+    delivered to event handlers by the outbox dispatcher. Delivered events
+    are deleted, events that keep failing stay with failed_at set.
+    """
+
+    __tablename__ = "outbox"
+    __table_args__ = (
+        # The dispatcher claims due events in order, failed events are skipped
+        Index(
+            "ix_outbox_due",
+            "available_at",
+            "id",
+            postgresql_where="failed_at IS NULL",
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    event = Column(String(100), nullable=False, comment="event name")
+    payload = Column(JSON, nullable=False, comment="event payload")
+    attempts = Column(Integer, default=0, nullable=False, comment="failed attempts")
+    last_error = Column(Text, nullable=True, comment="last delivery error")
+    available_at = Column(
+        DateTime,
+        default=datetime.utcnow,
+        nullable=False,
+        comment="time the event is due, pushed back after failures",
+    )
+    failed_at = Column(DateTime, nullable=True, comment="time delivery was given up")
+    created_at = Column(
+        DateTime, default=datetime.utcnow, nullable=False, comment="creation time"
+    )
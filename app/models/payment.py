@@ -0,0 +1,63 @@
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    DateTime,
+    Enum,
+    Index,
+    JSON,
+    Text,
+    UniqueConstraint,
+)
+from datetime import datetime
+from app.db.database import Base
+import enum
+
+
+class PaymentProvider(enum.Enum):
+    STRIPE = "Stripe"
+    PAYPAL = "PayPal"
+
+
+class PaymentEventStatus(enum.Enum):
+    PENDING = "Pending"
+    PROCESSED = "Processed"
+    IGNORED = "Ignored"
+    FAILED = "Failed"
+
+
+class PaymentEvent(Base):
+    """Payment event model
+
+    Inbox of verified provider webhooks. Events are stored as received and
+    acknowledged right away, a background worker applies them to orders.
+    Redeliveries of an event hit the unique constraint and are dropped.
+    """
+
+    __tablename__ = "payment_events"
+    __table_args__ = (
+        UniqueConstraint("provider", "event_id", name="uq_payment_event_provider_id"),
+        # The worker scans pending events in arrival order
+        Index("ix_payment_events_status_id", "status", "id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    provider = Column(Enum(PaymentProvider), nullable=False, comment="provider")
+    event_id = Column(String(255), nullable=False, comment="provider event ID")
+    event_type = Column(String(100), nullable=False, comment="provider event type")
+    order_id = Column(
+        Integer, nullable=True, comment="order ID referenced by the event"
+    )
+    payload = Column(JSON, nullable=False, comment="raw event body")
+    status = Column(
+        Enum(PaymentEventStatus),
+        default=PaymentEventStatus.PENDING,
+        nullable=False,
+        comment="processing status",
+    )
+    attempts = Column(Integer, default=0, nullable=False, comment="failed attempts")
+    error = Column(Text, nullable=True, comment="last processing error")
+    received_at = Column(
+        DateTime, default=datetime.utcnow, nullable=False, comment="receive time"
+    )
+    processed_at = Column(DateTime, nullable=True, comment="processing time")
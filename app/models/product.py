@@ -8,8 +8,10 @@ from sqlalchemy import (
     Date,
     DECIMAL,
     Enum as SQLEnum,  # Rename Enum to SQLEnum
+    func,
+    select,
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import column_property, relationship
 from datetime import datetime
 from app.db.database import Base
 from enum import Enum
@@ -112,6 +114,9 @@ class Product(Base):
         "ProductVariant", back_populates="product", cascade="all, delete-orphan"
     )
     reviews = relationship("ProductReview", back_populates="product")
+    rating_stats = relationship(
+        "ProductRatingStats", back_populates="product", uselist=False
+    )
 
 
 class ProductImage(Base):
@@ -305,3 +310,95 @@ class ProductReview(Base):
 
     product = relationship("Product", back_populates="reviews")
     user = relationship("User", back_populates="reviews")
+
+
+class ReviewHelpfulVote(Base):
+    """Review helpful vote model
+
+    One row per user who marked a review as helpful, used to deduplicate
+    votes before they are added to ProductReview.helpful_votes.
+    """
+
+    __tablename__ = "review_helpful_votes"
+
+    review_id = Column(
+        Integer,
+        ForeignKey("product_reviews.id"),
+        primary_key=True,
+        comment="related review ID",
+    )
+    user_id = Column(
+        Integer, ForeignKey("users.id"), primary_key=True, comment="voter user ID"
+    )
+    created_at = Column(
+        DateTime, default=datetime.utcnow, nullable=False, comment="creation time"
+    )
+
+
+class ProductRatingStats(Base):
+    """Product rating stats model
+
+    Aggregated review ratings per product, kept in sync with reviews so
+    listings can sort and filter by rating without aggregating reviews.
+    """
+
+    __tablename__ = "product_rating_stats"
+
+    product_id = Column(
+        Integer, ForeignKey("products.id"), primary_key=True, comment="product ID"
+    )
+    rating_count = Column(Integer, nullable=False, default=0, comment="review count")
+    rating_sum = Column(Integer, nullable=False, default=0, comment="sum of ratings")
+    rating_1 = Column(Integer, nullable=False, default=0, comment="1 star reviews")
+    rating_2 = Column(Integer, nullable=False, default=0, comment="2 star reviews")
+    rating_3 = Column(Integer, nullable=False, default=0, comment="3 star reviews")
+    rating_4 = Column(Integer, nullable=False, default=0, comment="4 star reviews")
+    rating_5 = Column(Integer, nullable=False, default=0, comment="5 star reviews")
+    updated_at = Column(
+        DateTime,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        nullable=False,
+        comment="update time",
+    )
+
+    product = relationship("Product", back_populates="rating_stats")
+
+
+class ProductStockShard(Base):
+    """Product stock shard model
+
+    Stock of a high-demand product split across several counter rows, so
+    concurrent orders decrement different rows instead of queueing on the
+    product row lock. A product is sharded while it has shard rows; its
+    available stock is then the sum of the shards plus Product.stock, which
+    keeps receiving restocks until the next rebalance.
+    """
+
+    __tablename__ = "product_stock_shards"
+
+    product_id = Column(
+        Integer, ForeignKey("products.id"), primary_key=True, comment="product ID"
+    )
+    shard_no = Column(Integer, primary_key=True, comment="shard number")
+    stock = Column(Integer, nullable=False, default=0, comment="shard stock quantity")
+    updated_at = Column(
+        DateTime,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        nullable=False,
+        comment="update time",
+    )
+
+
+# Stock available for sale, Product.stock plus the shards of a sharded product.
+# Deferred so order and cart loads do not pay for the subquery, queries that
+# show stock undefer it.
+Product.available_stock = column_property(
+    func.coalesce(Product.stock, 0)
+    + select(func.coalesce(func.sum(ProductStockShard.stock), 0))
+    .where(ProductStockShard.product_id == Product.id)
+    .correlate_except(ProductStockShard)
+    .scalar_subquery(),
+    deferred=True,
+)
@@ -0,0 +1,150 @@
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    DateTime,
+    ForeignKey,
+    Boolean,
+    Enum,
+    DECIMAL,
+    UniqueConstraint,
+)
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.db.database import Base
+import enum
+
+
+class PromotionType(enum.Enum):
+    PERCENT_OFF = "Percent Off"
+    AMOUNT_OFF = "Amount Off"
+    BUY_X_GET_Y = "Buy X Get Y"
+
+
+class PromotionTargetType(enum.Enum):
+    PRODUCT = "Product"
+    CATEGORY = "Category"
+    BRAND = "Brand"
+
+
+class Promotion(Base):
+    """Promotion model
+
+    A discount rule. Rules without a code apply automatically, rules with a
+    code are coupons. A rule applies to the cart lines matching any of its
+    targets, or to all lines when it has no targets.
+    """
+
+    __tablename__ = "promotions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), nullable=False, comment="promotion name")
+    description = Column(String(255), nullable=True, comment="description")
+    code = Column(
+        String(50),
+        unique=True,
+        index=True,
+        nullable=True,
+        comment="coupon code, automatic promotion when empty",
+    )
+    type = Column(Enum(PromotionType), nullable=False, comment="promotion type")
+    value = Column(
+        DECIMAL(10, 2),
+        nullable=False,
+        comment="percent off, amount off, or percent off the free items",
+    )
+    buy_quantity = Column(Integer, nullable=True, comment="units to buy (buy X)")
+    get_quantity = Column(Integer, nullable=True, comment="discounted units (get Y)")
+    min_subtotal = Column(
+        DECIMAL(10, 2), nullable=True, comment="minimum subtotal of matching lines"
+    )
+    max_discount = Column(
+        DECIMAL(10, 2), nullable=True, comment="maximum discount per order"
+    )
+    usage_limit = Column(Integer, nullable=True, comment="maximum number of orders")
+    used_count = Column(
+        Integer,
+        nullable=False,
+        default=0,
+        comment="orders using it, only counted when usage_limit is set",
+    )
+    priority = Column(
+        Integer, nullable=False, default=0, comment="higher priority applies first"
+    )
+    is_exclusive = Column(
+        Boolean, default=False, comment="whether it cannot combine with others"
+    )
+    starts_at = Column(DateTime, nullable=True, comment="start time")
+    ends_at = Column(DateTime, nullable=True, comment="end time")
+    is_active = Column(Boolean, default=True, comment="whether it is active")
+    created_at = Column(
+        DateTime, default=datetime.utcnow, nullable=False, comment="creation time"
+    )
+    updated_at = Column(
+        DateTime,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        nullable=False,
+        comment="update time",
+    )
+
+    targets = relationship(
+        "PromotionTarget", back_populates="promotion", cascade="all, delete-orphan"
+    )
+
+
+class PromotionTarget(Base):
+    """Product, category or brand a promotion applies to
+
+    A category target also covers all of its descendant categories.
+    """
+
+    __tablename__ = "promotion_targets"
+    __table_args__ = (
+        UniqueConstraint(
+            "promotion_id", "target_type", "target_id", name="uq_promotion_target"
+        ),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    promotion_id = Column(
+        Integer,
+        ForeignKey("promotions.id", ondelete="CASCADE"),
+        index=True,
+        nullable=False,
+        comment="promotion ID",
+    )
+    target_type = Column(
+        Enum(PromotionTargetType), nullable=False, comment="target type"
+    )
+    target_id = Column(Integer, nullable=False, comment="product, category or brand ID")
+
+    promotion = relationship("Promotion", back_populates="targets")
+
+
+class OrderDiscount(Base):
+    """Discount a promotion gave to an order"""
+
+    __tablename__ = "order_discounts"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # No foreign key, rows stay when the order moves to orders_archive
+    order_id = Column(Integer, index=True, nullable=False, comment="order ID")
+    promotion_id = Column(
+        Integer,
+        ForeignKey("promotions.id"),
+        index=True,
+        nullable=False,
+        comment="promotion ID",
+    )
+    code = Column(String(50), nullable=True, comment="coupon code used")
+    amount = Column(DECIMAL(10, 2), nullable=False, comment="discount amount")
+    counted = Column(
+        Boolean,
+        default=False,
+        nullable=False,
+        comment="whether the use is counted in the promotion's used_count",
+    )
+    created_at = Column(
+        DateTime, default=datetime.utcnow, nullable=False, comment="creation time"
+    )
@@ -0,0 +1,74 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, Index
+from sqlalchemy.orm import relationship
+from datetime import datetime
+from app.db.database import Base
+
+
+class ProductCoPurchase(Base):
+    """Product co-purchase count model
+
+    Number of orders containing both products, stored in both directions.
+    The row where product_id equals related_product_id holds the number of
+    orders containing the product.
+    """
+
+    __tablename__ = "product_co_purchases"
+
+    product_id = Column(
+        Integer, ForeignKey("products.id"), primary_key=True, comment="product ID"
+    )
+    related_product_id = Column(
+        Integer,
+        ForeignKey("products.id"),
+        primary_key=True,
+        comment="co-purchased product ID",
+    )
+    count = Column(Integer, nullable=False, default=0, comment="order count")
+
+
+class ProductRecommendation(Base):
+    """Product recommendation model
+
+    Top-K "customers also bought" neighbours per product, precomputed by the
+    recommendation job.
+    """
+
+    __tablename__ = "product_recommendations"
+    __table_args__ = (
+        Index("ix_product_recommendations_product_rank", "product_id", "rank"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    product_id = Column(
+        Integer, ForeignKey("products.id"), nullable=False, comment="product ID"
+    )
+    related_product_id = Column(
+        Integer,
+        ForeignKey("products.id"),
+        nullable=False,
+        comment="recommended product ID",
+    )
+    score = Column(Float, nullable=False, comment="cosine similarity")
+    rank = Column(Integer, nullable=False, comment="rank, starting from 1")
+    created_at = Column(
+        DateTime, default=datetime.utcnow, nullable=False, comment="creation time"
+    )
+
+    related_product = relationship("Product", foreign_keys=[related_product_id])
+
+
+class CoPurchaseOrder(Base):
+    """Co-purchase counted order model
+
+    Orders whose items are included in the co-purchase counts, so the job
+    does not count an order twice when it reads it again, and subtracts it
+    when it is cancelled after being counted. No foreign key, orders move
+    to the archive.
+    """
+
+    __tablename__ = "co_purchase_orders"
+
+    order_id = Column(Integer, primary_key=True, comment="order ID")
+    counted_at = Column(
+        DateTime, default=datetime.utcnow, nullable=False, comment="time counted"
+    )
@@ -0,0 +1,58 @@
+from sqlalchemy import Column, Integer, String, Date, DateTime, ForeignKey, DECIMAL
+from datetime import datetime
+from app.db.database import Base
+
+
+class ProductSalesDaily(Base):
+    """Product sales daily rollup model
+
+    Units and revenue of paid orders per product per order day, maintained
+    incrementally when orders become paid or are refunded.
+    """
+
+    __tablename__ = "product_sales_daily"
+
+    product_id = Column(
+        Integer, ForeignKey("products.id"), primary_key=True, comment="product ID"
+    )
+    day = Column(Date, primary_key=True, index=True, comment="order day")
+    units = Column(Integer, nullable=False, default=0, comment="units sold")
+    revenue = Column(DECIMAL(12, 2), nullable=False, default=0, comment="revenue")
+    updated_at = Column(
+        DateTime,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        nullable=False,
+        comment="update time",
+    )
+
+
+class SalesDaily(Base):
+    """Order sales daily rollup model
+
+    Order count and order totals per order day, order status and payment
+    method, maintained in the same transaction as order writes so an order
+    is always counted once under its current status.
+    """
+
+    __tablename__ = "sales_daily"
+
+    day = Column(Date, primary_key=True, comment="order day")
+    status = Column(String(20), primary_key=True, comment="order status")
+    payment_method = Column(
+        String(20),
+        primary_key=True,
+        default="",
+        comment="payment method, empty when not chosen",
+    )
+    order_count = Column(Integer, nullable=False, default=0, comment="order count")
+    revenue = Column(
+        DECIMAL(14, 2), nullable=False, default=0, comment="sum of order totals"
+    )
+    updated_at = Column(
+        DateTime,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        nullable=False,
+        comment="update time",
+    )
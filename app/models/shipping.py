@@ -0,0 +1,145 @@
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    DateTime,
+    ForeignKey,
+    Boolean,
+    DECIMAL,
+    UniqueConstraint,
+)
+from datetime import datetime
+from app.db.database import Base
+
+
+class ShippingZone(Base):
+    """Shipping zone model
+
+    Shipping rate for a country, or for one state of it when state_id is
+    set. A state zone takes precedence over the zone of its country.
+    """
+
+    __tablename__ = "shipping_zones"
+    __table_args__ = (
+        UniqueConstraint("country_id", "state_id", name="uq_shipping_zone_region"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), nullable=False, comment="zone name")
+    country_id = Column(
+        Integer, ForeignKey("countries.id"), nullable=False, comment="country ID"
+    )
+    state_id = Column(
+        Integer,
+        ForeignKey("states.id"),
+        nullable=True,
+        comment="state ID, whole country when empty",
+    )
+    base_fee = Column(
+        DECIMAL(10, 2), nullable=False, default=0, comment="fee per shipment"
+    )
+    per_kg_fee = Column(
+        DECIMAL(10, 2), nullable=False, default=0, comment="fee per billable kg"
+    )
+    volumetric_divisor = Column(
+        Integer,
+        nullable=False,
+        default=5000,
+        comment="cm3 per kg of volumetric weight",
+    )
+    free_shipping_threshold = Column(
+        DECIMAL(10, 2),
+        nullable=True,
+        comment="order amount from which shipping is free",
+    )
+    is_active = Column(Boolean, default=True, comment="whether it is active")
+    created_at = Column(
+        DateTime, default=datetime.utcnow, nullable=False, comment="creation time"
+    )
+    updated_at = Column(
+        DateTime,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        nullable=False,
+        comment="update time",
+    )
+
+
+class TaxRate(Base):
+    """Tax rate model
+
+    Tax of a country, or of one state of it when state_id is set. The
+    country rate and the state rate both apply, so federal and state taxes
+    are separate rows.
+    """
+
+    __tablename__ = "tax_rates"
+    __table_args__ = (
+        UniqueConstraint("country_id", "state_id", name="uq_tax_rate_region"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String(100), nullable=False, comment="tax name")
+    country_id = Column(
+        Integer, ForeignKey("countries.id"), nullable=False, comment="country ID"
+    )
+    state_id = Column(
+        Integer,
+        ForeignKey("states.id"),
+        nullable=True,
+        comment="state ID, whole country when empty",
+    )
+    rate = Column(DECIMAL(6, 4), nullable=False, comment="rate, 0.0825 for 8.25%")
+    applies_to_shipping = Column(
+        Boolean, default=False, comment="whether shipping is taxed"
+    )
+    is_active = Column(Boolean, default=True, comment="whether it is active")
+    created_at = Column(
+        DateTime, default=datetime.utcnow, nullable=False, comment="creation time"
+    )
+    updated_at = Column(
+        DateTime,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        nullable=False,
+        comment="update time",
+    )
+
+
+class OrderTax(Base):
+    """Tax charged on an order"""
+
+    __tablename__ = "order_taxes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # No foreign key, rows stay when the order moves to orders_archive
+    order_id = Column(Integer, index=True, nullable=False, comment="order ID")
+    tax_rate_id = Column(
+        Integer, ForeignKey("tax_rates.id"), nullable=True, comment="tax rate ID"
+    )
+    name = Column(String(100), nullable=False, comment="tax name")
+    rate = Column(DECIMAL(6, 4), nullable=False, comment="rate applied")
+    amount = Column(DECIMAL(10, 2), nullable=False, comment="tax amount")
+    created_at = Column(
+        DateTime, default=datetime.utcnow, nullable=False, comment="creation time"
+    )
+
+
+class CacheVersion(Base):
+    """Version of data cached in memory by every API process
+
+    Writers bump the version in the transaction that changes the data, and
+    processes reload their copy when they see a newer version.
+    """
+
+    __tablename__ = "cache_versions"
+
+    name = Column(String(50), primary_key=True, comment="cache name")
+    version = Column(Integer, nullable=False, default=0, comment="data version")
+    updated_at = Column(
+        DateTime,
+        default=datetime.utcnow,
+        onupdate=datetime.utcnow,
+        nullable=False,
+        comment="update time",
+    )
@@ -45,6 +45,7 @@ class User(Base):
 
     profile = relationship("UserProfile", back_populates="user")
     cart = relationship("Cart", back_populates="user")
+    orders = relationship("Order", back_populates="user")
     addresses = relationship("Address", back_populates="user")
     reviews = relationship("ProductReview", back_populates="user")
 
@@ -0,0 +1,53 @@
+from pydantic import BaseModel
+from datetime import date
+from decimal import Decimal
+from typing import List, Optional
+
+
+class SalesPoint(BaseModel):
+    """Sales of one interval"""
+
+    period: date
+    order_count: int
+    revenue: Decimal
+    average_order_value: Optional[Decimal] = None
+
+
+class SalesSeries(BaseModel):
+    """Sales over a date range"""
+
+    date_from: date
+    date_to: date
+    interval: str
+    order_count: int
+    revenue: Decimal
+    average_order_value: Optional[Decimal] = None
+    series: List[SalesPoint]
+
+
+class SalesBreakdown(BaseModel):
+    """Sales of one order status and payment method"""
+
+    status: str
+    payment_method: Optional[str] = None
+    order_count: int
+    revenue: Decimal
+    average_order_value: Optional[Decimal] = None
+
+
+class ProductSales(BaseModel):
+    """Sales of one product"""
+
+    product_id: int
+    name: str
+    sku: str
+    units: int
+    revenue: Decimal
+
+
+class SalesRollupRebuild(BaseModel):
+    """Sales rollup rebuild result"""
+
+    date_from: date
+    date_to: date
+    orders: int
@@ -0,0 +1,62 @@
+from pydantic import BaseModel, Field
+from decimal import Decimal
+from typing import List, Optional
+
+from app.schemas.promotion import AppliedDiscount
+from app.utils.carts import MAX_CART_LINE_QUANTITY
+
+
+# Cart item add schema
+class CartItemAdd(BaseModel):
+    product_id: int = Field(..., gt=0)
+    variant_id: Optional[int] = Field(None, gt=0)
+    quantity: int = Field(1, gt=0, le=MAX_CART_LINE_QUANTITY)
+
+
+# Cart item update schema, 0 removes the item
+class CartItemUpdate(BaseModel):
+    quantity: int = Field(..., ge=0, le=MAX_CART_LINE_QUANTITY)
+
+
+# Cart line priced at the current price
+class CartLine(BaseModel):
+    product_id: int
+    variant_id: Optional[int] = None
+    product_name: str
+    product_sku: Optional[str] = None
+    quantity: int
+    price: Decimal
+    total_price: Decimal
+
+
+# Cart response schema
+class CartResponse(BaseModel):
+    cart_token: Optional[str] = Field(
+        None, description="Token identifying a guest cart, send it as X-Cart-Token"
+    )
+    items: List[CartLine]
+    total_items: int
+    total_price: Decimal = Field(..., description="Total before discounts")
+    discounts: List[AppliedDiscount] = []
+    total_discount: Decimal = Decimal(0)
+
+
+# Tax applied to a quote
+class QuoteTax(BaseModel):
+    tax_rate_id: Optional[int] = None
+    name: str
+    rate: Decimal
+    amount: Decimal
+
+
+# Checkout quote of a cart shipped to a region
+class CartQuote(BaseModel):
+    subtotal: Decimal = Field(..., description="Total before discounts")
+    discounts: List[AppliedDiscount] = []
+    total_discount: Decimal = Decimal(0)
+    shipping_fee: Decimal
+    billable_weight: Decimal
+    taxes: List[QuoteTax] = []
+    tax_amount: Decimal = Decimal(0)
+    total: Decimal
+    rates_version: int = Field(..., description="Version of the rate tables used")
@@ -36,7 +36,8 @@ class OrderItemBase(BaseModel):
 
 
 class OrderItemCreate(OrderItemBase):
-    pass
+    # Stock is reserved from the variant when set, otherwise from the product
+    variant_id: Optional[int] = None
 
 
 class OrderItemUpdate(BaseModel):
@@ -60,7 +61,9 @@ class OrderItemInDB(OrderItemBase):
 
 # Order Schemas
 class OrderBase(BaseModel):
-    shipping_fee: Optional[Decimal] = Field(default=0.0, ge=0)
+    # Computed from the shipping zones, the value sent is only charged when
+    # no zones are configured
+    shipping_fee: Optional[Decimal] = Field(default=Decimal(0), ge=0)
     payment_method: Optional[PaymentMethod] = None
     shipping_address_id: int
     billing_address_id: int
@@ -68,6 +71,7 @@ class OrderBase(BaseModel):
 
 class OrderCreate(OrderBase):
     items: List[OrderItemCreate]
+    coupon_code: Optional[str] = Field(None, max_length=50)
 
     @validator("items")
     def validate_items(cls, v):
@@ -86,6 +90,19 @@ class OrderUpdate(BaseModel):
     is_active: Optional[bool] = None
 
 
+class CustomerOrderUpdate(BaseModel):
+    """Order changes a customer can make, status only to cancel the order
+
+    The shipping fee and tax are quoted for the shipping address when the
+    order is placed, so neither can be changed afterwards. The payment
+    method decides whether an unpaid order expires and deleting goes
+    through DELETE, so both are left out too.
+    """
+
+    status: Optional[OrderStatus] = None
+    billing_address_id: Optional[int] = None
+
+
 class OrderInDB(OrderBase):
     id: int
     user_id: int
@@ -100,3 +117,37 @@ class OrderInDB(OrderBase):
 
     class Config:
         from_attributes = True
+
+
+class OrderList(BaseModel):
+    message: str
+    data: List[OrderInDB]
+    next_cursor: Optional[str] = None
+    limit: int
+
+
+class OrderTransition(BaseModel):
+    """Status change applied to many orders at once"""
+
+    order_ids: List[int] = Field(..., min_length=1, max_length=10000)
+    status: Optional[OrderStatus] = None
+    payment_status: Optional[PaymentStatus] = None
+
+    @validator("payment_status", always=True)
+    def validate_has_changes(cls, v, values):
+        """Validate at least one status is being changed"""
+        if v is None and values.get("status") is None:
+            raise ValueError("At least one of status or payment_status is required")
+        return v
+
+
+class OrderTransitionResult(BaseModel):
+    order_id: int
+    result: str = Field(..., description="updated, unchanged, invalid or not_found")
+    detail: Optional[str] = None
+
+
+class OrderTransitionResponse(BaseModel):
+    message: str
+    updated: int
+    results: List[OrderTransitionResult]
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, Field, HttpUrl, constr, validator
+from pydantic import AliasChoices, BaseModel, Field, HttpUrl, constr, validator
 from datetime import datetime
-from typing import Optional, List
+from typing import Dict, Optional, List
 from decimal import Decimal
 
 
@@ -202,6 +202,48 @@ class ProductVariantResponse(ProductVariantBase):
         from_attributes = True
 
 
+class ProductVariantBulkCreate(BaseSchema):
+    """Bulk create product variants from attribute groups"""
+
+    product_id: int = Field(..., gt=0, description="Related product ID")
+    attribute_groups: List[List[int]] = Field(
+        ..., min_length=1, description="Attribute IDs per group, e.g. colors, sizes"
+    )
+    sku_template: str = Field(
+        "{sku}-{values}",
+        min_length=1,
+        description="SKU template, supports {sku}, {name}, {values}, {index} "
+        "and attribute names such as {color}",
+    )
+    name_template: str = Field(
+        "{name} {values}", min_length=1, description="Variant name template"
+    )
+    price: Optional[Decimal] = Field(
+        None, gt=0, description="Variant price, defaults to product price"
+    )
+    stock: int = Field(0, ge=0, description="Variant stock")
+    currency: Optional[str] = Field(
+        None, min_length=3, max_length=3, description="Currency"
+    )
+    is_active: bool = Field(True, description="Is variant active")
+
+    @validator("attribute_groups")
+    def validate_attribute_groups(cls, v):
+        """Validate attribute groups"""
+        if any(not group for group in v):
+            raise ValueError("Attribute groups must not be empty")
+        return v
+
+
+class ProductVariantBulkResult(BaseSchema):
+    """Bulk create product variants result"""
+
+    created: List[ProductVariantResponse] = []
+    skipped: List[List[int]] = Field(
+        [], description="Attribute combinations that already have a variant"
+    )
+
+
 # Product base schema
 class ProductBase(BaseSchema):
     """Product base schema"""
@@ -302,7 +344,8 @@ class ProductResponse(BaseModel):
     slug: str
     sku: str
     price: float
-    stock: int
+    # Sharded products keep most of their stock outside Product.stock
+    stock: int = Field(..., validation_alias=AliasChoices("available_stock", "stock"))
     brand_id: int
     short_description: Optional[str] = None
     description: Optional[str] = None
@@ -347,3 +390,146 @@ class ProductList(BaseSchema):
     total: int
     skip: int
     limit: int
+
+
+class ResolvedVariant(BaseSchema):
+    """Variant matched by an attribute combination"""
+
+    id: int
+    name: str
+    sku: str
+    price: Decimal
+    stock: int
+    currency: str
+    attribute_ids: List[int]
+
+
+class VariantResolveResponse(BaseSchema):
+    """Variant resolve response schema"""
+
+    product_id: int
+    attribute_ids: List[int]
+    variant: Optional[ResolvedVariant] = None
+    availability: Dict[int, bool] = Field(
+        default_factory=dict,
+        description="Whether each attribute can still be selected",
+    )
+
+
+class ProductImportRowError(BaseModel):
+    """Product import row error"""
+
+    row: int
+    sku: Optional[str] = None
+    errors: List[str]
+
+
+class ProductImportReport(BaseModel):
+    """Product import report"""
+
+    total: int
+    created: int
+    failed: int
+    errors: List[ProductImportRowError] = []
+    errors_truncated: bool = False
+
+
+class VariantSkuUpdate(BaseModel):
+    """Price and stock update for a variant identified by SKU"""
+
+    sku: constr(min_length=1, max_length=100) = Field(..., description="Variant SKU")
+    price: Optional[Decimal] = Field(None, gt=0, description="New price")
+    stock: Optional[int] = Field(None, ge=0, description="New stock")
+
+    @validator("stock", always=True)
+    def validate_has_changes(cls, v, values):
+        """Validate at least one field is being updated"""
+        if v is None and values.get("price") is None:
+            raise ValueError("At least one of price or stock is required")
+        return v
+
+
+class ProductSkuUpdate(BaseModel):
+    """Price and stock update for a product identified by SKU"""
+
+    sku: constr(min_length=1, max_length=100) = Field(..., description="Product SKU")
+    price: Optional[Decimal] = Field(None, gt=0, description="New price")
+    discount_price: Optional[Decimal] = Field(
+        None, gt=0, description="New discount price"
+    )
+    stock: Optional[int] = Field(None, ge=0, description="New stock")
+
+    @validator("discount_price")
+    def validate_discount_price(cls, v, values):
+        """Validate discount price
+
+        Only against a price in the same update, update_by_sku checks it
+        against the stored price.
+        """
+        if v is not None and values.get("price") is not None and v >= values["price"]:
+            raise ValueError("Discount price must be lower than regular price")
+        return v
+
+    @validator("stock", always=True)
+    def validate_has_changes(cls, v, values):
+        """Validate at least one field is being updated"""
+        if v is None and all(
+            values.get(field) is None for field in ("price", "discount_price")
+        ):
+            raise ValueError(
+                "At least one of price, discount_price or stock is required"
+            )
+        return v
+
+
+class ProductBulkUpdate(BaseModel):
+    """Bulk price and stock update keyed by SKU"""
+
+    products: List[ProductSkuUpdate] = Field([], max_length=50000)
+    variants: List[VariantSkuUpdate] = Field([], max_length=50000)
+
+
+class ProductBulkUpdateResult(BaseModel):
+    """Bulk price and stock update result"""
+
+    updated_products: int
+    updated_variants: int
+    unknown_product_skus: List[str] = []
+    unknown_variant_skus: List[str] = []
+    # Not updated, their discount price would not stay below the price
+    rejected_product_skus: List[str] = []
+
+
+class RelatedProduct(BaseSchema):
+    """Co-purchased product schema"""
+
+    id: int
+    name: str
+    slug: str
+    price: Decimal
+    discount_price: Optional[Decimal] = None
+    score: float
+
+
+class StockShardConfig(BaseModel):
+    """Stock sharding configuration"""
+
+    shard_count: int = Field(..., ge=2, le=64, description="Number of stock shards")
+
+
+class StockShard(BaseModel):
+    """Stock of one shard"""
+
+    shard_no: int
+    stock: int
+
+
+class StockShardSummary(BaseModel):
+    """Stock sharding state of a product"""
+
+    product_id: int
+    enabled: bool
+    shard_count: int
+    product_stock: int = Field(..., description="Stock on the product row")
+    total_stock: int = Field(..., description="Product row plus all shards")
+    shards: List[StockShard] = []
@@ -0,0 +1,135 @@
+from pydantic import BaseModel, Field, validator
+from decimal import Decimal
+from typing import List, Optional
+from datetime import datetime
+from enum import Enum
+
+
+# Enums
+class PromotionType(str, Enum):
+    PERCENT_OFF = "Percent Off"
+    AMOUNT_OFF = "Amount Off"
+    BUY_X_GET_Y = "Buy X Get Y"
+
+
+class PromotionTargetType(str, Enum):
+    PRODUCT = "Product"
+    CATEGORY = "Category"
+    BRAND = "Brand"
+
+
+# Promotion target schema
+class PromotionTargetBase(BaseModel):
+    target_type: PromotionTargetType
+    target_id: int = Field(..., gt=0, description="Product, category or brand ID")
+
+    class Config:
+        from_attributes = True
+
+
+# Promotion base schema
+class PromotionBase(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100)
+    description: Optional[str] = Field(None, max_length=255)
+    code: Optional[str] = Field(
+        None,
+        min_length=3,
+        max_length=50,
+        description="Coupon code, leave empty for an automatic promotion",
+    )
+    type: PromotionType
+    value: Decimal = Field(
+        ...,
+        gt=0,
+        description="Percent off, amount off, or percent off the free items",
+    )
+    buy_quantity: Optional[int] = Field(None, gt=0, description="Units to buy (X)")
+    get_quantity: Optional[int] = Field(None, gt=0, description="Units discounted (Y)")
+    min_subtotal: Optional[Decimal] = Field(None, ge=0)
+    max_discount: Optional[Decimal] = Field(None, gt=0)
+    usage_limit: Optional[int] = Field(None, gt=0)
+    priority: int = 0
+    is_exclusive: bool = False
+    starts_at: Optional[datetime] = None
+    ends_at: Optional[datetime] = None
+    is_active: bool = True
+    targets: List[PromotionTargetBase] = Field(
+        default_factory=list, description="Empty to apply to all products"
+    )
+
+    @validator("code")
+    def normalize_code(cls, v):
+        """Coupon codes are case insensitive"""
+        if v is not None:
+            v = v.strip().upper()
+            if not v.replace("-", "").replace("_", "").isalnum():
+                raise ValueError(
+                    "Code must contain only letters, numbers, hyphens and underscores"
+                )
+        return v or None
+
+    @validator("value")
+    def validate_value(cls, v, values):
+        """Percentages cannot exceed 100"""
+        if values.get("type") != PromotionType.AMOUNT_OFF and v > 100:
+            raise ValueError("Percent value must not exceed 100")
+        return v
+
+    @validator("get_quantity", always=True)
+    def validate_quantities(cls, v, values):
+        """Buy X get Y needs both quantities"""
+        if values.get("type") == PromotionType.BUY_X_GET_Y and (
+            v is None or values.get("buy_quantity") is None
+        ):
+            raise ValueError("buy_quantity and get_quantity are required")
+        return v
+
+    @validator("ends_at")
+    def validate_ends_at(cls, v, values):
+        if v is not None and values.get("starts_at") and v <= values["starts_at"]:
+            raise ValueError("ends_at must be after starts_at")
+        return v
+
+
+# Promotion create schema
+class PromotionCreate(PromotionBase):
+    pass
+
+
+# Promotion update schema
+class PromotionUpdate(BaseModel):
+    name: Optional[str] = Field(None, min_length=1, max_length=100)
+    description: Optional[str] = Field(None, max_length=255)
+    code: Optional[str] = Field(None, min_length=3, max_length=50)
+    type: Optional[PromotionType] = None
+    value: Optional[Decimal] = Field(None, gt=0)
+    buy_quantity: Optional[int] = Field(None, gt=0)
+    get_quantity: Optional[int] = Field(None, gt=0)
+    min_subtotal: Optional[Decimal] = Field(None, ge=0)
+    max_discount: Optional[Decimal] = Field(None, gt=0)
+    usage_limit: Optional[int] = Field(None, gt=0)
+    priority: Optional[int] = None
+    is_exclusive: Optional[bool] = None
+    starts_at: Optional[datetime] = None
+    ends_at: Optional[datetime] = None
+    is_active: Optional[bool] = None
+    targets: Optional[List[PromotionTargetBase]] = None
+
+
+# Promotion response schema
+class PromotionResponse(PromotionBase):
+    id: int
+    used_count: int
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+# Discount applied to a cart or order
+class AppliedDiscount(BaseModel):
+    promotion_id: int
+    name: str
+    code: Optional[str] = None
+    amount: Decimal
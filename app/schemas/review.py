@@ -0,0 +1,52 @@
+from pydantic import BaseModel, Field
+from typing import Dict, List, Optional
+from datetime import datetime
+
+
+# Review base schema
+class ReviewBase(BaseModel):
+    rating: int = Field(..., ge=1, le=5, description="Rating from 1 to 5")
+    title: Optional[str] = Field(None, max_length=100, description="Review title")
+    review: Optional[str] = Field(None, max_length=255, description="Review text")
+
+
+# Review create schema
+class ReviewCreate(ReviewBase):
+    product_id: int = Field(..., gt=0, description="Related product ID")
+
+
+# Review update schema
+class ReviewUpdate(BaseModel):
+    rating: Optional[int] = Field(None, ge=1, le=5)
+    title: Optional[str] = Field(None, max_length=100)
+    review: Optional[str] = Field(None, max_length=255)
+
+
+# Review response schema
+class ReviewResponse(ReviewBase):
+    id: int
+    product_id: int
+    user_id: int
+    helpful_votes: int
+    is_active: bool
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+# Rating summary schema
+class RatingSummary(BaseModel):
+    rating_count: int = 0
+    average_rating: Optional[float] = None
+    histogram: Dict[int, int] = {}
+
+
+# Product reviews list schema
+class ProductReviewList(BaseModel):
+    message: str
+    data: List[ReviewResponse]
+    summary: RatingSummary
+    skip: int
+    limit: int
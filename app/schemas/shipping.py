@@ -0,0 +1,88 @@
+from pydantic import BaseModel, Field
+from decimal import Decimal
+from typing import Optional
+from datetime import datetime
+
+
+# Shipping zone base schema
+class ShippingZoneBase(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100)
+    country_id: int = Field(..., gt=0)
+    state_id: Optional[int] = Field(
+        None, gt=0, description="Leave empty for the whole country"
+    )
+    base_fee: Decimal = Field(Decimal(0), ge=0, description="Fee per shipment")
+    per_kg_fee: Decimal = Field(Decimal(0), ge=0, description="Fee per billable kg")
+    volumetric_divisor: int = Field(
+        5000, gt=0, description="cm3 per kg of volumetric weight"
+    )
+    free_shipping_threshold: Optional[Decimal] = Field(
+        None, ge=0, description="Order amount from which shipping is free"
+    )
+    is_active: bool = True
+
+
+# Shipping zone create schema
+class ShippingZoneCreate(ShippingZoneBase):
+    pass
+
+
+# Shipping zone update schema
+class ShippingZoneUpdate(BaseModel):
+    name: Optional[str] = Field(None, min_length=1, max_length=100)
+    country_id: Optional[int] = Field(None, gt=0)
+    state_id: Optional[int] = Field(None, gt=0)
+    base_fee: Optional[Decimal] = Field(None, ge=0)
+    per_kg_fee: Optional[Decimal] = Field(None, ge=0)
+    volumetric_divisor: Optional[int] = Field(None, gt=0)
+    free_shipping_threshold: Optional[Decimal] = Field(None, ge=0)
+    is_active: Optional[bool] = None
+
+
+# Shipping zone response schema
+class ShippingZoneResponse(ShippingZoneBase):
+    id: int
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+# Tax rate base schema
+class TaxRateBase(BaseModel):
+    name: str = Field(..., min_length=1, max_length=100)
+    country_id: int = Field(..., gt=0)
+    state_id: Optional[int] = Field(
+        None, gt=0, description="Leave empty for the whole country"
+    )
+    rate: Decimal = Field(
+        ..., ge=0, lt=1, decimal_places=4, description="0.0825 for 8.25%"
+    )
+    applies_to_shipping: bool = False
+    is_active: bool = True
+
+
+# Tax rate create schema
+class TaxRateCreate(TaxRateBase):
+    pass
+
+
+# Tax rate update schema
+class TaxRateUpdate(BaseModel):
+    name: Optional[str] = Field(None, min_length=1, max_length=100)
+    country_id: Optional[int] = Field(None, gt=0)
+    state_id: Optional[int] = Field(None, gt=0)
+    rate: Optional[Decimal] = Field(None, ge=0, lt=1, decimal_places=4)
+    applies_to_shipping: Optional[bool] = None
+    is_active: Optional[bool] = None
+
+
+# Tax rate response schema
+class TaxRateResponse(TaxRateBase):
+    id: int
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
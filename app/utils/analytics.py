@@ -0,0 +1,270 @@
+import argparse
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+from typing import Dict, List, Optional, Sequence
+from sqlalchemy import Date, and_, cast, delete, func, insert, or_, select, text
+from sqlalchemy.orm import Session
+from app.core.logger import logger
+from app.models.order import OrderStatus, PaymentStatus
+from app.models.product import Product
+from app.models.sales import ProductSalesDaily, SalesDaily
+from app.utils.order_archive import ORDER_TABLES
+from app.utils.order_lifecycle import PAID_ORDER_STATUSES
+
+ANALYTICS_INTERVAL_REGEX = "^(day|week|month)$"
+TOP_PRODUCTS_SORT_REGEX = "^(revenue|units)$"
+
+# Statuses reported when no status filter is given
+DEFAULT_SALES_STATUSES = tuple(
+    status.value for status in OrderStatus if status != OrderStatus.CANCELLED
+)
+
+
+def _average(revenue: Decimal, count: int) -> Optional[Decimal]:
+    return round(revenue / count, 2) if count else None
+
+
+def sales_series(
+    db: Session,
+    date_from: date,
+    date_to: date,
+    interval: str = "day",
+    statuses: Sequence[str] = DEFAULT_SALES_STATUSES,
+    payment_method: Optional[str] = None,
+) -> Dict:
+    """Order count, revenue and average order value per interval
+
+    Reads only the daily rollup, so a range costs one row per day, status
+    and payment method whatever the order volume.
+    """
+    period = cast(func.date_trunc(interval, SalesDaily.day), Date).label("period")
+    conditions = [
+        SalesDaily.day >= date_from,
+        SalesDaily.day <= date_to,
+        SalesDaily.status.in_(statuses),
+    ]
+    if payment_method is not None:
+        conditions.append(SalesDaily.payment_method == payment_method)
+
+    rows = db.execute(
+        select(
+            period,
+            func.sum(SalesDaily.order_count),
+            func.sum(SalesDaily.revenue),
+        )
+        .where(*conditions)
+        .group_by(period)
+        .order_by(period)
+    ).all()
+
+    series = [
+        {
+            "period": period,
+            "order_count": count,
+            "revenue": revenue,
+            "average_order_value": _average(revenue, count),
+        }
+        for period, count, revenue in rows
+        if count
+    ]
+    order_count = sum(point["order_count"] for point in series)
+    revenue = sum((point["revenue"] for point in series), Decimal(0))
+    return {
+        "date_from": date_from,
+        "date_to": date_to,
+        "interval": interval,
+        "order_count": order_count,
+        "revenue": revenue,
+        "average_order_value": _average(revenue, order_count),
+        "series": series,
+    }
+
+
+def sales_breakdown(db: Session, date_from: date, date_to: date) -> List[Dict]:
+    """Order count and revenue per status and payment method"""
+    rows = db.execute(
+        select(
+            SalesDaily.status,
+            SalesDaily.payment_method,
+            func.sum(SalesDaily.order_count),
+            func.sum(SalesDaily.revenue),
+        )
+        .where(SalesDaily.day >= date_from, SalesDaily.day <= date_to)
+        .group_by(SalesDaily.status, SalesDaily.payment_method)
+        .order_by(SalesDaily.status, SalesDaily.payment_method)
+    ).all()
+    return [
+        {
+            "status": status,
+            "payment_method": payment_method or None,
+            "order_count": count,
+            "revenue": revenue,
+            "average_order_value": _average(revenue, count),
+        }
+        for status, payment_method, count, revenue in rows
+        if count
+    ]
+
+
+def top_products(
+    db: Session,
+    date_from: date,
+    date_to: date,
+    sort: str = "revenue",
+    limit: int = 20,
+) -> List[Dict]:
+    """Best selling products of paid orders from the product sales rollup"""
+    units = func.sum(ProductSalesDaily.units).label("units")
+    revenue = func.sum(ProductSalesDaily.revenue).label("revenue")
+    sales = (
+        select(ProductSalesDaily.product_id, units, revenue)
+        .where(ProductSalesDaily.day >= date_from, ProductSalesDaily.day <= date_to)
+        .group_by(ProductSalesDaily.product_id)
+        .having(units > 0)
+        .order_by((revenue if sort == "revenue" else units).desc())
+        .order_by(ProductSalesDaily.product_id)
+        .limit(limit)
+        .subquery()
+    )
+    rows = db.execute(
+        select(
+            sales.c.product_id,
+            Product.name,
+            Product.sku,
+            sales.c.units,
+            sales.c.revenue,
+        )
+        .join(Product, Product.id == sales.c.product_id)
+        .order_by(
+            (sales.c.revenue if sort == "revenue" else sales.c.units).desc(),
+            sales.c.product_id,
+        )
+    ).all()
+    return [row._asdict() for row in rows]
+
+
+def rebuild_sales_rollups(db: Session, date_from: date, date_to: date) -> int:
+    """Recompute both daily rollups for a range of order days from orders
+
+    Used to backfill orders placed before the rollups existed or to repair
+    them. Live and archived orders are both counted. Runs in the caller's
+    transaction. Returns the number of orders counted.
+    """
+    start, end = date_from, date_to + timedelta(days=1)
+
+    # Order writes wait until the rebuild commits and then apply their
+    # deltas on top of it, so no change is lost or counted twice
+    db.execute(text("LOCK TABLE sales_daily, product_sales_daily IN EXCLUSIVE MODE"))
+    db.execute(delete(SalesDaily).where(SalesDaily.day >= start, SalesDaily.day < end))
+    db.execute(
+        delete(ProductSalesDaily).where(
+            ProductSalesDaily.day >= start, ProductSalesDaily.day < end
+        )
+    )
+
+    # Rows of both tables are summed per rollup key
+    orders: Dict[tuple, List] = defaultdict(lambda: [0, Decimal(0)])
+    product_sales: Dict[tuple, List] = defaultdict(lambda: [0, Decimal(0)])
+    for order_model, item_model in ORDER_TABLES:
+        in_range = and_(order_model.created_at >= start, order_model.created_at < end)
+        day = cast(order_model.created_at, Date).label("day")
+
+        # Order enums are stored by name, so group in SQL and convert here
+        rows = db.execute(
+            select(
+                day,
+                order_model.status,
+                order_model.payment_method,
+                func.count(),
+                func.coalesce(func.sum(order_model.total_amount), 0),
+            )
+            .where(in_range, order_model.is_active == True)
+            .group_by(day, order_model.status, order_model.payment_method)
+        ).all()
+        for day_value, status, payment_method, count, revenue in rows:
+            key = (
+                day_value,
+                status.value,
+                payment_method.value if payment_method else "",
+            )
+            orders[key][0] += count
+            orders[key][1] += revenue
+
+        # Same rule as order_lifecycle.counts_as_sale
+        rows = db.execute(
+            select(
+                item_model.product_id,
+                day,
+                func.sum(item_model.quantity),
+                func.sum(item_model.total_price),
+            )
+            .join(order_model, order_model.id == item_model.order_id)
+            .where(
+                in_range,
+                order_model.is_active == True,
+                order_model.status != OrderStatus.CANCELLED,
+                or_(
+                    order_model.payment_status == PaymentStatus.PAID,
+                    order_model.status.in_(PAID_ORDER_STATUSES),
+                ),
+                item_model.is_active == True,
+                item_model.product_id.is_not(None),
+            )
+            .group_by(item_model.product_id, day)
+        ).all()
+        for product_id, day_value, units, revenue in rows:
+            product_sales[(product_id, day_value)][0] += units
+            product_sales[(product_id, day_value)][1] += revenue
+
+    if orders:
+        db.execute(
+            insert(SalesDaily),
+            [
+                {
+                    "day": day,
+                    "status": status,
+                    "payment_method": payment_method,
+                    "order_count": count,
+                    "revenue": revenue,
+                }
+                for (day, status, payment_method), (count, revenue) in orders.items()
+            ],
+        )
+    if product_sales:
+        db.execute(
+            insert(ProductSalesDaily),
+            [
+                {
+                    "product_id": product_id,
+                    "day": day,
+                    "units": units,
+                    "revenue": revenue,
+                }
+                for (product_id, day), (units, revenue) in product_sales.items()
+            ],
+        )
+
+    return sum(count for count, _ in orders.values())
+
+
+def main():
+    from app.db.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Rebuild daily sales rollups")
+    parser.add_argument("date_from", type=date.fromisoformat, help="YYYY-MM-DD")
+    parser.add_argument("date_to", type=date.fromisoformat, help="YYYY-MM-DD")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        orders = rebuild_sales_rollups(db, args.date_from, args.date_to)
+        db.commit()
+
+    logger.info(
+        f"Sales rollups rebuilt from {orders} orders "
+        f"between {args.date_from} and {args.date_to}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+from datetime import datetime
+from typing import Dict, List, Sequence, Tuple
+from sqlalchemy import (
+    Integer,
+    Numeric,
+    String,
+    cast,
+    column,
+    func,
+    or_,
+    select,
+    update,
+    values,
+)
+from sqlalchemy.orm import Session
+
+# Rows sent per UPDATE ... FROM (VALUES ...) statement
+BULK_UPDATE_BATCH_SIZE = 1000
+
+# SQL types of the fields that can be updated by SKU
+SKU_UPDATE_FIELD_TYPES = {
+    "price": Numeric(10, 2),
+    "discount_price": Numeric(10, 2),
+    "stock": Integer,
+}
+
+
+def update_by_sku(
+    db: Session,
+    model,
+    updates: Sequence[Dict],
+    fields: Sequence[str],
+    now: datetime,
+    returning: Sequence[str] = ("sku",),
+    batch_size: int = BULK_UPDATE_BATCH_SIZE,
+) -> Tuple[List, List[str], List[str]]:
+    """Apply per-SKU field updates with one UPDATE ... FROM (VALUES ...) per batch
+
+    Fields left as None in an update keep their current value. Every matched
+    row gets the same updated_at so a sync can be traced as one change.
+    Rows are locked in id order before they are updated, the order
+    reserve_stock locks them in, so a sync cannot deadlock with orders. A
+    row whose discount_price would not stay below its price, stored values
+    standing in for fields left as None, is not updated. Returns the
+    RETURNING rows of updated records, the unknown SKUs and the SKUs
+    rejected for their discount price. The caller owns the transaction.
+    """
+    table = model.__table__
+    # Deduplicate by SKU, the last update for a SKU wins
+    by_sku = {update_data["sku"]: update_data for update_data in updates}
+    skus = list(by_sku)
+
+    ids: Dict[str, int] = {}
+    for start in range(0, len(skus), batch_size):
+        batch = skus[start : start + batch_size]
+        ids.update(
+            db.execute(
+                select(table.c.sku, table.c.id).where(table.c.sku.in_(batch))
+            ).all()
+        )
+    unknown = [sku for sku in skus if sku not in ids]
+    skus = sorted(ids, key=ids.get)
+
+    matched = []
+    for start in range(0, len(skus), batch_size):
+        batch = skus[start : start + batch_size]
+        db.execute(
+            select(table.c.id)
+            .where(table.c.id.in_([ids[sku] for sku in batch]))
+            .order_by(table.c.id)
+            .with_for_update()
+        )
+        data = values(
+            column("sku", String),
+            *[column(field, SKU_UPDATE_FIELD_TYPES[field]) for field in fields],
+            name="v",
+        ).data([(sku, *[by_sku[sku].get(field) for field in fields]) for sku in batch])
+
+        # VALUES columns that are NULL in every row are typed as text, so cast
+        assignments = {
+            field: func.coalesce(
+                cast(data.c[field], SKU_UPDATE_FIELD_TYPES[field]), table.c[field]
+            )
+            for field in fields
+        }
+
+        statement = update(table).where(table.c.sku == data.c.sku)
+        if "discount_price" in table.c and {"price", "discount_price"} & set(fields):
+            # Checked against the locked row, the payload may hold only one
+            discount_price = assignments.get("discount_price", table.c.discount_price)
+            price = assignments.get("price", table.c.price)
+            statement = statement.where(
+                or_(discount_price.is_(None), discount_price < price)
+            )
+        assignments["updated_at"] = now
+        statement = statement.values(**assignments).returning(
+            *[table.c[name] for name in returning]
+        )
+        matched.extend(db.execute(statement).all())
+
+    matched_skus = {row.sku for row in matched}
+    rejected = [sku for sku in skus if sku not in matched_skus]
+    return matched, unknown, rejected
@@ -0,0 +1,20 @@
+from functools import lru_cache
+from app.core.config import CartStoreSettings
+from app.utils.cart_store.base import BaseCartStore, line_key, parse_line_key
+from app.utils.cart_store.memory import MemoryCartStore
+
+
+@lru_cache
+def get_cart_store() -> BaseCartStore:
+    """Get the process-wide cart store based on settings"""
+    settings = CartStoreSettings()
+
+    if settings.CART_STORE_TYPE == "memory":
+        return MemoryCartStore(settings.CART_TTL_DAYS * 86400)
+    elif settings.CART_STORE_TYPE == "redis":
+        # Imported here so the redis package is only needed when used
+        from app.utils.cart_store.redis_store import RedisCartStore
+
+        return RedisCartStore()
+    else:
+        raise ValueError(f"Unsupported cart store type: {settings.CART_STORE_TYPE}")
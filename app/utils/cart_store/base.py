@@ -0,0 +1,73 @@
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+def line_key(product_id: int, variant_id: Optional[int] = None) -> str:
+    """Key of a cart line, one line per product or product variant"""
+    if variant_id is None:
+        return str(product_id)
+    return f"{product_id}:{variant_id}"
+
+
+def parse_line_key(key: str) -> Tuple[int, Optional[int]]:
+    product_id, _, variant_id = key.partition(":")
+    return int(product_id), int(variant_id) if variant_id else None
+
+
+class BaseCartStore(ABC):
+    """Base cart store class
+
+    A cart maps line keys to quantities. Prices are not stored, they are
+    resolved against current products whenever a cart is read or saved.
+    Carts that changed are marked dirty so they can be written to the
+    database in batches.
+    """
+
+    @abstractmethod
+    def get_lines(self, cart_key: str) -> Optional[Dict[str, int]]:
+        """Get the lines of a cart, None if the cart is not in the store"""
+        pass
+
+    @abstractmethod
+    def load_lines(self, cart_key: str, lines: Dict[str, int]) -> None:
+        """Put a cart into the store unless it is there already"""
+        pass
+
+    @abstractmethod
+    def add_quantity(
+        self, cart_key: str, key: str, quantity: int, max_quantity: int
+    ) -> int:
+        """Add to the quantity of a line, capped at max_quantity
+
+        Returns the new quantity.
+        """
+        pass
+
+    @abstractmethod
+    def set_quantity(self, cart_key: str, key: str, quantity: int) -> None:
+        """Set the quantity of a line, 0 removes the line"""
+        pass
+
+    @abstractmethod
+    def clear(self, cart_key: str) -> None:
+        """Remove all lines of a cart"""
+        pass
+
+    @abstractmethod
+    def delete(self, cart_key: str) -> None:
+        """Drop a cart from the store"""
+        pass
+
+    @abstractmethod
+    def mark_dirty(self, cart_keys: Iterable[str]) -> None:
+        """Mark carts as changed since they were last saved"""
+        pass
+
+    @abstractmethod
+    def pop_dirty(self, limit: int) -> List[str]:
+        """Take up to limit dirty carts, they are no longer dirty afterwards"""
+        pass
+
+    def purge_expired(self) -> int:
+        """Drop carts past their TTL, for stores that do not expire keys"""
+        return 0
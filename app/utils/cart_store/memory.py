@@ -0,0 +1,81 @@
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+from app.utils.cart_store.base import BaseCartStore
+
+
+class MemoryCartStore(BaseCartStore):
+    """In-process cart store
+
+    Carts only live in this process, so it suits a single worker or
+    development. Use the Redis store when the API runs in several processes.
+    """
+
+    def __init__(self, ttl_seconds: int):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._carts: Dict[str, Dict[str, int]] = {}
+        self._expires: Dict[str, float] = {}
+        self._dirty: Set[str] = set()
+
+    def _touch(self, cart_key: str) -> Dict[str, int]:
+        self._expires[cart_key] = time.monotonic() + self.ttl_seconds
+        return self._carts.setdefault(cart_key, {})
+
+    def get_lines(self, cart_key: str) -> Optional[Dict[str, int]]:
+        with self._lock:
+            lines = self._carts.get(cart_key)
+            return dict(lines) if lines is not None else None
+
+    def load_lines(self, cart_key: str, lines: Dict[str, int]) -> None:
+        with self._lock:
+            if cart_key not in self._carts:
+                self._touch(cart_key).update(lines)
+
+    def add_quantity(
+        self, cart_key: str, key: str, quantity: int, max_quantity: int
+    ) -> int:
+        with self._lock:
+            lines = self._touch(cart_key)
+            lines[key] = min(lines.get(key, 0) + quantity, max_quantity)
+            return lines[key]
+
+    def set_quantity(self, cart_key: str, key: str, quantity: int) -> None:
+        with self._lock:
+            lines = self._touch(cart_key)
+            if quantity > 0:
+                lines[key] = quantity
+            else:
+                lines.pop(key, None)
+
+    def clear(self, cart_key: str) -> None:
+        with self._lock:
+            self._touch(cart_key).clear()
+
+    def delete(self, cart_key: str) -> None:
+        with self._lock:
+            self._carts.pop(cart_key, None)
+            self._expires.pop(cart_key, None)
+
+    def mark_dirty(self, cart_keys: Iterable[str]) -> None:
+        with self._lock:
+            self._dirty.update(cart_keys)
+
+    def pop_dirty(self, limit: int) -> List[str]:
+        with self._lock:
+            keys = [self._dirty.pop() for _ in range(min(limit, len(self._dirty)))]
+        return keys
+
+    def purge_expired(self) -> int:
+        now = time.monotonic()
+        with self._lock:
+            # Dirty carts are kept until they are saved
+            expired = [
+                cart_key
+                for cart_key, expires in self._expires.items()
+                if expires < now and cart_key not in self._dirty
+            ]
+            for cart_key in expired:
+                del self._carts[cart_key]
+                del self._expires[cart_key]
+        return len(expired)
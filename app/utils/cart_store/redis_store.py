@@ -0,0 +1,102 @@
+import redis
+from typing import Dict, Iterable, List, Optional
+from app.core.config import CartStoreSettings
+from app.utils.cart_store.base import BaseCartStore
+
+# Field kept in every cart hash so empty carts still exist in Redis
+MARKER_FIELD = "_"
+
+# KEYS[1] cart, ARGV line key, quantity, max quantity, ttl
+ADD_QUANTITY_SCRIPT = """
+local quantity = redis.call('HINCRBY', KEYS[1], ARGV[1], ARGV[2])
+if quantity > tonumber(ARGV[3]) then
+    quantity = tonumber(ARGV[3])
+    redis.call('HSET', KEYS[1], ARGV[1], quantity)
+end
+redis.call('HSETNX', KEYS[1], '_', 0)
+redis.call('EXPIRE', KEYS[1], ARGV[4])
+return quantity
+"""
+
+# KEYS[1] cart, ARGV ttl followed by line key and quantity pairs
+LOAD_LINES_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    redis.call('HSET', KEYS[1], '_', 0, unpack(ARGV, 2))
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+"""
+
+
+class RedisCartStore(BaseCartStore):
+    """Cart store on Redis or any server speaking the Redis protocol
+
+    Each cart is a hash of line key to quantity, so adding to a line is a
+    single atomic HINCRBY and carts are shared by all API processes. Dirty
+    carts are kept in a set and taken with SPOP, so each change is saved by
+    one process only.
+    """
+
+    def __init__(self):
+        settings = CartStoreSettings()
+        self.client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+        self.prefix = settings.REDIS_KEY_PREFIX
+        self.ttl_seconds = settings.CART_TTL_DAYS * 86400
+        self.dirty_key = f"{self.prefix}dirty"
+        self._add_quantity = self.client.register_script(ADD_QUANTITY_SCRIPT)
+        self._load_lines = self.client.register_script(LOAD_LINES_SCRIPT)
+
+    def _key(self, cart_key: str) -> str:
+        return f"{self.prefix}{cart_key}"
+
+    def get_lines(self, cart_key: str) -> Optional[Dict[str, int]]:
+        fields = self.client.hgetall(self._key(cart_key))
+        if not fields:
+            return None
+        fields.pop(MARKER_FIELD, None)
+        return {key: int(quantity) for key, quantity in fields.items()}
+
+    def load_lines(self, cart_key: str, lines: Dict[str, int]) -> None:
+        args = [self.ttl_seconds]
+        for key, quantity in lines.items():
+            args.extend((key, quantity))
+        self._load_lines(keys=[self._key(cart_key)], args=args)
+
+    def add_quantity(
+        self, cart_key: str, key: str, quantity: int, max_quantity: int
+    ) -> int:
+        return int(
+            self._add_quantity(
+                keys=[self._key(cart_key)],
+                args=[key, quantity, max_quantity, self.ttl_seconds],
+            )
+        )
+
+    def set_quantity(self, cart_key: str, key: str, quantity: int) -> None:
+        name = self._key(cart_key)
+        with self.client.pipeline() as pipe:
+            if quantity > 0:
+                pipe.hset(name, key, quantity)
+            else:
+                pipe.hdel(name, key)
+            pipe.hsetnx(name, MARKER_FIELD, 0)
+            pipe.expire(name, self.ttl_seconds)
+            pipe.execute()
+
+    def clear(self, cart_key: str) -> None:
+        name = self._key(cart_key)
+        with self.client.pipeline() as pipe:
+            pipe.delete(name)
+            pipe.hset(name, MARKER_FIELD, 0)
+            pipe.expire(name, self.ttl_seconds)
+            pipe.execute()
+
+    def delete(self, cart_key: str) -> None:
+        self.client.delete(self._key(cart_key))
+
+    def mark_dirty(self, cart_keys: Iterable[str]) -> None:
+        cart_keys = list(cart_keys)
+        if cart_keys:
+            self.client.sadd(self.dirty_key, *cart_keys)
+
+    def pop_dirty(self, limit: int) -> List[str]:
+        return self.client.spop(self.dirty_key, limit) or []
@@ -0,0 +1,315 @@
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import Session
+from app.core.logger import logger
+from app.db.database import SessionLocal
+from app.models.product import ProductVariant
+from app.models.user import Cart, CartItem, User
+from app.utils.cart_store import (
+    BaseCartStore,
+    get_cart_store,
+    line_key,
+    parse_line_key,
+)
+from app.utils.pricing import PricedLine, PriceResolver
+
+# Maximum quantity of a single cart line
+MAX_CART_LINE_QUANTITY = 99
+# Seconds between write-behind flushes of changed carts
+CART_FLUSH_INTERVAL = 5
+# Carts saved per transaction
+CART_FLUSH_BATCH_SIZE = 500
+
+USER_CART_PREFIX = "user:"
+GUEST_CART_PREFIX = "guest:"
+
+
+def user_cart_key(user_id: int) -> str:
+    return f"{USER_CART_PREFIX}{user_id}"
+
+
+def guest_cart_key(cart_token: str) -> str:
+    return f"{GUEST_CART_PREFIX}{cart_token}"
+
+
+def _changed(store: BaseCartStore, cart_key: str) -> None:
+    # Only user carts are persisted, guest carts live in the store
+    if cart_key.startswith(USER_CART_PREFIX):
+        store.mark_dirty([cart_key])
+
+
+def load_saved_cart(db: Session, user_id: int) -> Dict[str, int]:
+    """Lines of the cart a user has in the database
+
+    Variants are not stored on cart items, they are found again by SKU.
+    """
+    items = db.execute(
+        select(CartItem.product_id, CartItem.product_sku, CartItem.quantity)
+        .join(Cart, Cart.id == CartItem.cart_id)
+        .where(
+            Cart.user_id == user_id,
+            Cart.is_active == True,
+            CartItem.is_active == True,
+            CartItem.product_id.is_not(None),
+        )
+    ).all()
+    skus = {sku for _, sku, _ in items if sku}
+    variants = {}
+    if skus:
+        variants = {
+            (product_id, sku): id
+            for id, product_id, sku in db.execute(
+                select(
+                    ProductVariant.id, ProductVariant.product_id, ProductVariant.sku
+                ).where(ProductVariant.sku.in_(skus))
+            )
+        }
+
+    lines: Dict[str, int] = defaultdict(int)
+    for product_id, sku, quantity in items:
+        key = line_key(product_id, variants.get((product_id, sku)))
+        lines[key] = min(lines[key] + quantity, MAX_CART_LINE_QUANTITY)
+    return dict(lines)
+
+
+def cart_lines(db: Session, store: BaseCartStore, cart_key: str) -> Dict[str, int]:
+    """Lines of a cart, loading a user's saved cart into the store on a miss"""
+    lines = store.get_lines(cart_key)
+    if lines is not None:
+        return lines
+
+    saved = {}
+    if cart_key.startswith(USER_CART_PREFIX):
+        saved = load_saved_cart(db, int(cart_key[len(USER_CART_PREFIX) :]))
+    # Another request may have loaded the cart meanwhile, its lines win
+    store.load_lines(cart_key, saved)
+    lines = store.get_lines(cart_key)
+    return lines if lines is not None else saved
+
+
+def price_cart(resolver: PriceResolver, lines: Dict[str, int]) -> Dict:
+    """Price all lines at current prices and compute the totals in one pass
+
+    Products and variants of all lines are loaded with one query each.
+    Lines whose product or variant is no longer available are returned
+    separately.
+    """
+    parsed = {key: parse_line_key(key) for key in lines}
+    resolver.load(
+        (product_id for product_id, _ in parsed.values()),
+        (variant_id for _, variant_id in parsed.values() if variant_id is not None),
+    )
+
+    items: List[PricedLine] = []
+    unavailable: List[str] = []
+    total_items, total_price = 0, Decimal(0)
+    for key in sorted(lines, key=lambda key: (parsed[key][0], parsed[key][1] or 0)):
+        product_id, variant_id = parsed[key]
+        line = resolver.resolve(product_id, variant_id, lines[key])
+        if line is None:
+            unavailable.append(key)
+            continue
+        items.append(line)
+        total_items += line.quantity
+        total_price += line.total_price
+
+    return {
+        "items": items,
+        "unavailable": unavailable,
+        "total_items": total_items,
+        "total_price": total_price,
+    }
+
+
+def get_cart(
+    db: Session, store: BaseCartStore, resolver: PriceResolver, cart_key: str
+) -> Dict:
+    """Priced cart, lines of products no longer sold are dropped"""
+    cart = price_cart(resolver, cart_lines(db, store, cart_key))
+    if cart["unavailable"]:
+        for key in cart["unavailable"]:
+            store.set_quantity(cart_key, key, 0)
+        _changed(store, cart_key)
+    return cart
+
+
+def add_to_cart(
+    db: Session,
+    store: BaseCartStore,
+    resolver: PriceResolver,
+    cart_key: str,
+    product_id: int,
+    variant_id: Optional[int],
+    quantity: int,
+) -> int:
+    """Add quantity to a cart line, returns the new line quantity"""
+    if resolver.resolve(product_id, variant_id, quantity) is None:
+        what = "Variant" if variant_id is not None else "Product"
+        raise LookupError(f"{what} with ID {variant_id or product_id} is not available")
+
+    cart_lines(db, store, cart_key)
+    quantity = store.add_quantity(
+        cart_key,
+        line_key(product_id, variant_id),
+        quantity,
+        MAX_CART_LINE_QUANTITY,
+    )
+    _changed(store, cart_key)
+    return quantity
+
+
+def set_cart_quantity(
+    db: Session,
+    store: BaseCartStore,
+    cart_key: str,
+    product_id: int,
+    variant_id: Optional[int],
+    quantity: int,
+) -> None:
+    """Change the quantity of an existing cart line, 0 removes it"""
+    key = line_key(product_id, variant_id)
+    if key not in cart_lines(db, store, cart_key):
+        raise LookupError("Item is not in the cart")
+    store.set_quantity(cart_key, key, quantity)
+    _changed(store, cart_key)
+
+
+def clear_cart(db: Session, store: BaseCartStore, cart_key: str) -> None:
+    cart_lines(db, store, cart_key)
+    store.clear(cart_key)
+    _changed(store, cart_key)
+
+
+def merge_carts(
+    db: Session, store: BaseCartStore, guest_key: str, user_key: str
+) -> int:
+    """Move the lines of a guest cart into a user's cart
+
+    Quantities of lines in both carts are added up. The guest cart is
+    dropped afterwards. Returns the number of lines merged.
+    """
+    guest_lines = store.get_lines(guest_key)
+    if not guest_lines:
+        return 0
+
+    cart_lines(db, store, user_key)
+    for key, quantity in guest_lines.items():
+        store.add_quantity(user_key, key, quantity, MAX_CART_LINE_QUANTITY)
+    store.delete(guest_key)
+    _changed(store, user_key)
+    return len(guest_lines)
+
+
+def save_carts(
+    db: Session,
+    store: BaseCartStore,
+    batch_size: int = CART_FLUSH_BATCH_SIZE,
+) -> int:
+    """Write changed user carts from the store to carts and cart_items
+
+    Takes a batch of dirty carts, prices all of their lines with one query
+    for products and one for variants, then replaces the items of all
+    carts with one DELETE and one multi-row INSERT. Carts that fail to
+    save are marked dirty again. Returns the number of dirty carts taken.
+    """
+    cart_keys = store.pop_dirty(batch_size)
+    if not cart_keys:
+        return 0
+
+    try:
+        lines: Dict[int, Dict[str, int]] = {}
+        for cart_key in cart_keys:
+            cart = store.get_lines(cart_key)
+            # Carts that expired from the store keep their saved items
+            if cart is not None:
+                lines[int(cart_key[len(USER_CART_PREFIX) :])] = cart
+        # Carts of deleted users are dropped
+        users = db.execute(select(User.id).where(User.id.in_(lines.keys())))
+        lines = {user_id: lines[user_id] for user_id in users.scalars()}
+        if not lines:
+            return len(cart_keys)
+
+        carts = dict(
+            db.execute(
+                select(Cart.user_id, func.min(Cart.id))
+                .where(Cart.user_id.in_(lines.keys()), Cart.is_active == True)
+                .group_by(Cart.user_id)
+            ).all()
+        )
+        now = datetime.utcnow()
+        missing = [user_id for user_id in lines if user_id not in carts]
+        if missing:
+            created = db.execute(
+                insert(Cart).returning(Cart.user_id, Cart.id),
+                [
+                    {
+                        "user_id": user_id,
+                        "is_active": True,
+                        "created_at": now,
+                        "updated_at": now,
+                    }
+                    for user_id in missing
+                ],
+            ).all()
+            carts.update(dict(created))
+
+        resolver = PriceResolver(db)
+        parsed = [parse_line_key(key) for cart in lines.values() for key in cart]
+        resolver.load(
+            (product_id for product_id, _ in parsed),
+            (variant_id for _, variant_id in parsed if variant_id is not None),
+        )
+        rows = []
+        for user_id, cart in lines.items():
+            for line in price_cart(resolver, cart)["items"]:
+                rows.append(
+                    {
+                        "cart_id": carts[user_id],
+                        "product_id": line.product_id,
+                        "product_name": line.product_name,
+                        "product_sku": line.product_sku,
+                        "quantity": line.quantity,
+                        "price": line.price,
+                        "total_price": line.total_price,
+                        "is_active": True,
+                        "created_at": now,
+                        "updated_at": now,
+                    }
+                )
+
+        cart_ids = [carts[user_id] for user_id in lines]
+        db.execute(delete(CartItem).where(CartItem.cart_id.in_(cart_ids)))
+        if rows:
+            db.execute(insert(CartItem), rows)
+        db.execute(
+            update(Cart)
+            .where(Cart.id.in_(cart_ids))
+            .values(updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        # Keep the carts for the next flush
+        store.mark_dirty(cart_keys)
+        raise
+
+    return len(cart_keys)
+
+
+def flush_carts() -> None:
+    """Save all changed carts of the process-wide store"""
+    store = get_cart_store()
+    saved = 0
+    with SessionLocal() as db:
+        while True:
+            count = save_carts(db, store)
+            if not count:
+                break
+            saved += count
+    expired = store.purge_expired()
+    if saved or expired:
+        logger.debug(f"Saved {saved} carts, expired {expired} carts")
@@ -0,0 +1,399 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import formataddr
+from typing import Dict, List, NamedTuple, Optional, Tuple
+import aiosmtplib
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from app.core.email import render_email
+from app.core.logger import logger
+from app.core.settings import settings
+from app.db.database import SessionLocal
+from app.models.email import QueuedEmail
+
+# Seconds between worker runs when the queue is empty
+EMAIL_QUEUE_INTERVAL = 1
+# Emails claimed and sent concurrently per batch
+EMAIL_BATCH_SIZE = 50
+# Seconds a claimed email stays hidden from other workers, a worker that
+# dies mid-batch leaves its emails to be sent again after this
+EMAIL_CLAIM_SECONDS = 120
+# Emails failing this many times are given up and kept for inspection
+EMAIL_MAX_ATTEMPTS = 6
+# Retry delay in seconds doubles from the base after every failure
+EMAIL_BACKOFF_BASE = 30
+EMAIL_BACKOFF_MAX = 3600
+# Seconds a pooled SMTP connection may sit idle before it is closed
+EMAIL_SMTP_IDLE_SECONDS = 60
+EMAIL_SMTP_TIMEOUT = 30
+
+
+class ClaimedEmail(NamedTuple):
+    id: int
+    email_to: str
+    subject: str
+    template_name: str
+    data: Dict
+    attempts: int
+    created_at: datetime
+
+
+class SendResult(NamedTuple):
+    email: ClaimedEmail
+    error: Optional[str]
+    permanent: bool
+    latency: float
+
+
+def enqueue_email(
+    db: Session, email_to: str, subject: str, template_name: str, data: Dict
+) -> None:
+    """Queue an email in the caller's transaction
+
+    It is only sent if the transaction commits, and sent at least once
+    after it does.
+    """
+    now = datetime.utcnow()
+    db.execute(
+        insert(QueuedEmail).values(
+            email_to=email_to,
+            subject=subject,
+            template_name=template_name,
+            data=data,
+            attempts=0,
+            available_at=now,
+            created_at=now,
+        )
+    )
+
+
+def retry_delay(attempts: int) -> int:
+    """Seconds to wait before the next try after attempts failures"""
+    return min(EMAIL_BACKOFF_BASE * 2 ** (attempts - 1), EMAIL_BACKOFF_MAX)
+
+
+def claim_emails(batch_size: int = EMAIL_BATCH_SIZE) -> List[ClaimedEmail]:
+    """Claim due emails for EMAIL_CLAIM_SECONDS and commit right away
+
+    Rows are picked with FOR UPDATE SKIP LOCKED and hidden by moving
+    available_at forward, so no transaction stays open while sending.
+    """
+    now = datetime.utcnow()
+    due = (
+        select(QueuedEmail.id)
+        .where(QueuedEmail.failed_at.is_(None), QueuedEmail.available_at <= now)
+        .order_by(QueuedEmail.available_at, QueuedEmail.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    with SessionLocal() as db:
+        rows = db.execute(
+            update(QueuedEmail)
+            .where(QueuedEmail.id.in_(due.scalar_subquery()))
+            .values(available_at=now + timedelta(seconds=EMAIL_CLAIM_SECONDS))
+            .returning(
+                QueuedEmail.id,
+                QueuedEmail.email_to,
+                QueuedEmail.subject,
+                QueuedEmail.template_name,
+                QueuedEmail.data,
+                QueuedEmail.attempts,
+                QueuedEmail.created_at,
+            )
+            .execution_options(synchronize_session=False)
+        ).all()
+        db.commit()
+    return sorted((ClaimedEmail(*row) for row in rows), key=lambda email: email.id)
+
+
+def record_results(results: List[SendResult]) -> None:
+    """Delete sent emails and push failed ones back or give them up"""
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        sent = [result.email.id for result in results if result.error is None]
+        if sent:
+            db.execute(delete(QueuedEmail).where(QueuedEmail.id.in_(sent)))
+        for result in results:
+            if result.error is None:
+                continue
+            attempts = result.email.attempts + 1
+            values = {"attempts": attempts, "last_error": result.error}
+            if result.permanent or attempts >= EMAIL_MAX_ATTEMPTS:
+                values["failed_at"] = now
+            else:
+                values["available_at"] = now + timedelta(seconds=retry_delay(attempts))
+            db.execute(
+                update(QueuedEmail)
+                .where(QueuedEmail.id == result.email.id)
+                .values(**values)
+            )
+        db.commit()
+
+
+def build_message(email: ClaimedEmail) -> EmailMessage:
+    message = EmailMessage()
+    message["From"] = formataddr((settings.MAIL_FROM_NAME, settings.MAIL_FROM))
+    message["To"] = email.email_to
+    message["Subject"] = email.subject
+    message.set_content(render_email(email.template_name, email.data), subtype="html")
+    return message
+
+
+def build_messages(
+    emails: List[ClaimedEmail],
+) -> Tuple[List[Tuple[ClaimedEmail, EmailMessage]], List[SendResult]]:
+    """Render a batch of emails, run in a worker thread
+
+    Returns the rendered messages and a failed result for every email
+    whose template does not render, which will not succeed on a retry.
+    """
+    messages = []
+    failures = []
+    for email in emails:
+        try:
+            messages.append((email, build_message(email)))
+        except Exception as e:
+            failures.append(SendResult(email, f"Rendering failed: {e}", True, 0.0))
+    return messages, failures
+
+
+class SMTPPool:
+    """SMTP connections kept open across batches
+
+    At most size messages are sent at once, one per connection.
+    Connections are opened on first use, reopened when the server dropped
+    them, and closed by close_idle after sitting unused.
+    """
+
+    def __init__(self, size: int = settings.MAIL_POOL_SIZE):
+        self.size = size
+        self._idle: Optional[asyncio.Queue] = None
+        self._clients: List[aiosmtplib.SMTP] = []
+        self._last_used: Dict[int, float] = {}
+
+    def _new_client(self) -> aiosmtplib.SMTP:
+        return aiosmtplib.SMTP(
+            hostname=settings.MAIL_SERVER,
+            port=settings.MAIL_PORT,
+            use_tls=settings.MAIL_SSL_TLS,
+            start_tls=settings.MAIL_STARTTLS and not settings.MAIL_SSL_TLS,
+            timeout=EMAIL_SMTP_TIMEOUT,
+        )
+
+    async def _connect(self, client: aiosmtplib.SMTP) -> None:
+        await client.connect()
+        if settings.MAIL_USE_CREDENTIALS:
+            await client.login(settings.MAIL_USERNAME, settings.MAIL_PASSWORD)
+
+    async def send(self, message: EmailMessage) -> None:
+        if self._idle is None:
+            # The queue belongs to the running event loop, so create it lazily
+            self._idle = asyncio.Queue()
+            for _ in range(self.size):
+                client = self._new_client()
+                self._clients.append(client)
+                self._idle.put_nowait(client)
+
+        client = await self._idle.get()
+        try:
+            if not client.is_connected:
+                await self._connect(client)
+            try:
+                await client.send_message(message)
+            except aiosmtplib.SMTPServerDisconnected:
+                # The server closed the idle connection, reconnect once
+                client.close()
+                await self._connect(client)
+                await client.send_message(message)
+        except (aiosmtplib.SMTPResponseException, aiosmtplib.SMTPRecipientsRefused):
+            # The server rejected the message, the envelope was reset and the
+            # connection can be reused
+            raise
+        except Exception:
+            # The connection state is unknown, start over on the next send
+            client.close()
+            raise
+        finally:
+            self._last_used[id(client)] = time.monotonic()
+            self._idle.put_nowait(client)
+
+    async def close_idle(self, max_idle: float = EMAIL_SMTP_IDLE_SECONDS) -> None:
+        """Close connections unused for max_idle seconds, call between batches"""
+        now = time.monotonic()
+        for client in self._clients:
+            if client.is_connected and now - self._last_used.get(id(client), 0) > (
+                max_idle
+            ):
+                await self._quit(client)
+
+    async def close(self) -> None:
+        for client in self._clients:
+            if client.is_connected:
+                await self._quit(client)
+
+    @staticmethod
+    async def _quit(client: aiosmtplib.SMTP) -> None:
+        try:
+            await client.quit()
+        except Exception:
+            client.close()
+
+
+class EmailMetrics:
+    """Send counters and latency of the email worker in this process
+
+    Send latency is the SMTP time of one message, queue lag the time from
+    queueing an email to sending it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.retried = 0
+        self.failed = 0
+        self.send_latency_total = 0.0
+        self.max_send_latency = 0.0
+        self.last_queue_lag = 0.0
+        self.last_batch_at: Optional[datetime] = None
+
+    def record(self, results: List[SendResult]) -> None:
+        now = datetime.utcnow()
+        with self._lock:
+            for result in results:
+                if result.error is None:
+                    self.sent += 1
+                    self.send_latency_total += result.latency
+                    self.max_send_latency = max(self.max_send_latency, result.latency)
+                    self.last_queue_lag = (
+                        now - result.email.created_at
+                    ).total_seconds()
+                elif (
+                    result.permanent or result.email.attempts + 1 >= EMAIL_MAX_ATTEMPTS
+                ):
+                    self.failed += 1
+                else:
+                    self.retried += 1
+            self.last_batch_at = now
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            average = self.send_latency_total / self.sent if self.sent else 0.0
+            return {
+                "sent": self.sent,
+                "retried": self.retried,
+                "failed": self.failed,
+                "avg_send_latency_seconds": round(average, 3),
+                "max_send_latency_seconds": round(self.max_send_latency, 3),
+                "last_queue_lag_seconds": round(self.last_queue_lag, 3),
+                "last_batch_at": self.last_batch_at,
+            }
+
+
+email_metrics = EmailMetrics()
+
+
+async def send_queued_email(
+    pool: SMTPPool, email: ClaimedEmail, message: EmailMessage
+) -> SendResult:
+    started = time.monotonic()
+    try:
+        await pool.send(message)
+    except aiosmtplib.SMTPRecipientsRefused as e:
+        permanent = all(refused.code >= 500 for refused in e.recipients)
+        return SendResult(email, str(e), permanent, time.monotonic() - started)
+    except aiosmtplib.SMTPResponseException as e:
+        # 5xx replies such as an unknown recipient will not succeed later
+        return SendResult(email, str(e), e.code >= 500, time.monotonic() - started)
+    except Exception as e:
+        return SendResult(email, str(e) or repr(e), False, time.monotonic() - started)
+    return SendResult(email, None, False, time.monotonic() - started)
+
+
+async def process_email_queue(
+    pool: SMTPPool, batch_size: int = EMAIL_BATCH_SIZE
+) -> int:
+    """Send due emails in batches until none are due
+
+    Each batch is rendered in a worker thread, keeping large campaigns
+    off the event loop, then sent concurrently over the pool's
+    connections. Returns the number of emails handled, sent or not.
+    """
+    handled = 0
+    while True:
+        emails = await run_in_threadpool(claim_emails, batch_size)
+        if not emails:
+            return handled
+
+        messages, results = await run_in_threadpool(build_messages, emails)
+        results += await asyncio.gather(
+            *(send_queued_email(pool, email, message) for email, message in messages)
+        )
+        await run_in_threadpool(record_results, results)
+        email_metrics.record(results)
+        for result in results:
+            if result.error:
+                logger.warning(
+                    f"Email {result.email.id} to {result.email.email_to} failed: "
+                    f"{result.error}"
+                )
+        handled += len(emails)
+
+
+async def run_email_worker(interval: float = EMAIL_QUEUE_INTERVAL) -> None:
+    """Drain the email queue until cancelled"""
+    pool = SMTPPool()
+    try:
+        while True:
+            try:
+                if not await process_email_queue(pool):
+                    await pool.close_idle()
+            except Exception:
+                logger.exception("Email worker failed")
+            await asyncio.sleep(interval)
+    finally:
+        await pool.close()
+
+
+def email_queue_stats(db: Session) -> Dict:
+    """Depth of the email queue and the age of its oldest pending email"""
+    now = datetime.utcnow()
+    pending, oldest = db.execute(
+        select(func.count(), func.min(QueuedEmail.created_at)).where(
+            QueuedEmail.failed_at.is_(None)
+        )
+    ).one()
+    failed = db.execute(
+        select(func.count()).where(QueuedEmail.failed_at.is_not(None))
+    ).scalar()
+    return {
+        "pending": pending,
+        "failed": failed,
+        "oldest_pending_age_seconds": (
+            round((now - oldest).total_seconds(), 3) if oldest else 0
+        ),
+        "worker": email_metrics.snapshot(),
+    }
+
+
+def retry_failed_emails(db: Session) -> int:
+    """Make given up emails due again, returns the number of emails"""
+    result = db.execute(
+        update(QueuedEmail)
+        .where(QueuedEmail.failed_at.is_not(None))
+        .values(failed_at=None, attempts=0, available_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def main():
+    logger.info("Email worker started")
+    asyncio.run(run_email_worker())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+from typing import Dict, Optional
+from app.core.events import (
+    ORDER_CREATED,
+    ORDER_STATUS_CHANGED,
+    PRODUCT_CHANGED,
+    USER_REGISTERED,
+    USER_UPDATED,
+    subscribe,
+)
+from app.core.settings import settings
+from app.db.database import SessionLocal
+from app.models.order import Order, OrderStatus, PaymentStatus
+from app.models.user import User
+from app.utils.email_queue import enqueue_email
+from app.utils.variant_index import variant_index
+
+# Subject of the email sent when an order reaches a status
+ORDER_STATUS_SUBJECTS = {
+    OrderStatus.SHIPPED.value: "Your order has shipped",
+    OrderStatus.DELIVERED.value: "Your order has been delivered",
+    OrderStatus.CANCELLED.value: "Your order has been cancelled",
+}
+ORDER_PAID_SUBJECT = "Payment received for your order"
+ORDER_CREATED_SUBJECT = "We received your order"
+
+
+def queue_order_email(order_id: int, subject: str) -> None:
+    """Queue an order status email to the customer of an order"""
+    with SessionLocal() as db:
+        order: Optional[Order] = db.get(Order, order_id)
+        if order is None or order.user is None:
+            # Archived or deleted with its user, nobody to tell
+            return
+        enqueue_email(
+            db,
+            order.user.email,
+            subject,
+            "order_status",
+            {
+                "username": order.user.username,
+                "order_number": order.order_number,
+                "status": order.status.value,
+                "payment_status": order.payment_status.value,
+                "total_amount": str(order.total_amount),
+            },
+        )
+        db.commit()
+
+
+def on_order_created(event: str, payload: Dict) -> None:
+    queue_order_email(payload["order_id"], ORDER_CREATED_SUBJECT)
+
+
+def on_order_status_changed(event: str, payload: Dict) -> None:
+    if payload["from_status"] != payload["to_status"]:
+        subject = ORDER_STATUS_SUBJECTS.get(payload["to_status"])
+    elif payload["to_payment_status"] == PaymentStatus.PAID.value:
+        subject = ORDER_PAID_SUBJECT
+    else:
+        subject = None
+    if subject:
+        queue_order_email(payload["order_id"], subject)
+
+
+def on_product_changed(event: str, payload: Dict) -> None:
+    # Variant price and stock are cached in the variant index of the
+    # dispatching process, other processes rebuild it after its TTL
+    variant_index.invalidate(payload["product_id"])
+
+
+def on_user_registered(event: str, payload: Dict) -> None:
+    with SessionLocal() as db:
+        user: Optional[User] = db.get(User, payload["user_id"])
+        if user is None or user.is_verified or not user.verification_code:
+            # Verified already or created by staff without a code
+            return
+        verification_url = (
+            f"{settings.FRONTEND_URL}/verify-email?code={user.verification_code}"
+        )
+        enqueue_email(
+            db,
+            user.email,
+            "Verify your email",
+            "verify_email",
+            {"verification_url": verification_url},
+        )
+        db.commit()
+
+
+def on_user_updated(event: str, payload: Dict) -> None:
+    if "password" not in payload["fields"]:
+        return
+    with SessionLocal() as db:
+        user: Optional[User] = db.get(User, payload["user_id"])
+        if user is None:
+            return
+        # Tell the owner, so a change they did not make is noticed
+        enqueue_email(
+            db,
+            user.email,
+            "Your password was changed",
+            "password_changed",
+            {"username": user.username},
+        )
+        db.commit()
+
+
+subscribe(ORDER_CREATED, on_order_created)
+subscribe(ORDER_STATUS_CHANGED, on_order_status_changed)
+subscribe(PRODUCT_CHANGED, on_product_changed)
+subscribe(USER_REGISTERED, on_user_registered)
+subscribe(USER_UPDATED, on_user_updated)
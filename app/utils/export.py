@@ -0,0 +1,100 @@
+import csv
+import enum
+import io
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, List
+from fastapi.responses import StreamingResponse
+from sqlalchemy.sql import Select
+from app.db.database import SessionLocal
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_YIELD_PER = 1000
+
+EXPORT_MEDIA_TYPES = {
+    "csv": "text/csv",
+    "jsonl": "application/jsonl",
+    "ndjson": "application/x-ndjson",
+}
+
+EXPORT_FORMAT_REGEX = "^(csv|jsonl|ndjson)$"
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.value
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _csv_value(value):
+    if value is None:
+        return ""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def iter_csv(records: Iterable[Dict], columns: List[str]) -> Iterator[str]:
+    """Encode records as CSV lines, one chunk per record"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for record in records:
+        writer.writerow([_csv_value(record.get(column)) for column in columns])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def iter_json_lines(records: Iterable[Dict]) -> Iterator[str]:
+    """Encode records as newline-delimited JSON"""
+    for record in records:
+        yield json.dumps(record, default=_json_default) + "\n"
+
+
+def stream_query(
+    statement: Select, yield_per: int = EXPORT_YIELD_PER
+) -> Iterator[Dict]:
+    """Yield rows of a Core select as dicts using a server-side cursor
+
+    The statement selects plain columns rather than ORM entities, so no
+    objects are added to a session identity map while streaming. The
+    session is owned by the generator because the response body is produced
+    after the request dependencies have finished.
+    """
+    with SessionLocal() as db:
+        result = db.execute(
+            statement.execution_options(stream_results=True, yield_per=yield_per)
+        )
+        for row in result.mappings():
+            yield dict(row)
+
+
+def export_response(
+    records: Iterable[Dict],
+    columns: List[str],
+    fmt: str,
+    filename: str,
+) -> StreamingResponse:
+    """Build a streaming download response in the requested format"""
+    if fmt == "csv":
+        body = iter_csv(records, columns)
+    else:
+        body = iter_json_lines(records)
+
+    extension = "csv" if fmt == "csv" else fmt
+    return StreamingResponse(
+        body,
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}.{extension}"'
+        },
+    )
@@ -0,0 +1,226 @@
+import asyncio
+import hashlib
+import time
+import weakref
+from datetime import datetime, timedelta
+from typing import Callable, Coroutine, Optional, Tuple
+from fastapi import HTTPException, Request, Response, status
+from fastapi.routing import APIRoute
+from fastapi.security.utils import get_authorization_scheme_param
+from sqlalchemy import and_, delete, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from starlette.concurrency import run_in_threadpool
+from app.core.logger import logger
+from app.core.security import get_token_user_id
+from app.core.settings import settings
+from app.db.database import SessionLocal
+from app.models.idempotency import IdempotencyKey
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+# Seconds a retry waits for the first request before giving up with 409
+IDEMPOTENCY_WAIT_SECONDS = 10
+IDEMPOTENCY_POLL_INTERVAL = 0.1
+# Seconds a request keeps its claim on a key, after which a retry takes the
+# key over, so a process that dies mid-request does not block it until expiry
+IDEMPOTENCY_LEASE_SECONDS = 60
+# Seconds between purges of expired keys
+IDEMPOTENCY_PURGE_INTERVAL = 3600
+
+# (owner, scope, key)
+KeyId = Tuple[str, str, str]
+
+# Serializes requests with the same key inside this process
+_locks: "weakref.WeakValueDictionary[KeyId, asyncio.Lock]" = (
+    weakref.WeakValueDictionary()
+)
+
+
+def _hash(value: bytes) -> str:
+    return hashlib.sha256(value).hexdigest()
+
+
+def claim_key(key_id: KeyId, request_hash: str) -> Optional[IdempotencyKey]:
+    """Claim a key for this request
+
+    Returns None when the caller now owns the key and must run the request,
+    otherwise the stored row of the earlier request. Expired rows, and rows
+    of requests still in progress after IDEMPOTENCY_LEASE_SECONDS, are taken
+    over as if they did not exist.
+    """
+    owner, scope, key = key_id
+    now = datetime.utcnow()
+    with SessionLocal() as db:
+        statement = pg_insert(IdempotencyKey).values(
+            owner=owner,
+            scope=scope,
+            key=key,
+            request_hash=request_hash,
+            created_at=now,
+            expires_at=now + timedelta(hours=settings.IDEMPOTENCY_KEY_TTL_HOURS),
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[
+                IdempotencyKey.owner,
+                IdempotencyKey.scope,
+                IdempotencyKey.key,
+            ],
+            set_={
+                "request_hash": statement.excluded.request_hash,
+                "status_code": None,
+                "media_type": None,
+                "response_body": None,
+                "created_at": statement.excluded.created_at,
+                "expires_at": statement.excluded.expires_at,
+            },
+            where=or_(
+                IdempotencyKey.expires_at < now,
+                and_(
+                    IdempotencyKey.status_code.is_(None),
+                    IdempotencyKey.created_at
+                    < now - timedelta(seconds=IDEMPOTENCY_LEASE_SECONDS),
+                ),
+            ),
+        )
+        claimed = db.execute(statement.returning(IdempotencyKey.key)).first()
+        db.commit()
+        if claimed:
+            return None
+
+        record = db.get(IdempotencyKey, key_id)
+        db.expunge_all()
+        return record
+
+
+def store_response(key_id: KeyId, response: Response) -> None:
+    with SessionLocal() as db:
+        record = db.get(IdempotencyKey, key_id)
+        if record is not None:
+            record.status_code = response.status_code
+            record.media_type = response.headers.get("content-type")
+            record.response_body = bytes(response.body)
+            db.commit()
+
+
+def release_key(key_id: KeyId) -> None:
+    """Forget a claimed key so the request can be retried"""
+    owner, scope, key = key_id
+    with SessionLocal() as db:
+        db.execute(
+            delete(IdempotencyKey).where(
+                IdempotencyKey.owner == owner,
+                IdempotencyKey.scope == scope,
+                IdempotencyKey.key == key,
+                IdempotencyKey.status_code.is_(None),
+            )
+        )
+        db.commit()
+
+
+def purge_expired_idempotency_keys() -> None:
+    with SessionLocal() as db:
+        result = db.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.expires_at < datetime.utcnow())
+        )
+        db.commit()
+    if result.rowcount:
+        logger.debug(f"Purged {result.rowcount} expired idempotency keys")
+
+
+def request_user_id(request: Request) -> Optional[str]:
+    """User ID of the bearer token of a request, None without a valid token"""
+    scheme, token = get_authorization_scheme_param(request.headers.get("authorization"))
+    if scheme.lower() != "bearer" or not token:
+        return None
+    return get_token_user_id(token)
+
+
+def replay(record: IdempotencyKey) -> Response:
+    return Response(
+        content=record.response_body,
+        status_code=record.status_code,
+        headers={"Idempotent-Replayed": "true"},
+        media_type=record.media_type,
+    )
+
+
+async def run_idempotent(
+    request: Request,
+    owner: str,
+    key: str,
+    handler: Callable[[Request], Coroutine[None, None, Response]],
+) -> Response:
+    if len(key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{IDEMPOTENCY_HEADER} is too long",
+        )
+
+    key_id = (owner, f"{request.method} {request.url.path}", key)
+    # The body is cached on the request, the handler reads it again
+    request_hash = _hash(await request.body())
+
+    lock = _locks.get(key_id)
+    if lock is None:
+        lock = _locks[key_id] = asyncio.Lock()
+
+    async with lock:
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            record = await run_in_threadpool(claim_key, key_id, request_hash)
+            if record is None:
+                break
+            if record.request_hash != request_hash:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"{IDEMPOTENCY_HEADER} was used with a different request",
+                )
+            if record.status_code is not None:
+                return replay(record)
+            # Another process is running the first request
+            if time.monotonic() > deadline:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail="A request with this idempotency key is in progress",
+                )
+            await asyncio.sleep(IDEMPOTENCY_POLL_INTERVAL)
+
+        try:
+            response = await handler(request)
+        except BaseException:
+            await run_in_threadpool(release_key, key_id)
+            raise
+
+        # Only successful responses are kept, failed requests may be retried
+        if 200 <= response.status_code < 300 and hasattr(response, "body"):
+            await run_in_threadpool(store_response, key_id, response)
+        else:
+            await run_in_threadpool(release_key, key_id)
+        return response
+
+
+class IdempotentRoute(APIRoute):
+    """Route class that makes POST requests idempotent
+
+    POST requests sent with an Idempotency-Key header run once per key;
+    retries with the same key and body get the stored response byte for
+    byte, and concurrent duplicates wait for the first one to finish.
+    Requests without the header are not affected. Keys are per user, the
+    user ID is read from the bearer token.
+    """
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine]:
+        handler = super().get_route_handler()
+
+        async def idempotent_route_handler(request: Request) -> Response:
+            key = request.headers.get(IDEMPOTENCY_HEADER)
+            if request.method != "POST" or not key:
+                return await handler(request)
+            # Keys are scoped to the user so they cannot replay another user's
+            # response, unauthenticated requests are left to fail in the route
+            owner = request_user_id(request)
+            if owner is None:
+                return await handler(request)
+            return await run_idempotent(request, owner, key, handler)
+
+        return idempotent_route_handler
@@ -0,0 +1,423 @@
+import random
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import Session
+from app.models.order import StockReservation
+from app.models.product import Product, ProductStockShard, ProductVariant
+from app.utils.variant_index import variant_index
+
+# (product_id, variant_id or None, quantity)
+StockLine = Tuple[int, Optional[int], int]
+
+
+class InsufficientStockError(ValueError):
+    """Raised when an order line cannot be reserved"""
+
+
+def _group_lines(
+    lines: Iterable[StockLine],
+) -> Tuple[Dict[int, int], Dict[Tuple[int, int], int]]:
+    """Sum quantities per product and per (variant, product)"""
+    products: Dict[int, int] = defaultdict(int)
+    variants: Dict[Tuple[int, int], int] = defaultdict(int)
+    for product_id, variant_id, quantity in lines:
+        if variant_id is None:
+            products[product_id] += quantity
+        else:
+            variants[(variant_id, product_id)] += quantity
+    return products, variants
+
+
+def shard_counts(db: Session, product_ids: Iterable[int]) -> Dict[int, int]:
+    """Number of stock shards of each sharded product among product_ids"""
+    product_ids = list(product_ids)
+    if not product_ids:
+        return {}
+    return dict(
+        db.execute(
+            select(ProductStockShard.product_id, func.count())
+            .where(ProductStockShard.product_id.in_(product_ids))
+            .group_by(ProductStockShard.product_id)
+        ).all()
+    )
+
+
+def _take_from_product(db: Session, product_id: int, quantity: int) -> bool:
+    taken = db.execute(
+        update(Product)
+        .where(Product.id == product_id, Product.stock >= quantity)
+        .values(stock=Product.stock - quantity)
+        .returning(Product.id)
+        .execution_options(synchronize_session=False)
+    ).first()
+    return taken is not None
+
+
+def _take_from_shards(
+    db: Session, product_id: int, shard_count: int, quantity: int
+) -> bool:
+    """Take stock from a sharded product
+
+    Tries one shard with enough stock, starting at a random shard and
+    skipping shards other transactions hold, so concurrent orders spread
+    over the shards instead of waiting on each other. Falls back to the
+    unsharded remainder on the product row and finally to locking all
+    shards and combining them.
+    """
+    start = random.randrange(shard_count)
+    candidate = (
+        select(ProductStockShard.shard_no)
+        .where(
+            ProductStockShard.product_id == product_id,
+            ProductStockShard.stock >= quantity,
+        )
+        .order_by((ProductStockShard.shard_no >= start).desc())
+        .order_by(ProductStockShard.shard_no)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    taken = db.execute(
+        update(ProductStockShard)
+        .where(
+            ProductStockShard.product_id == product_id,
+            ProductStockShard.shard_no == candidate,
+            ProductStockShard.stock >= quantity,
+        )
+        .values(stock=ProductStockShard.stock - quantity)
+        .returning(ProductStockShard.shard_no)
+        .execution_options(synchronize_session=False)
+    ).first()
+    if taken is not None:
+        return True
+
+    if _take_from_product(db, product_id, quantity):
+        return True
+
+    # Stock is spread too thin for any single row, combine them under lock
+    shards = db.execute(
+        select(ProductStockShard.shard_no, ProductStockShard.stock)
+        .where(ProductStockShard.product_id == product_id)
+        .order_by(ProductStockShard.shard_no)
+        .with_for_update()
+    ).all()
+    remainder = db.execute(
+        select(Product.stock).where(Product.id == product_id).with_for_update()
+    ).scalar()
+    if sum(shard.stock for shard in shards) + (remainder or 0) < quantity:
+        return False
+
+    remaining = quantity
+    for shard_no, stock in shards:
+        take = min(stock, remaining)
+        if take:
+            db.execute(
+                update(ProductStockShard)
+                .where(
+                    ProductStockShard.product_id == product_id,
+                    ProductStockShard.shard_no == shard_no,
+                )
+                .values(stock=ProductStockShard.stock - take)
+                .execution_options(synchronize_session=False)
+            )
+            remaining -= take
+        if not remaining:
+            break
+    if remaining:
+        db.execute(
+            update(Product)
+            .where(Product.id == product_id)
+            .values(stock=Product.stock - remaining)
+            .execution_options(synchronize_session=False)
+        )
+    return True
+
+
+def reserve_stock(db: Session, order_id: int, lines: Iterable[StockLine]) -> None:
+    """Take stock for all order lines or none of them
+
+    Every row is decremented with a conditional
+    UPDATE ... SET stock = stock - q WHERE id = :id AND stock >= q, so
+    concurrent orders never read-modify-write the same value and a row
+    without enough stock simply matches nothing. Rows are locked in a fixed
+    order, products then variants by id, so orders sharing rows cannot
+    deadlock. Sharded products take from their stock shards instead of the
+    product row. Runs in the caller's transaction; on InsufficientStockError
+    the caller must roll back to undo the lines already taken.
+    """
+    lines = list(lines)
+    products, variants = _group_lines(lines)
+    sharded = shard_counts(db, products.keys())
+
+    for product_id, quantity in sorted(products.items()):
+        if product_id in sharded:
+            taken = _take_from_shards(db, product_id, sharded[product_id], quantity)
+        else:
+            taken = _take_from_product(db, product_id, quantity)
+        if not taken:
+            raise InsufficientStockError(
+                f"Insufficient stock for product with ID {product_id}"
+            )
+
+    sold_out: Set[int] = set()
+    for (variant_id, product_id), quantity in sorted(variants.items()):
+        taken = db.execute(
+            update(ProductVariant)
+            .where(
+                ProductVariant.id == variant_id,
+                ProductVariant.product_id == product_id,
+                ProductVariant.stock >= quantity,
+            )
+            .values(stock=ProductVariant.stock - quantity)
+            .returning(ProductVariant.stock)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if taken is None:
+            raise InsufficientStockError(
+                f"Insufficient stock for variant with ID {variant_id}"
+            )
+        if taken.stock == 0:
+            sold_out.add(product_id)
+
+    now = datetime.utcnow()
+    db.execute(
+        insert(StockReservation),
+        [
+            {
+                "order_id": order_id,
+                "product_id": product_id,
+                "variant_id": variant_id,
+                "quantity": quantity,
+                "created_at": now,
+            }
+            for product_id, variant_id, quantity in lines
+        ],
+    )
+
+    # Availability shown by the variant index changes when a variant sells out
+    for product_id in sold_out:
+        variant_index.invalidate(product_id)
+
+
+def release_stock(db: Session, order_ids: Iterable[int]) -> None:
+    """Put back stock reserved for the given orders
+
+    Reservations are locked and marked released in the same transaction,
+    so an order cancelled twice concurrently only releases once.
+    """
+    order_ids = list(order_ids)
+    if not order_ids:
+        return
+
+    reservations = db.execute(
+        select(
+            StockReservation.id,
+            StockReservation.product_id,
+            StockReservation.variant_id,
+            StockReservation.quantity,
+        )
+        .where(
+            StockReservation.order_id.in_(order_ids),
+            StockReservation.released_at.is_(None),
+        )
+        .order_by(StockReservation.id)
+        .with_for_update()
+    ).all()
+    if not reservations:
+        return
+
+    products, variants = _group_lines(
+        (product_id, variant_id, quantity)
+        for _, product_id, variant_id, quantity in reservations
+    )
+
+    # Same lock order as reserve_stock
+    sharded = shard_counts(db, products.keys())
+    for product_id, quantity in sorted(products.items()):
+        if product_id in sharded:
+            db.execute(
+                update(ProductStockShard)
+                .where(
+                    ProductStockShard.product_id == product_id,
+                    ProductStockShard.shard_no == random.randrange(sharded[product_id]),
+                )
+                .values(stock=ProductStockShard.stock + quantity)
+                .execution_options(synchronize_session=False)
+            )
+            continue
+        db.execute(
+            update(Product)
+            .where(Product.id == product_id)
+            .values(stock=func.coalesce(Product.stock, 0) + quantity)
+            .execution_options(synchronize_session=False)
+        )
+    for (variant_id, _), quantity in sorted(variants.items()):
+        db.execute(
+            update(ProductVariant)
+            .where(ProductVariant.id == variant_id)
+            .values(stock=func.coalesce(ProductVariant.stock, 0) + quantity)
+            .execution_options(synchronize_session=False)
+        )
+
+    reservation_ids: List[int] = [reservation.id for reservation in reservations]
+    db.execute(
+        update(StockReservation)
+        .where(StockReservation.id.in_(reservation_ids))
+        .values(released_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+
+    for _, product_id in variants:
+        variant_index.invalidate(product_id)
+
+
+def _lock_stock(db: Session, product_id: int) -> Tuple[List[int], int]:
+    """Lock shards then the product row, in the order reservations use"""
+    shards = (
+        db.execute(
+            select(ProductStockShard.stock)
+            .where(ProductStockShard.product_id == product_id)
+            .order_by(ProductStockShard.shard_no)
+            .with_for_update()
+        )
+        .scalars()
+        .all()
+    )
+    remainder = db.execute(
+        select(Product.stock).where(Product.id == product_id).with_for_update()
+    ).scalar()
+    return list(shards), remainder or 0
+
+
+def _spread_stock(db: Session, product_id: int, shard_count: int, stock: int) -> None:
+    """Replace the shards of a product with stock spread evenly over them"""
+    base, extra = divmod(stock, shard_count)
+    now = datetime.utcnow()
+    db.execute(
+        delete(ProductStockShard).where(ProductStockShard.product_id == product_id)
+    )
+    db.execute(
+        insert(ProductStockShard),
+        [
+            {
+                "product_id": product_id,
+                "shard_no": shard_no,
+                "stock": base + 1 if shard_no < extra else base,
+                "updated_at": now,
+            }
+            for shard_no in range(shard_count)
+        ],
+    )
+    db.execute(
+        update(Product)
+        .where(Product.id == product_id)
+        .values(stock=0)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def rebalance_stock_shards(
+    db: Session, product_id: int, shard_count: Optional[int] = None
+) -> None:
+    """Spread all stock of a product evenly over its shards
+
+    Enables sharding when the product has no shards yet. shard_count
+    changes the number of shards, None keeps the current number. Stock
+    restocked on the product row since the last rebalance is moved into
+    the shards as well.
+    """
+    shards, remainder = _lock_stock(db, product_id)
+    shard_count = shard_count or len(shards)
+    if not shard_count:
+        raise ValueError("Stock sharding is not enabled for this product")
+
+    _spread_stock(db, product_id, shard_count, sum(shards) + remainder)
+
+
+def set_stock(db: Session, product_id: int, stock: int) -> None:
+    """Set the available stock of a product
+
+    A sharded product gets the stock spread over its shards, writing it to
+    Product.stock would add it on top of the shard stock.
+    """
+    shards, _ = _lock_stock(db, product_id)
+    if shards:
+        _spread_stock(db, product_id, len(shards), stock)
+        return
+    db.execute(
+        update(Product)
+        .where(Product.id == product_id)
+        .values(stock=stock)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def pop_sharded_stock(db: Session, updates: Sequence[Dict]) -> Dict[int, int]:
+    """Take the stock of sharded products out of per-SKU product updates
+
+    Clears stock in the updates of sharded products, so update_by_sku leaves
+    their Product.stock alone, and returns the new stock per product ID to
+    apply with set_stock. The last update for a SKU wins, as in
+    update_by_sku.
+    """
+    by_sku = {update_data["sku"]: update_data for update_data in updates}
+    stock_by_sku = {
+        sku: update_data["stock"]
+        for sku, update_data in by_sku.items()
+        if update_data.get("stock") is not None
+    }
+    if not stock_by_sku:
+        return {}
+
+    sharded = db.execute(
+        select(Product.id, Product.sku).where(
+            Product.sku.in_(list(stock_by_sku)),
+            select(ProductStockShard.product_id)
+            .where(ProductStockShard.product_id == Product.id)
+            .exists(),
+        )
+    ).all()
+    sharded_skus = {row.sku for row in sharded}
+    for update_data in updates:
+        if update_data["sku"] in sharded_skus:
+            update_data["stock"] = None
+    return {row.id: stock_by_sku[row.sku] for row in sharded}
+
+
+def disable_stock_shards(db: Session, product_id: int) -> None:
+    """Move all shard stock back to the product row and drop the shards"""
+    shards, remainder = _lock_stock(db, product_id)
+    if not shards:
+        return
+
+    db.execute(
+        delete(ProductStockShard).where(ProductStockShard.product_id == product_id)
+    )
+    db.execute(
+        update(Product)
+        .where(Product.id == product_id)
+        .values(stock=remainder + sum(shards))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def stock_shard_summary(db: Session, product_id: int) -> Dict:
+    """Per-shard and total stock of a product"""
+    remainder = (
+        db.execute(select(Product.stock).where(Product.id == product_id)).scalar() or 0
+    )
+    shards = db.execute(
+        select(ProductStockShard.shard_no, ProductStockShard.stock)
+        .where(ProductStockShard.product_id == product_id)
+        .order_by(ProductStockShard.shard_no)
+    ).all()
+    return {
+        "product_id": product_id,
+        "enabled": bool(shards),
+        "shard_count": len(shards),
+        "product_stock": remainder,
+        "total_stock": remainder + sum(shard.stock for shard in shards),
+        "shards": [{"shard_no": no, "stock": stock} for no, stock in shards],
+    }
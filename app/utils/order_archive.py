@@ -0,0 +1,167 @@
+from datetime import datetime, timedelta
+from typing import Callable, List, Optional, Tuple
+from sqlalchemy import delete, func, insert, or_, select
+from sqlalchemy.orm import Session, selectinload
+from app.core.logger import logger
+from app.core.settings import settings
+from app.db.database import SessionLocal
+from app.models.order import (
+    Order,
+    OrderArchive,
+    OrderItem,
+    OrderItemArchive,
+    OrderStatus,
+    StockReservation,
+)
+from app.utils.pagination import encode_cursor, paginate_by_created
+
+# Seconds between runs of the order archive job
+ORDER_ARCHIVE_INTERVAL = 3600
+# Orders moved per transaction
+ORDER_ARCHIVE_BATCH_SIZE = 500
+
+# Orders in these statuses can no longer change and may be archived
+ARCHIVABLE_ORDER_STATUSES = (OrderStatus.DELIVERED, OrderStatus.CANCELLED)
+
+# (order model, item model) of the live and the archive tables
+ORDER_TABLES = ((Order, OrderItem), (OrderArchive, OrderItemArchive))
+
+# Builds filter conditions for an order model, so one filter applies to
+# both the live and the archive table
+OrderConditions = Callable[[type], list]
+
+
+def archive_orders(
+    db: Session,
+    after_days: int = settings.ORDER_ARCHIVE_AFTER_DAYS,
+    batch_size: int = ORDER_ARCHIVE_BATCH_SIZE,
+) -> int:
+    """Move finished orders older than after_days to the archive tables
+
+    Each batch copies orders and items with INSERT ... SELECT and deletes
+    the originals in the same transaction. Orders are locked with SKIP
+    LOCKED so the job never waits on orders being changed. Stock
+    reservations of archived orders are dropped, their stock is settled.
+    Returns the number of orders archived.
+    """
+    if after_days <= 0:
+        return 0
+
+    cutoff = datetime.utcnow() - timedelta(days=after_days)
+    order_columns = [column.name for column in Order.__table__.columns]
+    item_columns = [column.name for column in OrderItem.__table__.columns]
+    archived = 0
+    while True:
+        order_ids = (
+            db.execute(
+                select(Order.id)
+                .where(
+                    Order.created_at < cutoff,
+                    or_(
+                        Order.status.in_(ARCHIVABLE_ORDER_STATUSES),
+                        Order.is_active == False,
+                    ),
+                )
+                .order_by(Order.id)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            .scalars()
+            .all()
+        )
+        if not order_ids:
+            return archived
+
+        db.execute(
+            insert(OrderArchive).from_select(
+                order_columns,
+                select(*[Order.__table__.c[name] for name in order_columns]).where(
+                    Order.id.in_(order_ids)
+                ),
+            )
+        )
+        db.execute(
+            insert(OrderItemArchive).from_select(
+                item_columns,
+                select(*[OrderItem.__table__.c[name] for name in item_columns]).where(
+                    OrderItem.order_id.in_(order_ids)
+                ),
+            )
+        )
+        db.execute(
+            delete(StockReservation).where(StockReservation.order_id.in_(order_ids))
+        )
+        db.execute(delete(OrderItem).where(OrderItem.order_id.in_(order_ids)))
+        db.execute(delete(Order).where(Order.id.in_(order_ids)))
+        db.commit()
+        archived += len(order_ids)
+
+
+def archive_orders_job() -> None:
+    """Run order archiving in its own session"""
+    with SessionLocal() as db:
+        archived = archive_orders(db)
+    if archived:
+        logger.info(f"Moved {archived} orders to the archive")
+
+
+def archive_horizon(db: Session) -> Optional[datetime]:
+    """Creation time of the newest archived order, None if none are
+
+    Orders created after it are never in the archive. Read from the end of
+    the created_at index.
+    """
+    return db.execute(select(func.max(OrderArchive.created_at))).scalar()
+
+
+def find_order(db: Session, conditions: OrderConditions):
+    """First order matching the conditions, looked up in the archive on a miss"""
+    for model, _ in ORDER_TABLES:
+        order = (
+            db.query(model)
+            .options(selectinload(model.items))
+            .filter(*conditions(model))
+            .first()
+        )
+        if order:
+            return order
+    return None
+
+
+def paginate_orders(
+    db: Session, conditions: OrderConditions, cursor: Optional[str], limit: int
+) -> Tuple[List, Optional[str]]:
+    """One page of orders, newest first, from the live and archive tables
+
+    The live table is read first. The archive is only queried when the
+    page reaches back to the newest archived order, so lists of recent
+    orders never touch it. Raises ValueError for an invalid cursor.
+    """
+    rows, next_cursor = paginate_by_created(
+        db.query(Order).options(selectinload(Order.items)).filter(*conditions(Order)),
+        Order,
+        cursor,
+        limit,
+    )
+    horizon = archive_horizon(db)
+    if horizon is None or (next_cursor and rows[-1].created_at > horizon):
+        return rows, next_cursor
+
+    archived, archive_cursor = paginate_by_created(
+        db.query(OrderArchive)
+        .options(selectinload(OrderArchive.items))
+        .filter(*conditions(OrderArchive)),
+        OrderArchive,
+        cursor,
+        limit,
+    )
+    if not archived:
+        return rows, next_cursor
+
+    merged = sorted(
+        rows + archived, key=lambda order: (order.created_at, order.id), reverse=True
+    )
+    if len(merged) <= limit and not next_cursor and not archive_cursor:
+        return merged, None
+    page = merged[:limit]
+    return page, encode_cursor(page[-1].created_at, page[-1].id)
@@ -0,0 +1,446 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+from sqlalchemy import exists, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.core.events import ORDER_CREATED, ORDER_STATUS_CHANGED
+from app.core.logger import logger
+from app.core.settings import settings
+from app.db.database import SessionLocal
+from app.models.order import (
+    Order,
+    OrderItem,
+    OrderStatus,
+    PaymentMethod,
+    PaymentStatus,
+    StockReservation,
+)
+from app.models.sales import ProductSalesDaily, SalesDaily
+from app.utils.inventory import release_stock
+from app.utils.outbox import enqueue_events
+from app.utils.promotions import release_promotions
+
+# Order statuses that imply the order has been paid
+PAID_ORDER_STATUSES = (OrderStatus.PAID, OrderStatus.SHIPPED, OrderStatus.DELIVERED)
+
+# Statuses an order may move to from each status
+StatusTransitions = Dict[OrderStatus, FrozenSet[OrderStatus]]
+
+# Statuses whose reserved stock is still in the warehouse, cancelling or
+# deleting a shipped or delivered order does not put its stock back
+UNSHIPPED_ORDER_STATUSES = (OrderStatus.PENDING, OrderStatus.PAID)
+
+# Allowed status changes, staying in the same status is always allowed
+ORDER_STATUS_TRANSITIONS: StatusTransitions = {
+    OrderStatus.PENDING: frozenset({OrderStatus.PAID, OrderStatus.CANCELLED}),
+    OrderStatus.PAID: frozenset({OrderStatus.SHIPPED, OrderStatus.CANCELLED}),
+    OrderStatus.SHIPPED: frozenset({OrderStatus.DELIVERED}),
+    OrderStatus.DELIVERED: frozenset(),
+    OrderStatus.CANCELLED: frozenset(),
+}
+
+# Status changes customers may make themselves, cancelling an unpaid order.
+# Everything else is done by staff or payment webhooks
+CUSTOMER_ORDER_STATUS_TRANSITIONS: StatusTransitions = {
+    OrderStatus.PENDING: frozenset({OrderStatus.CANCELLED}),
+    OrderStatus.PAID: frozenset(),
+    OrderStatus.SHIPPED: frozenset(),
+    OrderStatus.DELIVERED: frozenset(),
+    OrderStatus.CANCELLED: frozenset(),
+}
+
+PAYMENT_STATUS_TRANSITIONS: Dict[PaymentStatus, FrozenSet[PaymentStatus]] = {
+    PaymentStatus.PENDING: frozenset({PaymentStatus.PAID, PaymentStatus.FAILED}),
+    PaymentStatus.FAILED: frozenset({PaymentStatus.PENDING, PaymentStatus.PAID}),
+    PaymentStatus.PAID: frozenset(),
+}
+
+# Seconds between runs of the unpaid order expiry job
+ORDER_EXPIRY_INTERVAL = 60
+# Orders expired per transaction
+ORDER_EXPIRY_BATCH_SIZE = 500
+# Payment methods whose unpaid orders expire, bank transfers are paid by hand
+EXPIRING_PAYMENT_METHODS = (PaymentMethod.CREDIT_CARD, PaymentMethod.PAYPAL)
+
+
+class OrderState(NamedTuple):
+    """Fields of an order that drive side effects of order changes"""
+
+    id: int
+    status: OrderStatus
+    payment_status: PaymentStatus
+    payment_method: Optional[PaymentMethod]
+    total_amount: Decimal
+    is_active: bool
+    created_at: datetime
+
+
+# (state before the change or None for new orders, state after the change)
+OrderChange = Tuple[Optional[OrderState], OrderState]
+
+
+def order_state(order: Order) -> OrderState:
+    """Snapshot the fields of an order used by lifecycle side effects"""
+    return OrderState(
+        id=order.id,
+        status=order.status or OrderStatus.PENDING,
+        payment_status=order.payment_status or PaymentStatus.PENDING,
+        payment_method=order.payment_method,
+        total_amount=Decimal(order.total_amount or 0),
+        is_active=order.is_active if order.is_active is not None else True,
+        created_at=order.created_at or datetime.utcnow(),
+    )
+
+
+def transition_error(
+    before: OrderState,
+    after: OrderState,
+    status_transitions: StatusTransitions = ORDER_STATUS_TRANSITIONS,
+) -> Optional[str]:
+    """Why the status change from before to after is not allowed, if it is not"""
+    if (
+        after.status != before.status
+        and after.status not in status_transitions[before.status]
+    ):
+        return (
+            f"Order status cannot change from {before.status.value} "
+            f"to {after.status.value}"
+        )
+    if (
+        after.payment_status != before.payment_status
+        and after.payment_status
+        not in PAYMENT_STATUS_TRANSITIONS[before.payment_status]
+    ):
+        return (
+            f"Payment status cannot change from {before.payment_status.value} "
+            f"to {after.payment_status.value}"
+        )
+    return None
+
+
+def counts_as_sale(state: Optional[OrderState]) -> bool:
+    """Whether an order in this state counts towards product sales"""
+    if state is None or not state.is_active:
+        return False
+    if state.status == OrderStatus.CANCELLED:
+        return False
+    return (
+        state.payment_status == PaymentStatus.PAID
+        or state.status in PAID_ORDER_STATUSES
+    )
+
+
+def holds_stock(state: Optional[OrderState]) -> bool:
+    """Whether an order in this state keeps its reserved stock"""
+    return (
+        state is not None and state.is_active and state.status != OrderStatus.CANCELLED
+    )
+
+
+def sales_key(state: OrderState) -> Tuple[date, str, str]:
+    """Rollup row an order in this state is counted in"""
+    return (
+        state.created_at.date(),
+        state.status.value,
+        state.payment_method.value if state.payment_method else "",
+    )
+
+
+def record_order_sales(db: Session, changes: Iterable[OrderChange]) -> None:
+    """Move orders between rows of the daily order sales rollup
+
+    Every active order is counted once, under its current status and
+    payment method. Deltas of all changes are written with one upsert.
+    """
+    totals: Dict[Tuple[date, str, str], List] = defaultdict(lambda: [0, Decimal(0)])
+    for before, after in changes:
+        for state, sign in ((before, -1), (after, 1)):
+            if state is not None and state.is_active:
+                total = totals[sales_key(state)]
+                total[0] += sign
+                total[1] += sign * state.total_amount
+
+    rows = [(key, count, revenue) for key, (count, revenue) in sorted(totals.items())]
+    rows = [row for row in rows if row[1] or row[2]]
+    if not rows:
+        return
+
+    now = datetime.utcnow()
+    statement = pg_insert(SalesDaily)
+    statement = statement.on_conflict_do_update(
+        index_elements=[SalesDaily.day, SalesDaily.status, SalesDaily.payment_method],
+        set_={
+            "order_count": SalesDaily.order_count + statement.excluded.order_count,
+            "revenue": SalesDaily.revenue + statement.excluded.revenue,
+            "updated_at": now,
+        },
+    )
+    db.execute(
+        statement,
+        [
+            {
+                "day": day,
+                "status": status,
+                "payment_method": payment_method,
+                "order_count": count,
+                "revenue": revenue,
+                "updated_at": now,
+            }
+            for (day, status, payment_method), count, revenue in rows
+        ],
+    )
+
+
+def record_product_sales(db: Session, sales: Dict[int, Tuple[int, date]]) -> None:
+    """Add (sign = 1) or remove (sign = -1) order lines from the sales rollup
+
+    sales maps order id to (sign, order day). Items of all orders are read
+    in one query and written with one batched upsert.
+    """
+    if not sales:
+        return
+
+    items = db.execute(
+        select(
+            OrderItem.order_id,
+            OrderItem.product_id,
+            OrderItem.quantity,
+            OrderItem.total_price,
+        ).where(
+            OrderItem.order_id.in_(sales.keys()),
+            OrderItem.is_active == True,
+            OrderItem.product_id.is_not(None),
+        )
+    ).all()
+
+    totals: Dict[Tuple[int, date], List] = defaultdict(lambda: [0, Decimal(0)])
+    for order_id, product_id, quantity, total_price in items:
+        sign, day = sales[order_id]
+        total = totals[(product_id, day)]
+        total[0] += sign * quantity
+        total[1] += sign * Decimal(total_price)
+
+    if not totals:
+        return
+
+    now = datetime.utcnow()
+    statement = pg_insert(ProductSalesDaily)
+    statement = statement.on_conflict_do_update(
+        index_elements=[ProductSalesDaily.product_id, ProductSalesDaily.day],
+        set_={
+            "units": ProductSalesDaily.units + statement.excluded.units,
+            "revenue": ProductSalesDaily.revenue + statement.excluded.revenue,
+            "updated_at": now,
+        },
+    )
+    db.execute(
+        statement,
+        [
+            {
+                "product_id": product_id,
+                "day": day,
+                "units": units,
+                "revenue": revenue,
+                "updated_at": now,
+            }
+            for (product_id, day), (units, revenue) in sorted(totals.items())
+        ],
+    )
+
+
+def apply_order_changes(db: Session, changes: Iterable[OrderChange]) -> None:
+    """Apply side effects of order changes in the caller's transaction
+
+    Call after the new values are set on the orders and before commit, so
+    the rollups commit or roll back together with the order writes.
+    """
+    # The session does not autoflush, so pending items must be written first
+    db.flush()
+
+    changes = list(changes)
+    sales: Dict[int, Tuple[int, date]] = {}
+    released: List[int] = []
+    for before, after in changes:
+        sign = int(counts_as_sale(after)) - int(counts_as_sale(before))
+        if sign:
+            sales[after.id] = (sign, after.created_at.date())
+        if (
+            holds_stock(before)
+            and not holds_stock(after)
+            and before.status in UNSHIPPED_ORDER_STATUSES
+        ):
+            released.append(after.id)
+
+    record_order_sales(db, changes)
+    record_product_sales(db, sales)
+    release_stock(db, released)
+    release_promotions(db, released)
+    enqueue_order_events(db, changes)
+
+
+def transition_orders(
+    db: Session,
+    order_ids: Iterable[int],
+    status: Optional[OrderStatus] = None,
+    payment_status: Optional[PaymentStatus] = None,
+) -> Tuple[List[Dict], List[OrderChange]]:
+    """Validate and apply one status transition to many orders
+
+    Orders are locked in id order, checked against the transition tables
+    in memory and changed with a single UPDATE ... WHERE id IN (...); side
+    effects of all changes, outbox events included, are applied in
+    batches. Runs in the caller's transaction. Returns a result per
+    requested order id and the applied changes.
+    """
+    order_ids = sorted(set(order_ids))
+    rows = db.execute(
+        select(
+            Order.id,
+            Order.status,
+            Order.payment_status,
+            Order.payment_method,
+            Order.total_amount,
+            Order.is_active,
+            Order.created_at,
+        )
+        .where(Order.id.in_(order_ids))
+        .order_by(Order.id)
+        .with_for_update()
+    ).all()
+    found = {row.id: row for row in rows}
+
+    results: List[Dict] = []
+    changes: List[OrderChange] = []
+    for order_id in order_ids:
+        row = found.get(order_id)
+        if row is None:
+            results.append(
+                {"order_id": order_id, "result": "not_found", "detail": None}
+            )
+            continue
+
+        before = order_state(row)
+        after = before._replace(
+            status=status or before.status,
+            payment_status=payment_status or before.payment_status,
+        )
+        if not before.is_active:
+            result, detail = "invalid", "Order is deleted"
+        elif after == before:
+            result, detail = "unchanged", None
+        else:
+            detail = transition_error(before, after)
+            result = "invalid" if detail else "updated"
+        if result == "updated":
+            changes.append((before, after))
+        results.append({"order_id": order_id, "result": result, "detail": detail})
+
+    if changes:
+        values = {"updated_at": datetime.utcnow()}
+        if status:
+            values["status"] = status
+        if payment_status:
+            values["payment_status"] = payment_status
+        db.execute(
+            update(Order)
+            .where(Order.id.in_([after.id for _, after in changes]))
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        apply_order_changes(db, changes)
+
+    return results, changes
+
+
+def enqueue_order_events(db: Session, changes: Iterable[OrderChange]) -> None:
+    """Write created and status changed events of orders to the outbox"""
+    created: List[Dict] = []
+    status_changed: List[Dict] = []
+    for before, after in changes:
+        if before is None:
+            created.append(
+                {
+                    "order_id": after.id,
+                    "status": after.status.value,
+                    "payment_status": after.payment_status.value,
+                    "total_amount": str(after.total_amount),
+                }
+            )
+        elif (before.status, before.payment_status) != (
+            after.status,
+            after.payment_status,
+        ):
+            status_changed.append(
+                {
+                    "order_id": after.id,
+                    "from_status": before.status.value,
+                    "to_status": after.status.value,
+                    "from_payment_status": before.payment_status.value,
+                    "to_payment_status": after.payment_status.value,
+                }
+            )
+    enqueue_events(db, ORDER_CREATED, created)
+    enqueue_events(db, ORDER_STATUS_CHANGED, status_changed)
+
+
+def expire_pending_orders(
+    db: Session,
+    ttl_minutes: int = settings.ORDER_RESERVATION_TTL_MINUTES,
+    batch_size: int = ORDER_EXPIRY_BATCH_SIZE,
+) -> int:
+    """Cancel unpaid orders older than the TTL and release their stock
+
+    Only orders paid online that still hold reserved stock expire, orders
+    placed before reservations existed and bank transfers waiting for a
+    manual payment are left alone. Orders are locked with SKIP LOCKED, so several workers can run this
+    without blocking each other or orders being paid at the same time.
+    Returns the number of orders cancelled.
+    """
+    if ttl_minutes <= 0:
+        return 0
+
+    cutoff = datetime.utcnow() - timedelta(minutes=ttl_minutes)
+    expired = 0
+    while True:
+        orders = (
+            db.query(Order)
+            .filter(
+                Order.status == OrderStatus.PENDING,
+                Order.payment_status == PaymentStatus.PENDING,
+                Order.is_active == True,
+                Order.created_at < cutoff,
+                Order.payment_method.in_(EXPIRING_PAYMENT_METHODS),
+                exists().where(
+                    StockReservation.order_id == Order.id,
+                    StockReservation.released_at.is_(None),
+                ),
+            )
+            .order_by(Order.id)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True)
+            .all()
+        )
+        if not orders:
+            return expired
+
+        now = datetime.utcnow()
+        changes: List[OrderChange] = []
+        for order in orders:
+            before = order_state(order)
+            order.status = OrderStatus.CANCELLED
+            order.updated_at = now
+            changes.append((before, order_state(order)))
+
+        apply_order_changes(db, changes)
+        db.commit()
+        expired += len(orders)
+
+
+def expire_pending_orders_job() -> None:
+    """Run order expiry in its own session"""
+    with SessionLocal() as db:
+        expired = expire_pending_orders(db)
+    if expired:
+        logger.info(f"Cancelled {expired} unpaid orders past their reservation")
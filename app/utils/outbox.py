@@ -0,0 +1,269 @@
+import asyncio
+import inspect
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import Session
+from app.core.events import handlers
+from app.core.logger import logger
+from app.db.database import SessionLocal
+from app.models.outbox import OutboxEvent
+from app.utils import event_handlers  # noqa: F401, subscribes the handlers
+
+# Seconds between dispatcher runs when the outbox is empty
+OUTBOX_POLL_INTERVAL = 1
+# Events claimed at once
+OUTBOX_BATCH_SIZE = 100
+# Seconds claimed events are hidden from other dispatchers, a dispatcher
+# that dies mid-batch leaves its events to be delivered again after this
+OUTBOX_CLAIM_SECONDS = 300
+# Events failing this many times are given up and kept for inspection
+OUTBOX_MAX_ATTEMPTS = 8
+# Retry delay in seconds doubles from the base after every failure
+OUTBOX_BACKOFF_BASE = 5
+OUTBOX_BACKOFF_MAX = 3600
+
+
+def enqueue_event(db: Session, event: str, payload: Dict) -> None:
+    """Add an event to the outbox in the caller's transaction"""
+    enqueue_events(db, event, [payload])
+
+
+def enqueue_events(db: Session, event: str, payloads: Iterable[Dict]) -> None:
+    """Add events with one multi-row INSERT in the caller's transaction
+
+    The events are only delivered if the transaction commits, and are
+    delivered at least once after it does, so handlers must tolerate
+    duplicates.
+    """
+    now = datetime.utcnow()
+    rows = [
+        {
+            "event": event,
+            "payload": payload,
+            "attempts": 0,
+            "available_at": now,
+            "created_at": now,
+        }
+        for payload in payloads
+    ]
+    if rows:
+        db.execute(insert(OutboxEvent), rows)
+
+
+def retry_delay(attempts: int) -> int:
+    """Seconds to wait before the next delivery after attempts failures"""
+    return min(OUTBOX_BACKOFF_BASE * 2 ** (attempts - 1), OUTBOX_BACKOFF_MAX)
+
+
+class OutboxMetrics:
+    """Delivery counters and lag of the dispatcher in this process
+
+    Lag is the time from writing an event to delivering it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.delivered = 0
+        self.retried = 0
+        self.failed = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+        self.last_batch_at: Optional[datetime] = None
+
+    def record(
+        self, delivered: int, retried: int, failed: int, lags: List[float]
+    ) -> None:
+        with self._lock:
+            self.delivered += delivered
+            self.retried += retried
+            self.failed += failed
+            if lags:
+                self.last_lag = max(lags)
+                self.max_lag = max(self.max_lag, self.last_lag)
+            self.last_batch_at = datetime.utcnow()
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "delivered": self.delivered,
+                "retried": self.retried,
+                "failed": self.failed,
+                "last_lag_seconds": round(self.last_lag, 3),
+                "max_lag_seconds": round(self.max_lag, 3),
+                "last_batch_at": self.last_batch_at,
+            }
+
+
+outbox_metrics = OutboxMetrics()
+
+
+class ClaimedEvent(NamedTuple):
+    """Outbox event claimed by a dispatcher"""
+
+    id: int
+    event: str
+    payload: Dict
+    attempts: int
+    created_at: datetime
+
+
+def claim_events(
+    db: Session, batch_size: int = OUTBOX_BATCH_SIZE
+) -> List[ClaimedEvent]:
+    """Claim due events for OUTBOX_CLAIM_SECONDS and commit right away
+
+    Rows are picked with FOR UPDATE SKIP LOCKED and hidden by moving
+    available_at forward, so no transaction stays open while handlers run.
+    """
+    now = datetime.utcnow()
+    due = (
+        select(OutboxEvent.id)
+        .where(OutboxEvent.failed_at.is_(None), OutboxEvent.available_at <= now)
+        .order_by(OutboxEvent.available_at, OutboxEvent.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    rows = db.execute(
+        update(OutboxEvent)
+        .where(OutboxEvent.id.in_(due.scalar_subquery()))
+        .values(available_at=now + timedelta(seconds=OUTBOX_CLAIM_SECONDS))
+        .returning(
+            OutboxEvent.id,
+            OutboxEvent.event,
+            OutboxEvent.payload,
+            OutboxEvent.attempts,
+            OutboxEvent.created_at,
+        )
+        .execution_options(synchronize_session=False)
+    ).all()
+    db.commit()
+    return sorted((ClaimedEvent(*row) for row in rows), key=lambda event: event.id)
+
+
+def deliver_event(loop: asyncio.AbstractEventLoop, event: ClaimedEvent) -> None:
+    """Call every handler of an event, raises on the first failure"""
+    for handler in handlers(event.event):
+        result = handler(event.event, event.payload)
+        if inspect.isawaitable(result):
+            loop.run_until_complete(result)
+
+
+def dispatch_outbox(db: Session, batch_size: int = OUTBOX_BATCH_SIZE) -> int:
+    """Deliver due outbox events in batches until none are due
+
+    Each batch is claimed with a lease, see claim_events, so several
+    dispatchers share the outbox without delivering an event twice at the
+    same time and without holding row locks while handlers run. Delivered
+    events are deleted with one DELETE, failed ones are pushed back with
+    exponential backoff and given up after OUTBOX_MAX_ATTEMPTS. Returns
+    the number of events delivered.
+    """
+    loop = asyncio.new_event_loop()
+    delivered_total = 0
+    try:
+        while True:
+            events = claim_events(db, batch_size)
+            if not events:
+                return delivered_total
+
+            delivered: List[int] = []
+            lags: List[float] = []
+            errors: List[Tuple[ClaimedEvent, str]] = []
+            for event in events:
+                try:
+                    deliver_event(loop, event)
+                except Exception as e:
+                    logger.warning(f"Outbox event {event.id} {event.event} failed: {e}")
+                    errors.append((event, str(e)))
+                    continue
+                delivered.append(event.id)
+                lags.append((datetime.utcnow() - event.created_at).total_seconds())
+
+            # Results are written after all handlers ran, in one short transaction
+            now = datetime.utcnow()
+            retried = failed = 0
+            for event, error in errors:
+                attempts = event.attempts + 1
+                values = {"attempts": attempts, "last_error": error}
+                if attempts >= OUTBOX_MAX_ATTEMPTS:
+                    values["failed_at"] = now
+                    failed += 1
+                else:
+                    values["available_at"] = now + timedelta(
+                        seconds=retry_delay(attempts)
+                    )
+                    retried += 1
+                db.execute(
+                    update(OutboxEvent)
+                    .where(OutboxEvent.id == event.id)
+                    .values(**values)
+                    .execution_options(synchronize_session=False)
+                )
+            if delivered:
+                db.execute(
+                    delete(OutboxEvent)
+                    .where(OutboxEvent.id.in_(delivered))
+                    .execution_options(synchronize_session=False)
+                )
+            db.commit()
+            outbox_metrics.record(len(delivered), retried, failed, lags)
+            delivered_total += len(delivered)
+    finally:
+        loop.close()
+
+
+def dispatch_outbox_job() -> None:
+    """Run the outbox dispatcher in its own session"""
+    with SessionLocal() as db:
+        delivered = dispatch_outbox(db)
+    if delivered:
+        logger.debug(f"Delivered {delivered} outbox events")
+
+
+def outbox_stats(db: Session) -> Dict:
+    """Backlog of the outbox and the age of its oldest due event"""
+    now = datetime.utcnow()
+    pending, oldest = db.execute(
+        select(func.count(), func.min(OutboxEvent.created_at)).where(
+            OutboxEvent.failed_at.is_(None)
+        )
+    ).one()
+    failed = db.execute(
+        select(func.count()).where(OutboxEvent.failed_at.is_not(None))
+    ).scalar()
+    return {
+        "pending": pending,
+        "failed": failed,
+        "oldest_pending_age_seconds": (
+            round((now - oldest).total_seconds(), 3) if oldest else 0
+        ),
+        "dispatcher": outbox_metrics.snapshot(),
+    }
+
+
+def retry_failed_events(db: Session) -> int:
+    """Make given up events due again, returns the number of events"""
+    result = db.execute(
+        update(OutboxEvent)
+        .where(OutboxEvent.failed_at.is_not(None))
+        .values(failed_at=None, attempts=0, available_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def main():
+    logger.info("Outbox dispatcher started")
+    while True:
+        try:
+            dispatch_outbox_job()
+        except Exception:
+            logger.exception("Outbox dispatch failed")
+        time.sleep(OUTBOX_POLL_INTERVAL)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+import base64
+from datetime import datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query
+
+
+def encode_cursor(created_at: datetime, id: int) -> str:
+    """Opaque cursor pointing at a (created_at, id) position"""
+    raw = f"{created_at.isoformat()},{id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Parse a cursor made by encode_cursor, raises ValueError if invalid"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, id = raw.rsplit(",", 1)
+        return datetime.fromisoformat(created_at), int(id)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+
+def paginate_by_created(
+    query: Query, model, cursor: Optional[str], limit: int
+) -> Tuple[List, Optional[str]]:
+    """Fetch one page of a query, newest first, by (created_at, id) keyset
+
+    Unlike offset pagination the database seeks straight to the cursor
+    through a (..., created_at, id) index, so deep pages cost the same as
+    the first one and rows inserted meanwhile do not shift pages. Returns
+    the rows and the cursor of the next page, None on the last page.
+    """
+    if cursor:
+        created_at, id = decode_cursor(cursor)
+        query = query.filter(tuple_(model.created_at, model.id) < (created_at, id))
+
+    rows = query.order_by(model.created_at.desc(), model.id.desc()).limit(limit + 1)
+    rows = rows.all()
+    if len(rows) <= limit:
+        return rows, None
+
+    last = rows[limit - 1]
+    return rows[:limit], encode_cursor(last.created_at, last.id)
@@ -0,0 +1,400 @@
+import json
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Dict, List, Mapping, NamedTuple, Optional, Tuple
+from urllib.parse import urlparse
+import paypalrestsdk
+import stripe
+from sqlalchemy import select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.core.logger import logger
+from app.core.settings import settings
+from app.db.database import SessionLocal
+from app.models.order import Order, OrderStatus, PaymentStatus
+from app.models.payment import PaymentEvent, PaymentEventStatus, PaymentProvider
+from app.utils.order_lifecycle import transition_orders
+
+# Seconds a Stripe signature timestamp may be old, guards against replays
+STRIPE_SIGNATURE_TOLERANCE = 300
+# Seconds between runs of the payment event worker
+PAYMENT_EVENT_INTERVAL = 2
+# Events applied per transaction
+PAYMENT_EVENT_BATCH_SIZE = 200
+# Events failing this many times are marked failed instead of retried
+PAYMENT_EVENT_MAX_ATTEMPTS = 5
+
+# Provider event types that set the payment status of an order, other
+# events are stored and ignored
+PAYMENT_EVENT_STATUSES: Dict[PaymentProvider, Dict[str, PaymentStatus]] = {
+    PaymentProvider.STRIPE: {
+        "payment_intent.succeeded": PaymentStatus.PAID,
+        "payment_intent.payment_failed": PaymentStatus.FAILED,
+    },
+    PaymentProvider.PAYPAL: {
+        "PAYMENT.CAPTURE.COMPLETED": PaymentStatus.PAID,
+        "PAYMENT.CAPTURE.DENIED": PaymentStatus.FAILED,
+        "PAYMENT.CAPTURE.DECLINED": PaymentStatus.FAILED,
+    },
+}
+
+# Stripe amounts are in the smallest currency unit, cents for most
+# currencies and whole units for these
+STRIPE_ZERO_DECIMAL_CURRENCIES = frozenset(
+    "BIF CLP DJF GNF JPY KMF KRW MGA PYG RWF UGX VND VUV XAF XOF XPF".split()
+)
+
+PAYPAL_HEADERS = (
+    "paypal-transmission-id",
+    "paypal-transmission-time",
+    "paypal-transmission-sig",
+    "paypal-cert-url",
+    "paypal-auth-algo",
+)
+
+
+class WebhookVerificationError(ValueError):
+    """Raised when a webhook is not signed by its provider"""
+
+
+class WebhookEvent(NamedTuple):
+    """Verified webhook with the fields the worker needs"""
+
+    provider: PaymentProvider
+    event_id: str
+    event_type: str
+    order_id: Optional[int]
+    payload: Dict
+
+
+def _order_id(value) -> Optional[int]:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _parse_body(body: bytes, type_field: str) -> Dict:
+    try:
+        event = json.loads(body)
+    except ValueError:
+        raise WebhookVerificationError("Webhook body is not valid JSON")
+    if not isinstance(event, dict) or not event.get("id") or not event.get(type_field):
+        raise WebhookVerificationError("Webhook body is not an event")
+    return event
+
+
+def verify_stripe_webhook(body: bytes, signature: Optional[str]) -> WebhookEvent:
+    """Check the Stripe-Signature header and parse the event
+
+    Payments carry the order ID in the metadata of the payment intent.
+    """
+    if not signature:
+        raise WebhookVerificationError("Missing Stripe signature")
+    try:
+        stripe.WebhookSignature.verify_header(
+            body.decode("utf-8"),
+            signature,
+            settings.STRIPE_WEBHOOK_SECRET,
+            STRIPE_SIGNATURE_TOLERANCE,
+        )
+    except (stripe.SignatureVerificationError, UnicodeDecodeError) as e:
+        raise WebhookVerificationError(str(e))
+
+    event = _parse_body(body, "type")
+    payment = (event.get("data") or {}).get("object") or {}
+    metadata = payment.get("metadata") or {}
+    return WebhookEvent(
+        PaymentProvider.STRIPE,
+        str(event["id"]),
+        str(event["type"]),
+        _order_id(metadata.get("order_id")),
+        event,
+    )
+
+
+def verify_paypal_webhook(body: bytes, headers: Mapping[str, str]) -> WebhookEvent:
+    """Check the PayPal transmission signature and parse the event
+
+    The signing certificate is only fetched from paypal.com. Captures carry
+    the order ID in custom_id.
+    """
+    if not settings.PAYPAL_WEBHOOK_ID:
+        raise WebhookVerificationError("PayPal webhook is not configured")
+    values = [headers.get(name) for name in PAYPAL_HEADERS]
+    if not all(values):
+        raise WebhookVerificationError("Missing PayPal transmission headers")
+    transmission_id, timestamp, signature, cert_url, auth_algo = values
+    cert_host = urlparse(cert_url).hostname or ""
+    if urlparse(cert_url).scheme != "https" or not (
+        cert_host == "paypal.com" or cert_host.endswith(".paypal.com")
+    ):
+        raise WebhookVerificationError("PayPal certificate URL is not trusted")
+    try:
+        verified = paypalrestsdk.WebhookEvent.verify(
+            transmission_id,
+            timestamp,
+            settings.PAYPAL_WEBHOOK_ID,
+            body.decode("utf-8"),
+            cert_url,
+            signature,
+            auth_algo,
+        )
+    except Exception as e:
+        raise WebhookVerificationError(str(e))
+    if not verified:
+        raise WebhookVerificationError("Invalid PayPal signature")
+
+    event = _parse_body(body, "event_type")
+    resource = event.get("resource") or {}
+    return WebhookEvent(
+        PaymentProvider.PAYPAL,
+        str(event["id"]),
+        str(event["event_type"]),
+        _order_id(resource.get("custom_id")),
+        event,
+    )
+
+
+def store_payment_event(db: Session, event: WebhookEvent) -> bool:
+    """Add an event to the inbox, returns False for a redelivered event
+
+    Duplicates are dropped by the unique (provider, event_id) index with
+    ON CONFLICT DO NOTHING, without reading the inbox first.
+    """
+    statement = (
+        pg_insert(PaymentEvent)
+        .values(
+            provider=event.provider,
+            event_id=event.event_id,
+            event_type=event.event_type,
+            order_id=event.order_id,
+            payload=event.payload,
+            status=PaymentEventStatus.PENDING,
+            attempts=0,
+            received_at=datetime.utcnow(),
+        )
+        .on_conflict_do_nothing(index_elements=["provider", "event_id"])
+        .returning(PaymentEvent.id)
+    )
+    stored = db.execute(statement).scalar() is not None
+    db.commit()
+    return stored
+
+
+def _finish_events(
+    db: Session, event_ids: List[int], status: PaymentEventStatus, error=None
+) -> None:
+    if event_ids:
+        db.execute(
+            update(PaymentEvent)
+            .where(PaymentEvent.id.in_(event_ids))
+            .values(status=status, error=error, processed_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+
+
+def payment_amount(event: PaymentEvent) -> Optional[Tuple[Decimal, str]]:
+    """Amount and currency paid according to an event, None if it has none"""
+    payload = event.payload or {}
+    try:
+        if event.provider == PaymentProvider.STRIPE:
+            payment = payload["data"]["object"]
+            currency = str(payment["currency"]).upper()
+            amount = Decimal(payment.get("amount_received") or payment["amount"])
+            if currency not in STRIPE_ZERO_DECIMAL_CURRENCIES:
+                amount = amount.scaleb(-2)
+            return amount, currency
+        amount = payload["resource"]["amount"]
+        return Decimal(str(amount["value"])), str(amount["currency_code"]).upper()
+    except (KeyError, TypeError, InvalidOperation):
+        return None
+
+
+def amount_error(event: PaymentEvent, total_amount: Decimal) -> Optional[str]:
+    """Why a payment does not pay for its order, if it does not"""
+    paid = payment_amount(event)
+    if paid is None:
+        return "Payment amount is missing"
+    amount, currency = paid
+    if amount != total_amount or currency != settings.ORDER_CURRENCY.upper():
+        return (
+            f"Payment of {amount} {currency} does not match order total "
+            f"{total_amount} {settings.ORDER_CURRENCY.upper()}"
+        )
+    return None
+
+
+def payment_error(event: PaymentEvent, order) -> Optional[str]:
+    """Why a payment cannot mark its order paid, if it cannot"""
+    if not order.is_active or order.status == OrderStatus.CANCELLED:
+        # The stock is gone, the customer has to be refunded by staff
+        return f"Payment received for cancelled order {order.id}, refund it"
+    return amount_error(event, order.total_amount)
+
+
+def apply_payment_events(db: Session, events: List[PaymentEvent]) -> None:
+    """Apply a batch of events to orders in the caller's transaction
+
+    Events are grouped by the payment status they set, and each group goes
+    through one transition_orders call. Payments must match the order
+    total and currency and be for an order that is not cancelled, other
+    payments are marked failed for staff to review or refund. When an
+    order has several events in the batch, a payment wins over a failure,
+    since paid is final.
+    """
+    paid_order_ids = {
+        event.order_id
+        for event in events
+        if event.order_id is not None
+        and PAYMENT_EVENT_STATUSES[event.provider].get(event.event_type)
+        == PaymentStatus.PAID
+    }
+    orders = {}
+    if paid_order_ids:
+        orders = {
+            row.id: row
+            for row in db.execute(
+                select(Order.id, Order.total_amount, Order.status, Order.is_active)
+                .where(Order.id.in_(paid_order_ids))
+                # Locked so a cancel cannot commit before the transition
+                .order_by(Order.id)
+                .with_for_update()
+            )
+        }
+
+    targets: Dict[int, PaymentStatus] = {}
+    order_events: Dict[int, List[int]] = defaultdict(list)
+    ignored: List[int] = []
+    failed: Dict[str, List[int]] = defaultdict(list)
+    for event in events:
+        payment_status = PAYMENT_EVENT_STATUSES[event.provider].get(event.event_type)
+        if payment_status is None or event.order_id is None:
+            ignored.append(event.id)
+            continue
+        if payment_status == PaymentStatus.PAID and event.order_id in orders:
+            error = payment_error(event, orders[event.order_id])
+            if error:
+                logger.warning(f"Payment event {event.id} not applied: {error}")
+                failed[error].append(event.id)
+                continue
+        order_events[event.order_id].append(event.id)
+        if targets.get(event.order_id) != PaymentStatus.PAID:
+            targets[event.order_id] = payment_status
+
+    by_status: Dict[PaymentStatus, List[int]] = defaultdict(list)
+    for order_id, payment_status in targets.items():
+        by_status[payment_status].append(order_id)
+
+    processed: List[int] = []
+    for payment_status, order_ids in by_status.items():
+        results, _ = transition_orders(db, order_ids, payment_status=payment_status)
+        for result in results:
+            event_ids = order_events[result["order_id"]]
+            if result["result"] in ("updated", "unchanged"):
+                processed.extend(event_ids)
+            else:
+                detail = result["detail"] or f"Order {result['order_id']} not found"
+                failed[detail].extend(event_ids)
+
+    _finish_events(db, processed, PaymentEventStatus.PROCESSED)
+    _finish_events(db, ignored, PaymentEventStatus.IGNORED)
+    for detail, event_ids in failed.items():
+        _finish_events(db, event_ids, PaymentEventStatus.FAILED, detail)
+
+
+def _pending_events(
+    db: Session, limit: int, event_ids: Optional[List[int]] = None
+) -> List[PaymentEvent]:
+    query = db.query(PaymentEvent).filter(
+        PaymentEvent.status == PaymentEventStatus.PENDING
+    )
+    if event_ids is not None:
+        query = query.filter(PaymentEvent.id.in_(event_ids))
+    return (
+        query.order_by(PaymentEvent.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+        .all()
+    )
+
+
+def _record_failure(db: Session, event_id: int, error: Exception) -> None:
+    """Count a failed attempt, giving up after PAYMENT_EVENT_MAX_ATTEMPTS"""
+    db.execute(
+        update(PaymentEvent)
+        .where(PaymentEvent.id == event_id)
+        .values(attempts=PaymentEvent.attempts + 1, error=str(error))
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(
+        update(PaymentEvent)
+        .where(
+            PaymentEvent.id == event_id,
+            PaymentEvent.attempts >= PAYMENT_EVENT_MAX_ATTEMPTS,
+        )
+        .values(status=PaymentEventStatus.FAILED)
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+
+
+def apply_events_one_by_one(db: Session, event_ids: List[int]) -> int:
+    """Apply events in a transaction each, after their batch failed
+
+    Only the events that fail on their own are charged an attempt, the
+    others of the batch go through. Returns the number of events applied.
+    """
+    applied = 0
+    for event_id in event_ids:
+        events = _pending_events(db, 1, [event_id])
+        if not events:
+            continue
+        try:
+            apply_payment_events(db, events)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Applying payment event {event_id} failed: {e}")
+            _record_failure(db, event_id, e)
+            continue
+        applied += 1
+    return applied
+
+
+def process_payment_events(
+    db: Session, batch_size: int = PAYMENT_EVENT_BATCH_SIZE
+) -> int:
+    """Apply pending inbox events in batches until none are left
+
+    Events are locked with SKIP LOCKED, so several workers can drain the
+    inbox together. When a batch raises, it is rolled back and its events
+    are applied one at a time. An event that fails on its own is retried
+    on the next run, up to PAYMENT_EVENT_MAX_ATTEMPTS times. Returns the
+    number of events handled.
+    """
+    handled = 0
+    while True:
+        events = _pending_events(db, batch_size)
+        if not events:
+            return handled
+
+        event_ids = [event.id for event in events]
+        try:
+            apply_payment_events(db, events)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            logger.warning(f"Applying payment event batch failed: {e}")
+            return handled + apply_events_one_by_one(db, event_ids)
+
+        handled += len(events)
+
+
+def process_payment_events_job() -> None:
+    """Run the payment event worker in its own session"""
+    with SessionLocal() as db:
+        handled = process_payment_events(db)
+    if handled:
+        logger.info(f"Applied {handled} payment events")
@@ -0,0 +1,18 @@
+import asyncio
+from typing import Callable
+from starlette.concurrency import run_in_threadpool
+from app.core.logger import logger
+
+
+async def run_periodically(func: Callable[[], object], interval: float) -> None:
+    """Run a blocking function every interval seconds until cancelled
+
+    The function runs in the threadpool so database work does not block the
+    event loop. Errors are logged and the loop keeps going.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await run_in_threadpool(func)
+        except Exception:
+            logger.exception(f"Periodic task {func.__name__} failed")
@@ -0,0 +1,246 @@
+from decimal import Decimal
+from typing import Dict, Iterable, List, NamedTuple, Optional
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from app.models.product import Product, ProductVariant
+from app.schemas.order import OrderItemCreate
+
+
+class ProductSnapshot(NamedTuple):
+    """Immutable copy of the product fields that determine a line price
+
+    Category and brand are kept for matching promotions, weight and
+    dimensions for shipping quotes.
+    """
+
+    id: int
+    name: str
+    sku: str
+    price: Decimal
+    discount_price: Optional[Decimal]
+    is_available: bool
+    category_id: Optional[int] = None
+    brand_id: Optional[int] = None
+    weight: Optional[Decimal] = None
+    width: Optional[Decimal] = None
+    height: Optional[Decimal] = None
+    depth: Optional[Decimal] = None
+
+    @property
+    def effective_price(self) -> Decimal:
+        if self.discount_price is not None and self.discount_price < self.price:
+            return self.discount_price
+        return self.price
+
+
+class VariantSnapshot(NamedTuple):
+    """Immutable copy of the variant fields that determine a line price"""
+
+    id: int
+    product_id: int
+    name: str
+    sku: str
+    price: Decimal
+    is_available: bool
+
+
+class PricedLine(NamedTuple):
+    """Order line with server side name, SKU and prices"""
+
+    product_id: int
+    variant_id: Optional[int]
+    product_name: str
+    product_sku: Optional[str]
+    quantity: int
+    price: Decimal
+    total_price: Decimal
+
+
+class PriceMismatchError(ValueError):
+    """Raised when order lines do not match current products and prices"""
+
+    def __init__(self, errors: List[Dict]):
+        super().__init__("Order lines do not match current products and prices")
+        self.errors = errors
+
+
+class PriceResolver:
+    """Price order lines against snapshots of the referenced products
+
+    Snapshots are loaded with one IN query for products and one for
+    variants, and kept for the lifetime of the resolver, which is one
+    request when it comes from deps.get_price_resolver.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+        self._products: Dict[int, Optional[ProductSnapshot]] = {}
+        self._variants: Dict[int, Optional[VariantSnapshot]] = {}
+
+    def load(self, product_ids: Iterable[int], variant_ids: Iterable[int]) -> None:
+        """Load snapshots of products and variants not loaded yet"""
+        missing_products = set(product_ids) - self._products.keys()
+        if missing_products:
+            rows = self.db.execute(
+                select(
+                    Product.id,
+                    Product.name,
+                    Product.sku,
+                    Product.price,
+                    Product.discount_price,
+                    Product.is_active,
+                    Product.deleted_at,
+                    Product.category_id,
+                    Product.brand_id,
+                    Product.weight,
+                    Product.width,
+                    Product.height,
+                    Product.depth,
+                ).where(Product.id.in_(missing_products))
+            )
+            for row in rows:
+                self._products[row.id] = ProductSnapshot(
+                    row.id,
+                    row.name,
+                    row.sku,
+                    row.price,
+                    row.discount_price,
+                    bool(row.is_active) and row.deleted_at is None,
+                    row.category_id,
+                    row.brand_id,
+                    row.weight,
+                    row.width,
+                    row.height,
+                    row.depth,
+                )
+            # Remember unknown ids so they are not looked up again
+            for product_id in missing_products - self._products.keys():
+                self._products[product_id] = None
+
+        missing_variants = set(variant_ids) - self._variants.keys()
+        if missing_variants:
+            rows = self.db.execute(
+                select(
+                    ProductVariant.id,
+                    ProductVariant.product_id,
+                    ProductVariant.name,
+                    ProductVariant.sku,
+                    ProductVariant.price,
+                    ProductVariant.is_active,
+                    ProductVariant.deleted_at,
+                ).where(ProductVariant.id.in_(missing_variants))
+            )
+            for id, product_id, name, sku, price, is_active, deleted_at in rows:
+                self._variants[id] = VariantSnapshot(
+                    id,
+                    product_id,
+                    name,
+                    sku,
+                    price,
+                    bool(is_active) and deleted_at is None,
+                )
+            for variant_id in missing_variants - self._variants.keys():
+                self._variants[variant_id] = None
+
+    def product(self, product_id: int) -> Optional[ProductSnapshot]:
+        self.load([product_id], [])
+        return self._products[product_id]
+
+    def variant(self, variant_id: int) -> Optional[VariantSnapshot]:
+        self.load([], [variant_id])
+        return self._variants[variant_id]
+
+    def resolve(
+        self, product_id: int, variant_id: Optional[int], quantity: int
+    ) -> Optional[PricedLine]:
+        """Price a line at the current price, None if it is not available"""
+        product = self.product(product_id)
+        if product is None or not product.is_available:
+            return None
+        if variant_id is None:
+            name, sku, price = product.name, product.sku, product.effective_price
+        else:
+            variant = self.variant(variant_id)
+            if (
+                variant is None
+                or variant.product_id != product_id
+                or not variant.is_available
+            ):
+                return None
+            name = f"{product.name} - {variant.name}"
+            sku, price = variant.sku, variant.price
+        return PricedLine(
+            product_id=product_id,
+            variant_id=variant_id,
+            product_name=name[:100],
+            product_sku=sku,
+            quantity=quantity,
+            price=price,
+            total_price=price * quantity,
+        )
+
+    def price_lines(self, items: List[OrderItemCreate]) -> List[PricedLine]:
+        """Check order items against current prices and compute line totals
+
+        All lines are checked in one pass and every problem is reported in
+        a single PriceMismatchError. The price sent by the client must equal
+        the current effective price, so orders placed from a stale page are
+        rejected instead of charged a different amount.
+        """
+        self.load(
+            (item.product_id for item in items),
+            (item.variant_id for item in items if item.variant_id is not None),
+        )
+
+        lines: List[PricedLine] = []
+        errors: List[Dict] = []
+        for index, item in enumerate(items):
+            product = self._products[item.product_id]
+            variant = (
+                self._variants[item.variant_id] if item.variant_id is not None else None
+            )
+
+            error = None
+            if product is None or not product.is_available:
+                error = f"Product with ID {item.product_id} is not available"
+            elif item.variant_id is not None and (
+                variant is None
+                or variant.product_id != product.id
+                or not variant.is_available
+            ):
+                error = f"Variant with ID {item.variant_id} is not available"
+            else:
+                sku = variant.sku if variant else product.sku
+                price = variant.price if variant else product.effective_price
+                if item.product_sku is not None and item.product_sku != sku:
+                    error = f"SKU {item.product_sku} does not match {sku}"
+                elif item.price != price:
+                    error = f"Price changed from {item.price} to {price}"
+
+            if error:
+                errors.append(
+                    {
+                        "line": index,
+                        "product_id": item.product_id,
+                        "variant_id": item.variant_id,
+                        "error": error,
+                    }
+                )
+                continue
+
+            name = f"{product.name} - {variant.name}" if variant else product.name
+            lines.append(
+                PricedLine(
+                    product_id=product.id,
+                    variant_id=item.variant_id,
+                    product_name=name[:100],
+                    product_sku=sku,
+                    quantity=item.quantity,
+                    price=price,
+                    total_price=price * item.quantity,
+                )
+            )
+
+        if errors:
+            raise PriceMismatchError(errors)
+        return lines
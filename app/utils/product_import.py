@@ -0,0 +1,245 @@
+import argparse
+import csv
+import io
+import json
+import re
+from typing import BinaryIO, Dict, Iterator, List, Optional, Tuple
+from pydantic import ValidationError
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.models.brand import Brand
+from app.models.category import Category
+from app.models.product import Product
+from app.schemas.product import ProductCreate
+
+# Rows validated and inserted per transaction
+DEFAULT_BATCH_SIZE = 500
+# Cap on reported row errors so the report stays small for huge files
+MAX_REPORTED_ERRORS = 1000
+
+SUPPORTED_FORMATS = ("csv", "jsonl")
+
+# Bytes that are not valid UTF-8 are decoded to these lone surrogates
+UNDECODABLE_BYTES = re.compile("[\udc80-\udcff]")
+INVALID_UTF8 = "Row is not valid UTF-8"
+
+
+def detect_format(filename: str) -> str:
+    """Guess import format from file extension"""
+    ext = filename.rsplit(".", 1)[-1].lower() if filename else ""
+    if ext in ("jsonl", "ndjson"):
+        return "jsonl"
+    return "csv"
+
+
+def _undecodable(value: str) -> bool:
+    """Whether text decoded with surrogateescape held bytes invalid in UTF-8"""
+    return UNDECODABLE_BYTES.search(value) is not None
+
+
+def iter_records(stream: BinaryIO, fmt: str) -> Iterator[Tuple[int, object]]:
+    """Yield (row number, record) pairs without loading the whole file
+
+    Records that cannot be parsed are yielded as the exception instance so
+    the caller can report them alongside validation errors. Bytes that are
+    not valid UTF-8 only fail the row they are in. A CSV file that cannot
+    be parsed any further yields the error for the row parsing stopped at
+    and ends, so the rows before it are still imported.
+    """
+    text = io.TextIOWrapper(
+        stream, encoding="utf-8-sig", errors="surrogateescape", newline=""
+    )
+
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        row_number = 1
+        try:
+            for row_number, row in enumerate(reader, start=2):
+                if any(isinstance(v, str) and _undecodable(v) for v in row.values()):
+                    yield row_number, ValueError(INVALID_UTF8)
+                    continue
+                # Empty cells mean "not provided" so optional fields get defaults
+                yield row_number, {k: v for k, v in row.items() if k and v != ""}
+        except csv.Error as e:
+            yield row_number + 1, ValueError(
+                f"File cannot be read from this row on: {e}"
+            )
+    elif fmt == "jsonl":
+        for row_number, line in enumerate(text, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            if _undecodable(line):
+                yield row_number, ValueError(INVALID_UTF8)
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield row_number, e
+                continue
+            if not isinstance(record, dict):
+                yield row_number, ValueError("Row must be a JSON object")
+                continue
+            yield row_number, record
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+class ImportReport:
+    """Accumulated result of a product import"""
+
+    def __init__(self):
+        self.total = 0
+        self.created = 0
+        self.failed = 0
+        self.errors: List[Dict] = []
+
+    def add_error(self, row: int, sku, errors: List[str]) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row, "sku": sku, "errors": errors})
+
+    def to_dict(self) -> Dict:
+        return {
+            "total": self.total,
+            "created": self.created,
+            "failed": self.failed,
+            "errors": self.errors,
+            "errors_truncated": self.failed > len(self.errors),
+        }
+
+
+def _row_sku(record) -> Optional[str]:
+    """SKU of an invalid row for the report, rows are untrusted JSON"""
+    sku = record.get("sku") if isinstance(record, dict) else None
+    if isinstance(sku, (int, float)) and not isinstance(sku, bool):
+        return str(sku)
+    return sku if isinstance(sku, str) else None
+
+
+def _import_batch(
+    db: Session, batch: List[Tuple[int, object]], report: ImportReport
+) -> None:
+    """Validate one batch, resolve conflicts set-based and insert it"""
+    valid: List[Tuple[int, ProductCreate]] = []
+    for row_number, record in batch:
+        if isinstance(record, Exception):
+            report.add_error(row_number, None, [f"Invalid row: {record}"])
+            continue
+        try:
+            valid.append((row_number, ProductCreate.model_validate(record)))
+        except ValidationError as e:
+            report.add_error(
+                row_number,
+                _row_sku(record),
+                [
+                    f"{'.'.join(str(loc) for loc in err['loc'])}: {err['msg']}"
+                    for err in e.errors()
+                ],
+            )
+
+    if not valid:
+        return
+
+    category_ids = {product.category_id for _, product in valid}
+    brand_ids = {product.brand_id for _, product in valid}
+    skus = {product.sku for _, product in valid}
+    slugs = {product.slug for _, product in valid}
+
+    # One query per lookup for the whole batch
+    existing_categories = {
+        category_id
+        for (category_id,) in db.query(Category.id).filter(
+            Category.id.in_(category_ids)
+        )
+    }
+    existing_brands = {
+        brand_id for (brand_id,) in db.query(Brand.id).filter(Brand.id.in_(brand_ids))
+    }
+    taken_skus = {sku for (sku,) in db.query(Product.sku).filter(Product.sku.in_(skus))}
+    taken_slugs = {
+        slug for (slug,) in db.query(Product.slug).filter(Product.slug.in_(slugs))
+    }
+
+    rows = []
+    row_numbers = []
+    for row_number, product in valid:
+        errors = []
+        if product.category_id not in existing_categories:
+            errors.append(f"Category with ID {product.category_id} not found")
+        if product.brand_id not in existing_brands:
+            errors.append(f"Brand with ID {product.brand_id} not found")
+        if product.sku in taken_skus:
+            errors.append("Product with this SKU already exists")
+        if product.slug in taken_slugs:
+            errors.append("Product with this slug already exists")
+        if errors:
+            report.add_error(row_number, product.sku, errors)
+            continue
+
+        # Later rows in the same file must not reuse a SKU or slug either
+        taken_skus.add(product.sku)
+        taken_slugs.add(product.slug)
+        rows.append(product.model_dump())
+        row_numbers.append((row_number, product.sku))
+
+    if not rows:
+        return
+
+    try:
+        db.execute(insert(Product), rows)
+        db.commit()
+        report.created += len(rows)
+    except Exception as e:
+        db.rollback()
+        for row_number, sku in row_numbers:
+            report.add_error(row_number, sku, [str(e.__cause__ or e)])
+
+
+def import_products(
+    db: Session,
+    stream: BinaryIO,
+    fmt: str = "csv",
+    batch_size: int = DEFAULT_BATCH_SIZE,
+) -> ImportReport:
+    """Import products from a CSV or JSONL stream in batches
+
+    Each batch is committed on its own, so rows from earlier batches stay
+    imported even if a later batch fails.
+    """
+    report = ImportReport()
+    batch: List[Tuple[int, object]] = []
+
+    for row_number, record in iter_records(stream, fmt):
+        report.total += 1
+        batch.append((row_number, record))
+        if len(batch) >= batch_size:
+            _import_batch(db, batch, report)
+            batch = []
+            # Imported rows are not needed anymore
+            db.expunge_all()
+
+    if batch:
+        _import_batch(db, batch, report)
+
+    return report
+
+
+def main():
+    from app.db.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Import products from CSV or JSONL")
+    parser.add_argument("path", help="Path to the import file")
+    parser.add_argument("--format", choices=SUPPORTED_FORMATS, default=None)
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or detect_format(args.path)
+    with open(args.path, "rb") as stream, SessionLocal() as db:
+        report = import_products(db, stream, fmt, args.batch_size)
+
+    print(json.dumps(report.to_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
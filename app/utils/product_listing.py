@@ -0,0 +1,70 @@
+from datetime import date, timedelta
+from sqlalchemy import func, select
+from sqlalchemy.orm import Query
+from app.models.product import Product, ProductRatingStats
+from app.models.sales import ProductSalesDaily
+
+# Bestseller time windows in days, None means all time
+BESTSELLING_WINDOWS = {"7d": 7, "30d": 30, "all": None}
+
+BESTSELLING_WINDOW_REGEX = "^(7d|30d|all)$"
+
+PRODUCT_SORT_REGEX = "^((price|name|created_at)_(asc|desc)|bestselling|rating)$"
+
+
+def order_by_bestselling(query: Query, window: str = "30d") -> Query:
+    """Order a product query by units sold within the window
+
+    Reads the daily sales rollup instead of aggregating order items.
+    """
+    days = BESTSELLING_WINDOWS[window]
+    sales = select(
+        ProductSalesDaily.product_id,
+        func.sum(ProductSalesDaily.units).label("units"),
+    ).group_by(ProductSalesDaily.product_id)
+    if days is not None:
+        sales = sales.where(ProductSalesDaily.day > date.today() - timedelta(days=days))
+    sales = sales.subquery()
+
+    return query.outerjoin(sales, sales.c.product_id == Product.id).order_by(
+        func.coalesce(sales.c.units, 0).desc(), Product.id
+    )
+
+
+def order_by_rating(query: Query) -> Query:
+    """Order a product query by average rating, then by number of reviews"""
+    average = (
+        ProductRatingStats.rating_sum
+        * 1.0
+        / func.nullif(ProductRatingStats.rating_count, 0)
+    )
+    return query.outerjoin(
+        ProductRatingStats, ProductRatingStats.product_id == Product.id
+    ).order_by(
+        func.coalesce(average, 0).desc(),
+        func.coalesce(ProductRatingStats.rating_count, 0).desc(),
+        Product.id,
+    )
+
+
+def filter_min_rating(query: Query, min_rating: float) -> Query:
+    """Keep products whose average rating is at least min_rating"""
+    rated = select(ProductRatingStats.product_id).where(
+        ProductRatingStats.rating_count > 0,
+        ProductRatingStats.rating_sum >= min_rating * ProductRatingStats.rating_count,
+    )
+    return query.filter(Product.id.in_(rated))
+
+
+def apply_product_sort(query: Query, sort: str, window: str = "30d") -> Query:
+    """Apply a listing sort such as price_asc, bestselling or rating"""
+    if sort == "bestselling":
+        return order_by_bestselling(query, window)
+    if sort == "rating":
+        return order_by_rating(query)
+
+    field, direction = sort.rsplit("_", 1)
+    order_by = getattr(Product, field)
+    if direction == "desc":
+        order_by = order_by.desc()
+    return query.order_by(order_by)
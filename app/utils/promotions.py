@@ -0,0 +1,492 @@
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Set
+from sqlalchemy import func, insert, or_, select, update
+from sqlalchemy.orm import Session
+from app.models.category import Category
+from app.models.promotion import (
+    OrderDiscount,
+    Promotion,
+    PromotionTarget,
+    PromotionTargetType,
+    PromotionType,
+)
+from app.utils.pricing import PricedLine, PriceResolver
+
+# Seconds before the cached index is rebuilt from the database, bounds how
+# long edits made through another process take to show up
+PROMOTION_INDEX_TTL = 60
+
+CENT = Decimal("0.01")
+
+
+def normalize_code(code: str) -> str:
+    return code.strip().upper()
+
+
+def _money(amount: Decimal) -> Decimal:
+    return amount.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class PromotionLine(NamedTuple):
+    """Cart or order line with the fields promotions match on"""
+
+    product_id: int
+    category_id: Optional[int]
+    brand_id: Optional[int]
+    quantity: int
+    price: Decimal
+    total_price: Decimal
+
+
+class AppliedPromotion(NamedTuple):
+    promotion_id: int
+    name: str
+    code: Optional[str]
+    amount: Decimal
+    has_usage_limit: bool
+
+
+class CouponError(ValueError):
+    """Raised when a coupon code cannot be applied"""
+
+
+class PromotionUnavailableError(ValueError):
+    """Raised when a promotion ran out of uses before the order was placed"""
+
+
+class CompiledPromotion(NamedTuple):
+    """Immutable promotion rule ready for evaluation
+
+    Category targets are expanded to the category and all of its
+    descendants when the rule is compiled, so matching a line is a set
+    lookup on its own category.
+    """
+
+    id: int
+    name: str
+    code: Optional[str]
+    type: PromotionType
+    value: Decimal
+    buy_quantity: int
+    get_quantity: int
+    min_subtotal: Optional[Decimal]
+    max_discount: Optional[Decimal]
+    has_usage_limit: bool
+    priority: int
+    is_exclusive: bool
+    starts_at: Optional[datetime]
+    ends_at: Optional[datetime]
+    product_ids: FrozenSet[int]
+    category_ids: FrozenSet[int]
+    brand_ids: FrozenSet[int]
+
+    @property
+    def applies_to_all(self) -> bool:
+        return not (self.product_ids or self.category_ids or self.brand_ids)
+
+    def is_live(self, now: datetime) -> bool:
+        if self.starts_at is not None and now < self.starts_at:
+            return False
+        return self.ends_at is None or now < self.ends_at
+
+    def matches(self, line: PromotionLine) -> bool:
+        return (
+            self.applies_to_all
+            or line.product_id in self.product_ids
+            or line.category_id in self.category_ids
+            or line.brand_id in self.brand_ids
+        )
+
+    def discount(self, lines: List[PromotionLine], base: Decimal) -> Decimal:
+        """Discount on the matching lines, base is what is left to discount"""
+        if self.type == PromotionType.PERCENT_OFF:
+            amount = base * self.value / 100
+        elif self.type == PromotionType.AMOUNT_OFF:
+            amount = self.value
+        else:
+            # Every buy + get units, the cheapest get units are discounted
+            prices = sorted(
+                (line.price for line in lines for _ in range(line.quantity)),
+                reverse=True,
+            )
+            group = self.buy_quantity + self.get_quantity
+            free = len(prices) // group * self.get_quantity
+            amount = sum(prices[len(prices) - free :], Decimal(0)) * self.value / 100
+        if self.max_discount is not None:
+            amount = min(amount, self.max_discount)
+        return _money(min(amount, base))
+
+
+class PromotionIndex:
+    """Live promotion rules indexed by what they target
+
+    Automatic rules are indexed by product, category and brand, so a cart
+    only evaluates the rules that can match one of its lines plus the rules
+    without targets. Coupons are only looked up by code.
+    """
+
+    def __init__(self, promotions: Iterable[CompiledPromotion]):
+        self.built_at = time.monotonic()
+        self.by_id: Dict[int, CompiledPromotion] = {}
+        self.by_code: Dict[str, CompiledPromotion] = {}
+        self.by_product: Dict[int, List[int]] = defaultdict(list)
+        self.by_category: Dict[int, List[int]] = defaultdict(list)
+        self.by_brand: Dict[int, List[int]] = defaultdict(list)
+        self.global_ids: List[int] = []
+
+        for promotion in promotions:
+            self.by_id[promotion.id] = promotion
+            if promotion.code:
+                self.by_code[promotion.code] = promotion
+            elif promotion.applies_to_all:
+                self.global_ids.append(promotion.id)
+            else:
+                for product_id in promotion.product_ids:
+                    self.by_product[product_id].append(promotion.id)
+                for category_id in promotion.category_ids:
+                    self.by_category[category_id].append(promotion.id)
+                for brand_id in promotion.brand_ids:
+                    self.by_brand[brand_id].append(promotion.id)
+
+    def candidates(self, lines: Iterable[PromotionLine]) -> List[CompiledPromotion]:
+        """Automatic rules that may apply to any of the lines"""
+        ids: Set[int] = set(self.global_ids)
+        for line in lines:
+            ids.update(self.by_product.get(line.product_id, ()))
+            ids.update(self.by_category.get(line.category_id, ()))
+            ids.update(self.by_brand.get(line.brand_id, ()))
+        return [self.by_id[promotion_id] for promotion_id in ids]
+
+    def coupon(self, code: str) -> Optional[CompiledPromotion]:
+        return self.by_code.get(normalize_code(code))
+
+
+def _descendants(db: Session) -> Dict[int, FrozenSet[int]]:
+    """Every category with all of its descendants, from one query"""
+    children: Dict[Optional[int], List[int]] = defaultdict(list)
+    for category_id, parent_id in db.execute(select(Category.id, Category.parent_id)):
+        children[parent_id].append(category_id)
+
+    result: Dict[int, FrozenSet[int]] = {}
+
+    def collect(category_id: int, path: FrozenSet[int]) -> FrozenSet[int]:
+        if category_id not in result:
+            found = {category_id}
+            for child in children.get(category_id, ()):
+                # Guard against parent cycles in bad data
+                if child not in path:
+                    found |= collect(child, path | {child})
+            result[category_id] = frozenset(found)
+        return result[category_id]
+
+    for category_ids in list(children.values()):
+        for category_id in category_ids:
+            collect(category_id, frozenset({category_id}))
+    return result
+
+
+def build_promotion_index(db: Session) -> PromotionIndex:
+    """Compile all live promotions in three queries"""
+    now = datetime.utcnow()
+    promotions = (
+        db.query(Promotion)
+        .filter(
+            Promotion.is_active == True,
+            or_(Promotion.ends_at.is_(None), Promotion.ends_at > now),
+        )
+        .all()
+    )
+    targets: Dict[int, Dict[PromotionTargetType, Set[int]]] = defaultdict(
+        lambda: defaultdict(set)
+    )
+    if promotions:
+        rows = db.execute(
+            select(
+                PromotionTarget.promotion_id,
+                PromotionTarget.target_type,
+                PromotionTarget.target_id,
+            ).where(PromotionTarget.promotion_id.in_([p.id for p in promotions]))
+        )
+        for promotion_id, target_type, target_id in rows:
+            targets[promotion_id][target_type].add(target_id)
+    descendants = (
+        _descendants(db)
+        if any(
+            PromotionTargetType.CATEGORY in promotion_targets
+            for promotion_targets in targets.values()
+        )
+        else {}
+    )
+
+    compiled = []
+    for promotion in promotions:
+        promotion_targets = targets[promotion.id]
+        category_ids: Set[int] = set()
+        for category_id in promotion_targets[PromotionTargetType.CATEGORY]:
+            category_ids |= descendants.get(category_id, {category_id})
+        compiled.append(
+            CompiledPromotion(
+                id=promotion.id,
+                name=promotion.name,
+                code=promotion.code,
+                type=promotion.type,
+                value=Decimal(promotion.value),
+                buy_quantity=promotion.buy_quantity or 0,
+                get_quantity=promotion.get_quantity or 0,
+                min_subtotal=promotion.min_subtotal,
+                max_discount=promotion.max_discount,
+                has_usage_limit=promotion.usage_limit is not None,
+                priority=promotion.priority or 0,
+                is_exclusive=bool(promotion.is_exclusive),
+                starts_at=promotion.starts_at,
+                ends_at=promotion.ends_at,
+                product_ids=frozenset(promotion_targets[PromotionTargetType.PRODUCT]),
+                category_ids=frozenset(category_ids),
+                brand_ids=frozenset(promotion_targets[PromotionTargetType.BRAND]),
+            )
+        )
+    return PromotionIndex(compiled)
+
+
+class PromotionIndexRegistry:
+    """Process-wide cache of the compiled promotion index"""
+
+    def __init__(self, ttl: int = PROMOTION_INDEX_TTL):
+        self.ttl = ttl
+        self._index: Optional[PromotionIndex] = None
+        self._lock = threading.Lock()
+
+    def get(self, db: Session) -> PromotionIndex:
+        """Get the index, building it on a miss or after TTL"""
+        index = self._index
+        if index is not None and time.monotonic() - index.built_at < self.ttl:
+            return index
+        return self.refresh(db)
+
+    def refresh(self, db: Session) -> PromotionIndex:
+        """Rebuild the index from the database"""
+        index = build_promotion_index(db)
+        with self._lock:
+            self._index = index
+        return index
+
+    def invalidate(self) -> None:
+        """Drop the cached index so the next read rebuilds it"""
+        with self._lock:
+            self._index = None
+
+
+promotion_index = PromotionIndexRegistry()
+
+
+def promotion_lines(
+    resolver: PriceResolver, lines: Iterable[PricedLine]
+) -> List[PromotionLine]:
+    """Add category and brand from the resolver's product snapshots"""
+    result = []
+    for line in lines:
+        product = resolver.product(line.product_id)
+        result.append(
+            PromotionLine(
+                product_id=line.product_id,
+                category_id=product.category_id if product else None,
+                brand_id=product.brand_id if product else None,
+                quantity=line.quantity,
+                price=line.price,
+                total_price=line.total_price,
+            )
+        )
+    return result
+
+
+def _apply(
+    rules: List[CompiledPromotion], lines: List[PromotionLine]
+) -> List[AppliedPromotion]:
+    """Apply rules in priority order, each on what earlier rules left"""
+    remaining = [line.total_price for line in lines]
+    applied: List[AppliedPromotion] = []
+    for rule in rules:
+        matched = [index for index, line in enumerate(lines) if rule.matches(line)]
+        if not matched:
+            continue
+        if rule.min_subtotal is not None and (
+            sum(lines[index].total_price for index in matched) < rule.min_subtotal
+        ):
+            continue
+        base = sum((remaining[index] for index in matched), Decimal(0))
+        if base <= 0:
+            continue
+        amount = rule.discount([lines[index] for index in matched], base)
+        if amount <= 0:
+            continue
+
+        # Spread the discount over the matched lines by what is left of them
+        left = amount
+        for position, index in enumerate(matched):
+            share = (
+                left
+                if position == len(matched) - 1
+                else _money(amount * remaining[index] / base)
+            )
+            share = min(share, left, remaining[index])
+            remaining[index] -= share
+            left -= share
+        amount -= left
+
+        applied.append(
+            AppliedPromotion(
+                rule.id, rule.name, rule.code, amount, rule.has_usage_limit
+            )
+        )
+    return applied
+
+
+def evaluate_promotions(
+    index: PromotionIndex,
+    lines: List[PromotionLine],
+    code: Optional[str] = None,
+    now: Optional[datetime] = None,
+) -> List[AppliedPromotion]:
+    """Best combination of promotions for the lines
+
+    Only rules the index returns as candidates are evaluated. Combinable
+    rules stack in priority order; an exclusive rule is used on its own
+    when it gives more than the stack. A coupon is always used when given,
+    together with the combinable rules unless it is exclusive itself.
+    """
+    now = now or datetime.utcnow()
+    rules = [rule for rule in index.candidates(lines) if rule.is_live(now)]
+
+    coupon = None
+    if code:
+        coupon = index.coupon(code)
+        if coupon is None or not coupon.is_live(now):
+            raise CouponError(f"Coupon {code} is not valid")
+        if not coupon.is_exclusive:
+            rules.append(coupon)
+
+    rules.sort(key=lambda rule: (-rule.priority, rule.id))
+    stackable = [rule for rule in rules if not rule.is_exclusive]
+    if coupon is not None:
+        options = [[coupon]] if coupon.is_exclusive else [stackable]
+    else:
+        options = [stackable] + [[rule] for rule in rules if rule.is_exclusive]
+
+    best: List[AppliedPromotion] = []
+    best_total = Decimal(0)
+    for option in options:
+        applied = _apply(option, lines)
+        total = sum((promotion.amount for promotion in applied), Decimal(0))
+        if total > best_total:
+            best, best_total = applied, total
+
+    if coupon is not None and all(
+        promotion.promotion_id != coupon.id for promotion in best
+    ):
+        raise CouponError(f"Coupon {code} does not apply to these items")
+    return best
+
+
+def redeem_promotions(
+    db: Session, order_id: int, applied: Iterable[AppliedPromotion]
+) -> None:
+    """Record the discounts of an order and count uses of limited promotions
+
+    Limited promotions are counted with a conditional
+    UPDATE ... WHERE used_count < usage_limit, so concurrent orders cannot
+    overshoot the limit. Unlimited promotions are not counted, which keeps
+    a popular sale from becoming a row every order has to lock. Runs in the
+    caller's transaction; on PromotionUnavailableError the caller must roll
+    back.
+    """
+    applied = sorted(applied, key=lambda promotion: promotion.promotion_id)
+    if not applied:
+        return
+
+    for promotion in applied:
+        if not promotion.has_usage_limit:
+            continue
+        taken = db.execute(
+            update(Promotion)
+            .where(
+                Promotion.id == promotion.promotion_id,
+                or_(
+                    Promotion.usage_limit.is_(None),
+                    Promotion.used_count < Promotion.usage_limit,
+                ),
+            )
+            .values(used_count=Promotion.used_count + 1)
+            .returning(Promotion.id)
+            .execution_options(synchronize_session=False)
+        ).first()
+        if taken is None:
+            raise PromotionUnavailableError(
+                f"Promotion {promotion.name} is no longer available"
+            )
+
+    now = datetime.utcnow()
+    db.execute(
+        insert(OrderDiscount),
+        [
+            {
+                "order_id": order_id,
+                "promotion_id": promotion.promotion_id,
+                "code": promotion.code,
+                "amount": promotion.amount,
+                "counted": promotion.has_usage_limit,
+                "created_at": now,
+            }
+            for promotion in applied
+        ],
+    )
+
+
+def price_promotions(
+    db: Session,
+    resolver: PriceResolver,
+    lines: Iterable[PricedLine],
+    code: Optional[str] = None,
+) -> List[AppliedPromotion]:
+    """Promotions for priced lines using the process-wide index"""
+    return evaluate_promotions(
+        promotion_index.get(db), promotion_lines(resolver, lines), code
+    )
+
+
+def release_promotions(db: Session, order_ids: Iterable[int]) -> None:
+    """Give back uses of limited promotions taken by cancelled orders
+
+    Only uses counted when the order was placed are given back, a
+    promotion limited later never counted them. Uses are marked as no
+    longer counted in the same statement that reads them, so an order
+    released twice gives its uses back once.
+    """
+    order_ids = list(order_ids)
+    if not order_ids:
+        return
+
+    released = (
+        db.execute(
+            update(OrderDiscount)
+            .where(
+                OrderDiscount.order_id.in_(order_ids),
+                OrderDiscount.counted.is_(True),
+            )
+            .values(counted=False)
+            .returning(OrderDiscount.promotion_id)
+            .execution_options(synchronize_session=False)
+        )
+        .scalars()
+        .all()
+    )
+    for promotion_id, count in sorted(Counter(released).items()):
+        db.execute(
+            update(Promotion)
+            .where(Promotion.id == promotion_id)
+            .values(used_count=func.greatest(Promotion.used_count - count, 0))
+            .execution_options(synchronize_session=False)
+        )
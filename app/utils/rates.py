@@ -0,0 +1,284 @@
+import math
+import threading
+import time
+from datetime import datetime
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from sqlalchemy import insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.core.logger import logger
+from app.db.database import SessionLocal
+from app.models.shipping import CacheVersion, OrderTax, ShippingZone, TaxRate
+from app.utils.pricing import PricedLine, PriceResolver
+
+RATE_CACHE_NAME = "rates"
+# Seconds between checks of the rate table version, bounds how long edits
+# made through another process take to show up
+RATE_VERSION_CHECK_INTERVAL = 30
+# Billable weight is rounded up to this step
+WEIGHT_STEP_KG = Decimal("0.5")
+
+CENT = Decimal("0.01")
+
+# (country_id, state_id or None for the whole country)
+Region = Tuple[int, Optional[int]]
+
+
+def _money(amount: Decimal) -> Decimal:
+    return amount.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class ShippingRate(NamedTuple):
+    zone_id: int
+    name: str
+    base_fee: Decimal
+    per_kg_fee: Decimal
+    volumetric_divisor: int
+    free_shipping_threshold: Optional[Decimal]
+
+
+class TaxEntry(NamedTuple):
+    tax_rate_id: int
+    name: str
+    rate: Decimal
+    applies_to_shipping: bool
+
+
+class AppliedTax(NamedTuple):
+    tax_rate_id: Optional[int]
+    name: str
+    rate: Decimal
+    amount: Decimal
+
+
+class RateQuote(NamedTuple):
+    shipping_fee: Decimal
+    billable_weight: Decimal
+    taxes: List[AppliedTax]
+    tax_amount: Decimal
+
+
+class ShippingUnavailableError(ValueError):
+    """Raised when no shipping zone covers an address"""
+
+
+class RateTables:
+    """Immutable snapshot of the active shipping zones and tax rates"""
+
+    def __init__(
+        self,
+        version: int,
+        zones: Dict[Region, ShippingRate],
+        taxes: Dict[Region, TaxEntry],
+    ):
+        self.version = version
+        self.zones = zones
+        self.taxes = taxes
+
+    def shipping_rate(
+        self, country_id: int, state_id: Optional[int]
+    ) -> Optional[ShippingRate]:
+        """Zone of the state, falling back to the zone of its country"""
+        if state_id is not None and (country_id, state_id) in self.zones:
+            return self.zones[(country_id, state_id)]
+        return self.zones.get((country_id, None))
+
+    def tax_rates(self, country_id: int, state_id: Optional[int]) -> List[TaxEntry]:
+        """Country and state taxes, both apply"""
+        regions = [(country_id, None)]
+        if state_id is not None:
+            regions.append((country_id, state_id))
+        return [self.taxes[region] for region in regions if region in self.taxes]
+
+
+def current_rate_version(db: Session) -> int:
+    version = db.execute(
+        select(CacheVersion.version).where(CacheVersion.name == RATE_CACHE_NAME)
+    ).scalar()
+    return version or 0
+
+
+def bump_rate_version(db: Session) -> None:
+    """Mark the rate tables changed, in the caller's transaction"""
+    now = datetime.utcnow()
+    statement = pg_insert(CacheVersion).values(
+        name=RATE_CACHE_NAME, version=1, updated_at=now
+    )
+    db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[CacheVersion.name],
+            set_={"version": CacheVersion.version + 1, "updated_at": now},
+        )
+    )
+
+
+def load_rate_tables(db: Session) -> RateTables:
+    """Read the version and all active zones and rates in three queries"""
+    version = current_rate_version(db)
+    zones = {
+        (zone.country_id, zone.state_id): ShippingRate(
+            zone.id,
+            zone.name,
+            zone.base_fee,
+            zone.per_kg_fee,
+            zone.volumetric_divisor or 5000,
+            zone.free_shipping_threshold,
+        )
+        for zone in db.execute(
+            select(ShippingZone).where(ShippingZone.is_active == True)
+        ).scalars()
+    }
+    taxes = {
+        (tax.country_id, tax.state_id): TaxEntry(
+            tax.id, tax.name, tax.rate, bool(tax.applies_to_shipping)
+        )
+        for tax in db.execute(
+            select(TaxRate).where(TaxRate.is_active == True)
+        ).scalars()
+    }
+    return RateTables(version, zones, taxes)
+
+
+class RateCache:
+    """Process-wide copy of the rate tables
+
+    Quotes read the in-memory tables only. The version row is checked at
+    most every check_interval seconds, and the tables are reloaded when it
+    changed, so every process picks up admin edits without polling the
+    tables themselves.
+    """
+
+    def __init__(self, check_interval: int = RATE_VERSION_CHECK_INTERVAL):
+        self.check_interval = check_interval
+        self._tables: Optional[RateTables] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def get(self, db: Session) -> RateTables:
+        tables = self._tables
+        if (
+            tables is not None
+            and time.monotonic() - self._checked_at < self.check_interval
+        ):
+            return tables
+        if tables is None or current_rate_version(db) != tables.version:
+            return self.load(db)
+        self._checked_at = time.monotonic()
+        return tables
+
+    def load(self, db: Session) -> RateTables:
+        """Reload the tables from the database"""
+        tables = load_rate_tables(db)
+        with self._lock:
+            self._tables = tables
+            self._checked_at = time.monotonic()
+        return tables
+
+    def invalidate(self) -> None:
+        """Drop the tables so the next read reloads them"""
+        with self._lock:
+            self._tables = None
+
+
+rate_cache = RateCache()
+
+
+def load_rate_cache() -> None:
+    """Load the rate tables in their own session, run at startup"""
+    with SessionLocal() as db:
+        tables = rate_cache.load(db)
+    logger.info(
+        f"Loaded {len(tables.zones)} shipping zones and {len(tables.taxes)} "
+        f"tax rates, version {tables.version}"
+    )
+
+
+def billable_weight(
+    resolver: PriceResolver, lines: Iterable[PricedLine], volumetric_divisor: int
+) -> Decimal:
+    """Sum of the larger of actual and volumetric weight of every unit
+
+    Uses the weight and dimensions in the resolver's product snapshots, so
+    it runs no queries for lines the resolver has already loaded.
+    """
+    total = Decimal(0)
+    for line in lines:
+        product = resolver.product(line.product_id)
+        if product is None:
+            continue
+        weight = Decimal(product.weight or 0)
+        if product.width and product.height and product.depth:
+            volume = (
+                Decimal(product.width)
+                * Decimal(product.height)
+                * Decimal(product.depth)
+            )
+            weight = max(weight, volume / volumetric_divisor)
+        total += weight * line.quantity
+    steps = math.ceil(total / WEIGHT_STEP_KG)
+    return steps * WEIGHT_STEP_KG
+
+
+def quote_rates(
+    tables: RateTables,
+    resolver: PriceResolver,
+    lines: List[PricedLine],
+    merchandise_total: Decimal,
+    country_id: int,
+    state_id: Optional[int],
+    fallback_shipping_fee: Optional[Decimal] = None,
+) -> RateQuote:
+    """Shipping fee and taxes for lines shipped to a region
+
+    merchandise_total is the line total after discounts. Shipping is free
+    from the zone's threshold on. When no shipping zone is configured at
+    all, fallback_shipping_fee is charged if given, so stores that have
+    not set up zones keep working.
+    """
+    rate = tables.shipping_rate(country_id, state_id)
+    weight = Decimal(0)
+    if rate is not None:
+        weight = billable_weight(resolver, lines, rate.volumetric_divisor)
+        if (
+            rate.free_shipping_threshold is not None
+            and merchandise_total >= rate.free_shipping_threshold
+        ):
+            shipping_fee = Decimal(0)
+        else:
+            shipping_fee = _money(rate.base_fee + rate.per_kg_fee * weight)
+    elif not tables.zones and fallback_shipping_fee is not None:
+        shipping_fee = fallback_shipping_fee
+    else:
+        raise ShippingUnavailableError("Shipping is not available to this address")
+
+    taxes = []
+    for tax in tables.tax_rates(country_id, state_id):
+        taxable = merchandise_total + (shipping_fee if tax.applies_to_shipping else 0)
+        taxes.append(
+            AppliedTax(tax.tax_rate_id, tax.name, tax.rate, _money(taxable * tax.rate))
+        )
+    return RateQuote(
+        shipping_fee=shipping_fee,
+        billable_weight=weight,
+        taxes=taxes,
+        tax_amount=sum((tax.amount for tax in taxes), Decimal(0)),
+    )
+
+
+def record_order_taxes(db: Session, order_id: int, taxes: Iterable[AppliedTax]) -> None:
+    """Store the taxes of an order, in the caller's transaction"""
+    now = datetime.utcnow()
+    rows = [
+        {
+            "order_id": order_id,
+            "tax_rate_id": tax.tax_rate_id,
+            "name": tax.name,
+            "rate": tax.rate,
+            "amount": tax.amount,
+            "created_at": now,
+        }
+        for tax in taxes
+    ]
+    if rows:
+        db.execute(insert(OrderTax), rows)
@@ -0,0 +1,46 @@
+from datetime import datetime
+from typing import Optional
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.models.product import ProductRatingStats
+
+RATING_VALUES = (1, 2, 3, 4, 5)
+
+
+def apply_rating_change(
+    db: Session, product_id: int, old_rating: Optional[int], new_rating: Optional[int]
+) -> None:
+    """Move a review's rating in the product rating stats
+
+    old_rating is None for a new review and new_rating is None when a
+    review is deactivated. The stats row is updated with one upsert in the
+    caller's transaction, so concurrent reviews never overwrite each other.
+    """
+    if old_rating == new_rating:
+        return
+
+    deltas = {
+        "rating_count": int(new_rating is not None) - int(old_rating is not None),
+        "rating_sum": (new_rating or 0) - (old_rating or 0),
+    }
+    for rating in RATING_VALUES:
+        deltas[f"rating_{rating}"] = int(new_rating == rating) - int(
+            old_rating == rating
+        )
+
+    now = datetime.utcnow()
+    statement = pg_insert(ProductRatingStats).values(
+        product_id=product_id, updated_at=now, **deltas
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[ProductRatingStats.product_id],
+        set_={
+            **{
+                field: getattr(ProductRatingStats, field) + delta
+                for field, delta in deltas.items()
+                if delta
+            },
+            "updated_at": now,
+        },
+    )
+    db.execute(statement)
@@ -0,0 +1,353 @@
+import argparse
+from array import array
+from datetime import datetime, timedelta
+from typing import Iterable, List, Set, Tuple
+import numpy as np
+from scipy import sparse
+from sqlalchemy import and_, delete, insert, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.core.logger import logger
+from app.models.job import JobCheckpoint
+from app.models.order import Order, OrderItem, OrderStatus
+from app.models.recommendation import (
+    CoPurchaseOrder,
+    ProductCoPurchase,
+    ProductRecommendation,
+)
+from app.utils.order_archive import ORDER_TABLES
+
+JOB_NAME = "product_recommendations"
+
+# Neighbours kept per product
+RELATED_TOP_K = 20
+# Rows per executemany / IN query
+WRITE_BATCH_SIZE = 5000
+# Incremental runs re-read orders updated this long before the last run,
+# covering transactions that committed after it with an earlier timestamp
+RECOMMENDATION_OVERLAP = timedelta(minutes=10)
+
+
+def _chunks(items: List, size: int) -> Iterable[List]:
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def _collect_items(db: Session, statements: Iterable) -> Tuple[np.ndarray, np.ndarray]:
+    """Stream (order_id, product_id) pairs into two int64 arrays"""
+    order_ids = array("q")
+    product_ids = array("q")
+    for statement in statements:
+        rows = db.execute(
+            statement.execution_options(stream_results=True, yield_per=WRITE_BATCH_SIZE)
+        )
+        for order_id, product_id in rows:
+            order_ids.append(order_id)
+            product_ids.append(product_id)
+    return (
+        np.frombuffer(order_ids, dtype=np.int64),
+        np.frombuffer(product_ids, dtype=np.int64),
+    )
+
+
+def load_all_order_items(db: Session) -> Tuple[np.ndarray, np.ndarray]:
+    """Items of every counted order, live and archived"""
+    return _collect_items(
+        db,
+        (
+            select(order_item_model.order_id, order_item_model.product_id)
+            .join(order_model, order_model.id == order_item_model.order_id)
+            .where(
+                order_model.is_active == True,
+                order_model.status != OrderStatus.CANCELLED,
+                order_item_model.product_id.is_not(None),
+            )
+            for order_model, order_item_model in ORDER_TABLES
+        ),
+    )
+
+
+def load_order_items(
+    db: Session, order_ids: List[int]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Items of the given live orders"""
+    return _collect_items(
+        db,
+        (
+            select(OrderItem.order_id, OrderItem.product_id).where(
+                OrderItem.order_id.in_(batch), OrderItem.product_id.is_not(None)
+            )
+            for batch in _chunks(order_ids, WRITE_BATCH_SIZE)
+        ),
+    )
+
+
+def changed_orders(db: Session, since: datetime) -> Tuple[List[int], List[int]]:
+    """Orders to add to and subtract from the counts
+
+    Reads orders updated since the watermark. Orders that count and are not
+    counted yet are added, counted orders that were cancelled or
+    deactivated since are subtracted.
+    """
+    added: List[int] = []
+    removed: List[int] = []
+    rows = db.execute(
+        select(
+            Order.id,
+            and_(Order.is_active == True, Order.status != OrderStatus.CANCELLED),
+            CoPurchaseOrder.order_id.is_not(None),
+        )
+        .outerjoin(CoPurchaseOrder, CoPurchaseOrder.order_id == Order.id)
+        .where(Order.updated_at >= since)
+    )
+    for order_id, counts, counted in rows:
+        if counts and not counted:
+            added.append(order_id)
+        elif counted and not counts:
+            removed.append(order_id)
+    return added, removed
+
+
+def co_occurrence(
+    orders: np.ndarray, products: np.ndarray
+) -> Tuple[np.ndarray, sparse.coo_matrix]:
+    """Build the product x product co-occurrence matrix
+
+    Rows of the order x product incidence matrix are baskets; X^T X counts
+    the orders in which each pair of products appears together, and its
+    diagonal is the number of orders containing each product.
+    """
+    product_ids, product_index = np.unique(products, return_inverse=True)
+    _, order_index = np.unique(orders, return_inverse=True)
+
+    baskets = sparse.csr_matrix(
+        (np.ones(len(products), dtype=np.int64), (order_index, product_index)),
+        shape=(order_index.max() + 1, len(product_ids)),
+    )
+    # The same product on several lines of one order counts once
+    baskets.data[:] = 1
+
+    return product_ids, (baskets.T @ baskets).tocoo()
+
+
+def merge_counts(
+    db: Session, product_ids: np.ndarray, counts: sparse.coo_matrix
+) -> None:
+    """Add co-occurrence deltas to the stored counts"""
+    rows = [
+        {
+            "product_id": int(product_ids[i]),
+            "related_product_id": int(product_ids[j]),
+            "count": int(c),
+        }
+        for i, j, c in zip(counts.row, counts.col, counts.data)
+    ]
+    statement = pg_insert(ProductCoPurchase)
+    statement = statement.on_conflict_do_update(
+        index_elements=[
+            ProductCoPurchase.product_id,
+            ProductCoPurchase.related_product_id,
+        ],
+        set_={"count": ProductCoPurchase.count + statement.excluded.count},
+    )
+    for batch in _chunks(rows, WRITE_BATCH_SIZE):
+        db.execute(statement, batch)
+
+
+def affected_products(db: Session, product_ids: Iterable[int]) -> Set[int]:
+    """Products whose neighbour scores change when these products change"""
+    affected = set(int(product_id) for product_id in product_ids)
+    for batch in _chunks(sorted(affected), WRITE_BATCH_SIZE):
+        affected.update(
+            related_id
+            for (related_id,) in db.execute(
+                select(ProductCoPurchase.related_product_id).where(
+                    ProductCoPurchase.product_id.in_(batch)
+                )
+            )
+        )
+    return affected
+
+
+def rebuild_top_k(
+    db: Session, product_ids: Set[int], top_k: int = RELATED_TOP_K
+) -> None:
+    """Recompute cosine-normalized top-K neighbours for the given products
+
+    score(i, j) = orders(i, j) / sqrt(orders(i) * orders(j))
+    """
+    for batch in _chunks(sorted(product_ids), WRITE_BATCH_SIZE // 10 or 1):
+        rows = db.execute(
+            select(
+                ProductCoPurchase.product_id,
+                ProductCoPurchase.related_product_id,
+                ProductCoPurchase.count,
+            ).where(ProductCoPurchase.product_id.in_(batch))
+        ).all()
+        if not rows:
+            db.execute(
+                delete(ProductRecommendation).where(
+                    ProductRecommendation.product_id.in_(batch)
+                )
+            )
+            continue
+
+        source, related, count = (
+            np.array(column, dtype=np.int64) for column in zip(*rows)
+        )
+
+        # Order counts live on the diagonal rows
+        totals = dict(
+            db.execute(
+                select(ProductCoPurchase.product_id, ProductCoPurchase.count).where(
+                    ProductCoPurchase.product_id.in_(set(related.tolist())),
+                    ProductCoPurchase.product_id
+                    == ProductCoPurchase.related_product_id,
+                )
+            ).all()
+        )
+        pairs = source != related
+        source, related, count = source[pairs], related[pairs], count[pairs]
+        source_totals = np.array(
+            [totals.get(p, 0) for p in source.tolist()], dtype=np.float64
+        )
+        related_totals = np.array(
+            [totals.get(p, 0) for p in related.tolist()], dtype=np.float64
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            scores = np.nan_to_num(count / np.sqrt(source_totals * related_totals))
+
+        # Sort by product then descending score, keep the first K per product
+        order = np.lexsort((-scores, source))
+        source, related, scores = source[order], related[order], scores[order]
+        starts = np.searchsorted(source, source, side="left")
+        ranks = np.arange(len(source)) - starts + 1
+        keep = ranks <= top_k
+
+        now = datetime.utcnow()
+        recommendations = [
+            {
+                "product_id": int(p),
+                "related_product_id": int(r),
+                "score": float(s),
+                "rank": int(k),
+                "created_at": now,
+            }
+            for p, r, s, k in zip(
+                source[keep], related[keep], scores[keep], ranks[keep]
+            )
+        ]
+        db.execute(
+            delete(ProductRecommendation).where(
+                ProductRecommendation.product_id.in_(batch)
+            )
+        )
+        if recommendations:
+            db.execute(insert(ProductRecommendation), recommendations)
+
+
+def merge_orders(
+    db: Session, orders: np.ndarray, products: np.ndarray, sign: int = 1
+) -> np.ndarray:
+    """Add (sign 1) or subtract (sign -1) the baskets of orders from the counts
+
+    Returns the products whose counts changed.
+    """
+    if not len(orders):
+        return np.array([], dtype=np.int64)
+    product_ids, counts = co_occurrence(orders, products)
+    counts.data *= sign
+    merge_counts(db, product_ids, counts)
+    if sign < 0:
+        for batch in _chunks(product_ids.tolist(), WRITE_BATCH_SIZE):
+            db.execute(
+                delete(ProductCoPurchase).where(
+                    ProductCoPurchase.product_id.in_(batch),
+                    ProductCoPurchase.count <= 0,
+                )
+            )
+    return product_ids
+
+
+def mark_counted(db: Session, order_ids: List[int]) -> None:
+    now = datetime.utcnow()
+    for batch in _chunks(order_ids, WRITE_BATCH_SIZE):
+        db.execute(
+            insert(CoPurchaseOrder),
+            [{"order_id": order_id, "counted_at": now} for order_id in batch],
+        )
+
+
+def run_recommendation_job(db: Session, full: bool = False) -> int:
+    """Update co-purchase counts and recommendations from changed orders
+
+    Incremental runs read orders updated since the last run, minus
+    RECOMMENDATION_OVERLAP so orders committed late with an earlier
+    timestamp are not missed. The counted orders table keeps re-read orders
+    from being counted twice and lets cancelled orders be subtracted.
+    A full run clears the counts and rebuilds them from every live and
+    archived order; it also runs when nothing has been counted yet.
+    Returns the number of products whose recommendations were rebuilt.
+    """
+    started = datetime.utcnow()
+    checkpoint = db.get(JobCheckpoint, JOB_NAME)
+    if checkpoint is None:
+        checkpoint = JobCheckpoint(name=JOB_NAME)
+        db.add(checkpoint)
+    if (
+        checkpoint.last_timestamp is None
+        or not db.execute(select(CoPurchaseOrder.order_id).limit(1)).first()
+    ):
+        full = True
+
+    if full:
+        db.execute(delete(ProductRecommendation))
+        db.execute(delete(ProductCoPurchase))
+        db.execute(delete(CoPurchaseOrder))
+        orders, products = load_all_order_items(db)
+        changed = merge_orders(db, orders, products)
+        mark_counted(db, np.unique(orders).tolist())
+        added, removed = len(np.unique(orders)), 0
+    else:
+        added_ids, removed_ids = changed_orders(
+            db, checkpoint.last_timestamp - RECOMMENDATION_OVERLAP
+        )
+        orders, products = load_order_items(db, added_ids)
+        changed = merge_orders(db, orders, products)
+        # Orders without items are counted too, so they are not read again
+        mark_counted(db, added_ids)
+
+        orders, products = load_order_items(db, removed_ids)
+        changed = np.union1d(changed, merge_orders(db, orders, products, sign=-1))
+        for batch in _chunks(removed_ids, WRITE_BATCH_SIZE):
+            db.execute(
+                delete(CoPurchaseOrder).where(CoPurchaseOrder.order_id.in_(batch))
+            )
+        added, removed = len(added_ids), len(removed_ids)
+
+    affected = affected_products(db, changed.tolist()) if len(changed) else set()
+    rebuild_top_k(db, affected)
+
+    checkpoint.last_timestamp = started
+    db.commit()
+
+    logger.info(
+        f"Recommendations rebuilt for {len(affected)} products, "
+        f"{added} orders added and {removed} subtracted"
+    )
+    return len(affected)
+
+
+def main():
+    from app.db.database import SessionLocal
+
+    parser = argparse.ArgumentParser(description="Build co-purchase recommendations")
+    parser.add_argument("--full", action="store_true", help="Rebuild from all orders")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        run_recommendation_job(db, full=args.full)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import threading
+import time
+from decimal import Decimal
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.models.product import (
+    Product,
+    ProductAttribute,
+    ProductVariant,
+    ProductVariantAttribute,
+)
+
+# Seconds before a cached index is rebuilt from the database
+VARIANT_INDEX_TTL = 300
+
+AttributeKey = Tuple[int, ...]
+
+
+def make_key(attribute_ids: Iterable[int]) -> AttributeKey:
+    """Build the canonical key for an attribute combination"""
+    return tuple(sorted(set(attribute_ids)))
+
+
+class VariantEntry(NamedTuple):
+    id: int
+    name: str
+    sku: str
+    price: Decimal
+    stock: int
+    currency: str
+    attribute_ids: AttributeKey
+
+
+class ProductVariantIndex:
+    """Variant lookup structure for a single product
+
+    Variants are keyed by their canonical attribute-id tuple so a full
+    selection resolves with one dict lookup. For availability, every
+    attribute keeps a bitmask of the in-stock variants that contain it, so
+    checking a combination is an AND over a handful of integers.
+    """
+
+    def __init__(
+        self,
+        product_id: int,
+        variants: List[VariantEntry],
+        attribute_groups: Dict[int, str],
+    ):
+        self.product_id = product_id
+        self.built_at = time.monotonic()
+        self.attribute_groups = attribute_groups
+        self.by_key: Dict[AttributeKey, VariantEntry] = {}
+        self.masks: Dict[int, int] = {attr_id: 0 for attr_id in attribute_groups}
+
+        for position, variant in enumerate(variants):
+            self.by_key[variant.attribute_ids] = variant
+            if variant.stock > 0:
+                for attr_id in variant.attribute_ids:
+                    self.masks[attr_id] = self.masks.get(attr_id, 0) | (1 << position)
+
+    def resolve(self, attribute_ids: Iterable[int]) -> Optional[VariantEntry]:
+        """Return the variant matching exactly this attribute combination"""
+        return self.by_key.get(make_key(attribute_ids))
+
+    def is_available(self, attribute_ids: Iterable[int]) -> bool:
+        """Check whether any in-stock variant contains all given attributes"""
+        mask = -1
+        for attr_id in attribute_ids:
+            mask &= self.masks.get(attr_id, 0)
+            if not mask:
+                return False
+        return mask != 0
+
+    def availability(self, selected: Iterable[int]) -> Dict[int, bool]:
+        """Availability of every attribute given the current selection
+
+        An attribute replaces any selected attribute of the same group, which
+        is how a shopper switching from red to blue is evaluated.
+        """
+        selected_by_group = {
+            self.attribute_groups[attr_id]: attr_id
+            for attr_id in selected
+            if attr_id in self.attribute_groups
+        }
+        result = {}
+        for attr_id, group in self.attribute_groups.items():
+            combination = [
+                other for name, other in selected_by_group.items() if name != group
+            ]
+            combination.append(attr_id)
+            result[attr_id] = self.is_available(combination)
+        return result
+
+
+def build_product_variant_index(
+    db: Session, product_id: int
+) -> Optional[ProductVariantIndex]:
+    """Load variants and their attributes for a product in two queries"""
+    product = (
+        db.query(Product.id)
+        .filter(
+            Product.id == product_id,
+            Product.is_active == True,
+            Product.deleted_at.is_(None),
+        )
+        .first()
+    )
+    if not product:
+        return None
+
+    attribute_groups = {
+        attr_id: name
+        for attr_id, name in db.query(ProductAttribute.id, ProductAttribute.name)
+        .filter(
+            ProductAttribute.product_id == product_id,
+            ProductAttribute.is_active == True,
+        )
+        .all()
+    }
+
+    rows = (
+        db.query(
+            ProductVariant.id,
+            ProductVariant.name,
+            ProductVariant.sku,
+            ProductVariant.price,
+            ProductVariant.stock,
+            ProductVariant.currency,
+            ProductVariantAttribute.attribute_id,
+        )
+        .join(
+            ProductVariantAttribute,
+            ProductVariantAttribute.variant_id == ProductVariant.id,
+        )
+        .filter(
+            ProductVariant.product_id == product_id,
+            ProductVariant.is_active == True,
+            ProductVariant.deleted_at.is_(None),
+        )
+        .order_by(ProductVariant.id)
+        .all()
+    )
+
+    # Group joined rows back into one entry per variant
+    grouped: Dict[int, list] = {}
+    for variant_id, name, sku, price, stock, currency, attr_id in rows:
+        if variant_id not in grouped:
+            grouped[variant_id] = [name, sku, price, stock or 0, currency, []]
+        if attr_id in attribute_groups:
+            grouped[variant_id][5].append(attr_id)
+
+    variants = [
+        VariantEntry(variant_id, name, sku, price, stock, currency, make_key(attrs))
+        for variant_id, (name, sku, price, stock, currency, attrs) in grouped.items()
+        if attrs
+    ]
+    return ProductVariantIndex(product_id, variants, attribute_groups)
+
+
+class VariantIndexRegistry:
+    """Process-wide cache of per-product variant indexes"""
+
+    def __init__(self, ttl: int = VARIANT_INDEX_TTL):
+        self.ttl = ttl
+        self._indexes: Dict[int, ProductVariantIndex] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db: Session, product_id: int) -> Optional[ProductVariantIndex]:
+        """Get the index for a product, building it on a miss or after TTL"""
+        index = self._indexes.get(product_id)
+        if index is not None and time.monotonic() - index.built_at < self.ttl:
+            return index
+        return self.refresh(db, product_id)
+
+    def refresh(self, db: Session, product_id: int) -> Optional[ProductVariantIndex]:
+        """Rebuild the index for a product from the database"""
+        index = build_product_variant_index(db, product_id)
+        with self._lock:
+            if index is None:
+                self._indexes.pop(product_id, None)
+            else:
+                self._indexes[product_id] = index
+        return index
+
+    def invalidate(self, product_id: int) -> None:
+        """Drop the cached index so the next read rebuilds it"""
+        with self._lock:
+            self._indexes.pop(product_id, None)
+
+
+variant_index = VariantIndexRegistry()
@@ -0,0 +1,128 @@
+import threading
+from collections import Counter
+from typing import Dict, Iterable, Tuple
+from sqlalchemy import Integer, column, func, update, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+from app.core.logger import logger
+from app.db.database import SessionLocal
+from app.models.product import ProductReview, ReviewHelpfulVote
+
+# Seconds between flushes of buffered votes
+HELPFUL_VOTE_FLUSH_INTERVAL = 5
+# Votes failing this many flushes on their own are dropped
+HELPFUL_VOTE_MAX_ATTEMPTS = 5
+
+# (review_id, user_id)
+Vote = Tuple[int, int]
+
+
+class HelpfulVoteBuffer:
+    """In-memory buffer of review helpful votes
+
+    Clicks only touch a dict in memory. flush() writes all buffered votes
+    with one INSERT ... ON CONFLICT DO NOTHING into review_helpful_votes,
+    which drops votes a user already cast, and adds the accepted votes per
+    review with one UPDATE ... FROM (VALUES ...). A popular review therefore
+    takes one row lock per flush instead of one per click.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Pending votes and the number of flushes they failed in
+        self._pending: Dict[Vote, int] = {}
+
+    def add(self, review_id: int, user_id: int) -> bool:
+        """Buffer a vote, returns False if the same vote is already pending"""
+        vote = (review_id, user_id)
+        with self._lock:
+            if vote in self._pending:
+                return False
+            self._pending[vote] = 0
+            return True
+
+    @property
+    def pending_count(self) -> int:
+        return len(self._pending)
+
+    def _write(self, db: Session, votes: Iterable[Vote]) -> int:
+        """Write votes in one transaction, returns votes accepted"""
+        inserted = db.execute(
+            pg_insert(ReviewHelpfulVote)
+            .values(
+                [
+                    {"review_id": review_id, "user_id": user_id}
+                    for review_id, user_id in sorted(votes)
+                ]
+            )
+            .on_conflict_do_nothing()
+            .returning(ReviewHelpfulVote.review_id)
+        ).all()
+
+        deltas = Counter(review_id for (review_id,) in inserted)
+        if deltas:
+            data = values(
+                column("review_id", Integer), column("delta", Integer), name="v"
+            ).data(sorted(deltas.items()))
+            db.execute(
+                update(ProductReview.__table__)
+                .where(ProductReview.__table__.c.id == data.c.review_id)
+                .values(
+                    helpful_votes=func.coalesce(
+                        ProductReview.__table__.c.helpful_votes, 0
+                    )
+                    + data.c.delta
+                )
+            )
+        db.commit()
+        return sum(deltas.values())
+
+    def flush(self, db: Session) -> int:
+        """Write buffered votes to the database, returns votes accepted
+
+        When the batch fails, its votes are written one by one, so a vote
+        that cannot be written, such as one for a review deleted meanwhile,
+        does not hold back the others. Votes failing on their own are kept
+        for the next flush and dropped after HELPFUL_VOTE_MAX_ATTEMPTS.
+        """
+        with self._lock:
+            votes, self._pending = self._pending, {}
+        if not votes:
+            return 0
+
+        try:
+            return self._write(db, votes)
+        except Exception as e:
+            db.rollback()
+            logger.warning(
+                f"Flushing {len(votes)} helpful votes failed, "
+                f"writing them one by one: {e}"
+            )
+
+        accepted = 0
+        failed: Dict[Vote, int] = {}
+        for vote, attempts in sorted(votes.items()):
+            try:
+                accepted += self._write(db, [vote])
+            except Exception as e:
+                db.rollback()
+                if attempts + 1 >= HELPFUL_VOTE_MAX_ATTEMPTS:
+                    logger.error(f"Dropping helpful vote {vote}: {e}")
+                else:
+                    failed[vote] = attempts + 1
+        if failed:
+            # Keep the votes for the next flush
+            with self._lock:
+                self._pending.update(failed)
+        return accepted
+
+
+helpful_votes = HelpfulVoteBuffer()
+
+
+def flush_helpful_votes() -> None:
+    """Flush the process-wide helpful vote buffer"""
+    with SessionLocal() as db:
+        accepted = helpful_votes.flush(db)
+    if accepted:
+        logger.debug(f"Flushed {accepted} helpful votes")
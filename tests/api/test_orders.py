@@ -0,0 +1,140 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.api import deps
+from app.models.order import Order, OrderStatus, PaymentMethod, PaymentStatus
+from app.models.product import Product
+from app.utils.inventory import reserve_stock
+from app.utils.order_lifecycle import apply_order_changes, order_state
+
+
+@pytest.fixture
+def client(db, user):
+    from app.main import app
+
+    app.dependency_overrides[deps.get_current_active_user] = lambda: user
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def test_customer_can_cancel_pending_order(client, db, make_order):
+    order = make_order()
+
+    response = client.patch(f"/orders/{order.id}", json={"status": "Cancelled"})
+
+    assert response.status_code == 200
+    assert response.json()["status"] == "Cancelled"
+
+
+@pytest.mark.parametrize("status", ["Paid", "Shipped", "Delivered"])
+def test_customer_cannot_advance_order_status(client, db, make_order, status):
+    order = make_order()
+
+    response = client.patch(f"/orders/{order.id}", json={"status": status})
+
+    assert response.status_code == 400
+    db.expire_all()
+    assert db.get(Order, order.id).status == OrderStatus.PENDING
+
+
+def test_customer_cannot_change_payment_status(client, db, make_order):
+    order = make_order()
+
+    client.patch(f"/orders/{order.id}", json={"payment_status": "Paid"})
+
+    db.expire_all()
+    assert db.get(Order, order.id).payment_status == PaymentStatus.PENDING
+
+
+def test_customer_cannot_change_shipping_quote(client, db, make_order, address):
+    order = make_order(shipping_fee=5)
+
+    client.patch(
+        f"/orders/{order.id}",
+        json={"shipping_fee": 0, "shipping_address_id": address.id + 1},
+    )
+
+    db.expire_all()
+    order = db.get(Order, order.id)
+    assert order.shipping_fee == 5
+    assert order.shipping_address_id == address.id
+
+
+def test_customer_cannot_restore_or_change_payment_method(client, db, make_order):
+    order = make_order(is_active=False)
+
+    client.patch(
+        f"/orders/{order.id}",
+        json={"is_active": True, "payment_method": "Bank Transfer"},
+    )
+
+    db.expire_all()
+    order = db.get(Order, order.id)
+    assert order.is_active is False
+    assert order.payment_method == PaymentMethod.CREDIT_CARD
+
+
+def test_billing_address_must_belong_to_the_customer(client, db, make_order, address):
+    from app.models.user import Address, User
+
+    other = User(email="other@example.com", username="other", hashed_password="x")
+    db.add(other)
+    db.flush()
+    foreign = Address(
+        user_id=other.id,
+        address_line_1="2 Side St",
+        state_id=address.state_id,
+        country_id=address.country_id,
+    )
+    db.add(foreign)
+    db.commit()
+    order = make_order()
+
+    response = client.patch(
+        f"/orders/{order.id}", json={"billing_address_id": foreign.id}
+    )
+
+    assert response.status_code == 404
+    db.expire_all()
+    assert db.get(Order, order.id).billing_address_id == address.id
+
+
+def test_deleting_pending_order_cancels_it_and_releases_stock(
+    client, db, make_order, make_product
+):
+    product = make_product(stock=5)
+    order = make_order()
+    reserve_stock(db, order.id, [(product.id, None, 2)])
+    db.commit()
+
+    response = client.delete(f"/orders/{order.id}")
+
+    assert response.status_code == 204
+    db.expire_all()
+    order = db.get(Order, order.id)
+    assert (order.status, order.is_active) == (OrderStatus.CANCELLED, False)
+    assert db.get(Product, product.id).stock == 5
+
+
+@pytest.mark.parametrize("status", [OrderStatus.SHIPPED, OrderStatus.DELIVERED])
+def test_customer_cannot_delete_shipped_orders(client, db, make_order, status):
+    order = make_order(status=status, payment_status=PaymentStatus.PAID)
+
+    response = client.delete(f"/orders/{order.id}")
+
+    assert response.status_code == 400
+    db.expire_all()
+    assert db.get(Order, order.id).is_active is True
+
+
+def test_deleting_delivered_order_keeps_its_stock_out(db, make_order, make_product):
+    product = make_product(stock=5)
+    order = make_order(status=OrderStatus.DELIVERED, payment_status=PaymentStatus.PAID)
+    reserve_stock(db, order.id, [(product.id, None, 2)])
+    db.commit()
+    before = order_state(order)
+
+    apply_order_changes(db, [(before, before._replace(is_active=False))])
+    db.commit()
+
+    db.expire_all()
+    assert db.get(Product, product.id).stock == 3
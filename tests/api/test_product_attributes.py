@@ -0,0 +1,48 @@
+import pytest
+from fastapi.testclient import TestClient
+from app.api import deps
+from app.models.product import (
+    ProductAttribute,
+    ProductVariant,
+    ProductVariantAttribute,
+)
+
+
+@pytest.fixture
+def client(db, user):
+    from app.main import app
+
+    app.dependency_overrides[deps.get_current_active_superuser] = lambda: user
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+
+
+def test_bulk_variants_skip_combinations_of_inactive_variants(client, db, make_product):
+    # Neither the product nor the variant are in the variant index
+    product = make_product()
+    product.is_active = False
+    red, blue = (
+        ProductAttribute(product_id=product.id, name="color", value=value)
+        for value in ("red", "blue")
+    )
+    variant = ProductVariant(
+        product_id=product.id,
+        name="Red",
+        sku="VARIANT-RED",
+        price=product.price,
+        is_active=False,
+    )
+    db.add_all([red, blue, variant])
+    db.flush()
+    db.add(ProductVariantAttribute(variant_id=variant.id, attribute_id=red.id))
+    db.commit()
+
+    response = client.post(
+        "/admin/product-attributes/variants/bulk",
+        json={"product_id": product.id, "attribute_groups": [[red.id, blue.id]]},
+    )
+
+    assert response.status_code == 201
+    assert response.json()["skipped"] == [[red.id]]
+    assert [v["sku"] for v in response.json()["created"]] == [f"{product.sku}-BLUE"]
+    assert db.query(ProductVariant).count() == 2
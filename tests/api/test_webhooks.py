@@ -0,0 +1,172 @@
+import hashlib
+import hmac
+import json
+import time
+from decimal import Decimal
+import paypalrestsdk
+import pytest
+from fastapi.testclient import TestClient
+from app.core.settings import settings
+from app.models.order import Order, OrderStatus, PaymentStatus
+from app.models.payment import PaymentEvent, PaymentEventStatus
+from app.utils import payments
+from app.utils.payments import process_payment_events
+
+
+@pytest.fixture
+def client(db):
+    from app.main import app
+
+    return TestClient(app)
+
+
+def stripe_event(order_id: int, amount: int = 1000, currency: str = "usd") -> dict:
+    return {
+        "id": f"evt_{order_id}_{amount}_{currency}",
+        "type": "payment_intent.succeeded",
+        "data": {
+            "object": {
+                "amount": amount,
+                "amount_received": amount,
+                "currency": currency,
+                "metadata": {"order_id": str(order_id)},
+            }
+        },
+    }
+
+
+def post_stripe(client, event: dict, secret: str = settings.STRIPE_WEBHOOK_SECRET):
+    """Sign the event the way Stripe does and deliver it"""
+    body = json.dumps(event)
+    timestamp = int(time.time())
+    signature = hmac.new(
+        secret.encode(), f"{timestamp}.{body}".encode(), hashlib.sha256
+    ).hexdigest()
+    return client.post(
+        "/webhooks/stripe",
+        content=body,
+        headers={"Stripe-Signature": f"t={timestamp},v1={signature}"},
+    )
+
+
+def event_status(db, event_id: str) -> PaymentEventStatus:
+    db.expire_all()
+    return db.query(PaymentEvent).filter_by(event_id=event_id).one().status
+
+
+def test_signed_stripe_payment_marks_order_paid(client, db, make_order):
+    order = make_order(total_amount=Decimal("10.00"))
+    event = stripe_event(order.id)
+
+    first = post_stripe(client, event)
+    redelivery = post_stripe(client, event)
+
+    assert first.json() == {"received": True, "duplicate": False}
+    assert redelivery.json() == {"received": True, "duplicate": True}
+    assert process_payment_events(db) == 1
+    assert db.get(Order, order.id).payment_status == PaymentStatus.PAID
+
+
+def test_stripe_webhook_with_wrong_signature_is_rejected(client, db, make_order):
+    order = make_order()
+
+    response = post_stripe(client, stripe_event(order.id), secret="whsec_other")
+
+    assert response.status_code == 400
+    assert db.query(PaymentEvent).count() == 0
+
+
+@pytest.mark.parametrize("amount, currency", [(500, "usd"), (1000, "eur")])
+def test_payment_not_matching_order_total_is_failed(
+    client, db, make_order, amount, currency
+):
+    order = make_order(total_amount=Decimal("10.00"))
+    event = stripe_event(order.id, amount, currency)
+    post_stripe(client, event)
+
+    process_payment_events(db)
+
+    assert event_status(db, event["id"]) == PaymentEventStatus.FAILED
+    assert db.get(Order, order.id).payment_status == PaymentStatus.PENDING
+
+
+def test_paypal_capture_is_verified_with_paypal(client, db, make_order, monkeypatch):
+    verified = []
+    monkeypatch.setattr(
+        paypalrestsdk.WebhookEvent,
+        "verify",
+        lambda *args: verified.append(args) or True,
+    )
+    order = make_order(total_amount=Decimal("25.50"))
+    event = {
+        "id": "WH-1",
+        "event_type": "PAYMENT.CAPTURE.COMPLETED",
+        "resource": {
+            "custom_id": str(order.id),
+            "amount": {"value": "25.50", "currency_code": "USD"},
+        },
+    }
+
+    response = client.post(
+        "/webhooks/paypal",
+        content=json.dumps(event),
+        headers={
+            "paypal-transmission-id": "1",
+            "paypal-transmission-time": "2026-01-01T00:00:00Z",
+            "paypal-transmission-sig": "sig",
+            "paypal-cert-url": "https://api.paypal.com/cert.pem",
+            "paypal-auth-algo": "SHA256withRSA",
+        },
+    )
+    process_payment_events(db)
+
+    assert response.status_code == 200
+    assert verified[0][2] == settings.PAYPAL_WEBHOOK_ID
+    assert db.get(Order, order.id).payment_status == PaymentStatus.PAID
+
+
+def test_failing_event_does_not_hold_back_its_batch(
+    client, db, make_order, monkeypatch
+):
+    orders = [make_order() for _ in range(3)]
+    poison = orders[1].id
+    transition_orders = payments.transition_orders
+
+    def failing_transition(db, order_ids, **values):
+        if poison in order_ids:
+            raise RuntimeError("poison")
+        return transition_orders(db, order_ids, **values)
+
+    monkeypatch.setattr(payments, "transition_orders", failing_transition)
+    for order in orders:
+        post_stripe(client, stripe_event(order.id))
+
+    assert process_payment_events(db) == 2
+
+    db.expire_all()
+    attempts = {
+        event.order_id: (event.status, event.attempts)
+        for event in db.query(PaymentEvent)
+    }
+    assert attempts[poison] == (PaymentEventStatus.PENDING, 1)
+    for order in orders:
+        if order.id != poison:
+            assert attempts[order.id] == (PaymentEventStatus.PROCESSED, 0)
+
+
+@pytest.mark.parametrize(
+    "values", [{"status": OrderStatus.CANCELLED}, {"is_active": False}]
+)
+def test_payment_for_cancelled_order_is_failed_for_refund(
+    client, db, make_order, values
+):
+    order = make_order(total_amount=Decimal("10.00"), **values)
+    event = stripe_event(order.id)
+    post_stripe(client, event)
+
+    process_payment_events(db)
+
+    assert event_status(db, event["id"]) == PaymentEventStatus.FAILED
+    stored = db.query(PaymentEvent).filter_by(event_id=event["id"]).one()
+    assert "refund" in stored.error
+    assert db.get(Order, order.id).payment_status == PaymentStatus.PENDING
@@ -0,0 +1,115 @@
+"""Throughput of pooled SMTP connections against a connection per email
+
+Sends to a local aiosmtpd server that delays its EHLO reply to stand in
+for the TCP, TLS and login round trips of a real mail server. Needs no
+database:
+
+    python -m tests.benchmarks.email_queue --emails 500 --pool-size 8
+"""
+
+import argparse
+import asyncio
+import socket
+import time
+from email.message import EmailMessage
+import aiosmtplib
+from aiosmtpd.controller import Controller
+from app.core.settings import settings
+from app.utils.email_queue import EMAIL_SMTP_TIMEOUT, SMTPPool
+
+
+class SlowHandshakeHandler:
+    def __init__(self, handshake_delay: float):
+        self.handshake_delay = handshake_delay
+        self.received = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        await asyncio.sleep(self.handshake_delay)
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received += 1
+        return "250 Message accepted"
+
+
+def message(number: int) -> EmailMessage:
+    email = EmailMessage()
+    email["From"] = "shop@example.com"
+    email["To"] = f"user{number}@example.com"
+    email["Subject"] = "Benchmark"
+    email.set_content("<p>Hello</p>", subtype="html")
+    return email
+
+
+async def send_per_email(messages, concurrency: int) -> float:
+    """Connect, send and quit for every email, as before the queue"""
+    limit = asyncio.Semaphore(concurrency)
+
+    async def send(email: EmailMessage) -> None:
+        async with limit:
+            await aiosmtplib.send(
+                email,
+                hostname=settings.MAIL_SERVER,
+                port=settings.MAIL_PORT,
+                start_tls=False,
+                timeout=EMAIL_SMTP_TIMEOUT,
+            )
+
+    started = time.perf_counter()
+    await asyncio.gather(*(send(email) for email in messages))
+    return time.perf_counter() - started
+
+
+async def send_pooled(messages, pool_size: int) -> float:
+    pool = SMTPPool(size=pool_size)
+    started = time.perf_counter()
+    try:
+        await asyncio.gather(*(pool.send(email) for email in messages))
+    finally:
+        await pool.close()
+    return time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--emails", type=int, default=500)
+    parser.add_argument("--pool-size", type=int, default=8)
+    parser.add_argument(
+        "--handshake-delay",
+        type=float,
+        default=0.05,
+        help="seconds the server takes to answer EHLO",
+    )
+    args = parser.parse_args()
+
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    handler = SlowHandshakeHandler(args.handshake_delay)
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    settings.MAIL_SERVER = "127.0.0.1"
+    settings.MAIL_PORT = port
+    settings.MAIL_STARTTLS = False
+    settings.MAIL_SSL_TLS = False
+    settings.MAIL_USE_CREDENTIALS = False
+
+    messages = [message(number) for number in range(args.emails)]
+    try:
+        for name, run in (
+            ("connection per email", send_per_email(messages, args.pool_size)),
+            ("pooled", send_pooled(messages, args.pool_size)),
+        ):
+            before = handler.received
+            elapsed = asyncio.run(run)
+            print(
+                f"{name:>20}: {args.emails / elapsed:8.0f} emails/s "
+                f"({elapsed:.2f}s, received={handler.received - before})"
+            )
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    main()
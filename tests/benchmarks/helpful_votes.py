@@ -0,0 +1,178 @@
+"""Throughput of buffered helpful votes against one UPDATE per click
+
+Every click votes on the same review, the worst case for row locks.
+Run against a scratch database, it creates and deletes its own rows:
+
+    python -m tests.benchmarks.helpful_votes --clicks 2000 --threads 8
+"""
+
+import argparse
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+import app.main  # noqa: F401, creates the tables
+from app.db.database import SessionLocal
+from app.models.brand import Brand
+from app.models.category import Category
+from app.models.product import Product, ProductReview, ReviewHelpfulVote
+from app.models.user import User
+from app.utils.vote_buffer import HelpfulVoteBuffer
+
+
+def create_fixture(clicks: int):
+    """One product with two reviews and a user per click"""
+    tag = uuid.uuid4().hex[:8]
+    with SessionLocal() as db:
+        category = Category(name=f"bench-{tag}", slug=f"bench-{tag}")
+        brand = Brand(name=f"bench-{tag}", slug=f"bench-{tag}")
+        db.add_all([category, brand])
+        db.flush()
+        product = Product(
+            name=f"bench-{tag}",
+            slug=f"bench-{tag}",
+            sku=f"BENCH-{tag}",
+            price=1,
+            stock=0,
+            category_id=category.id,
+            brand_id=brand.id,
+        )
+        db.add(product)
+        db.flush()
+        user_ids = (
+            db.execute(
+                insert(User).returning(User.id),
+                [
+                    {
+                        "email": f"bench-{tag}-{i}@example.com",
+                        "username": f"bench-{tag}-{i}",
+                        "hashed_password": "x",
+                        "is_active": True,
+                    }
+                    for i in range(clicks)
+                ],
+            )
+            .scalars()
+            .all()
+        )
+        reviews = [
+            ProductReview(product_id=product.id, user_id=user_ids[0], rating=5)
+            for _ in range(2)
+        ]
+        db.add_all(reviews)
+        db.commit()
+        return (
+            (category.id, brand.id, product.id),
+            user_ids,
+            [review.id for review in reviews],
+        )
+
+
+def drop_fixture(ids, user_ids, review_ids) -> None:
+    category_id, brand_id, product_id = ids
+    with SessionLocal() as db:
+        db.execute(
+            delete(ReviewHelpfulVote).where(ReviewHelpfulVote.review_id.in_(review_ids))
+        )
+        db.execute(delete(ProductReview).where(ProductReview.id.in_(review_ids)))
+        db.execute(delete(Product).where(Product.id == product_id))
+        db.execute(delete(User).where(User.id.in_(user_ids)))
+        db.execute(delete(Brand).where(Brand.id == brand_id))
+        db.execute(delete(Category).where(Category.id == category_id))
+        db.commit()
+
+
+def vote_per_click(review_id: int, user_id: int) -> None:
+    """One transaction per click, locking the review row every time"""
+    with SessionLocal() as db:
+        inserted = db.execute(
+            pg_insert(ReviewHelpfulVote)
+            .values(review_id=review_id, user_id=user_id)
+            .on_conflict_do_nothing()
+            .returning(ReviewHelpfulVote.review_id)
+        ).first()
+        if inserted:
+            db.execute(
+                update(ProductReview)
+                .where(ProductReview.id == review_id)
+                .values(helpful_votes=func.coalesce(ProductReview.helpful_votes, 0) + 1)
+            )
+        db.commit()
+
+
+def run_per_click(review_id: int, user_ids, threads: int) -> float:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(lambda user_id: vote_per_click(review_id, user_id), user_ids))
+    return time.perf_counter() - started
+
+
+def run_buffered(
+    review_id: int, user_ids, threads: int, flush_interval: float
+) -> float:
+    """Clicks go to the buffer, a flusher thread writes it periodically"""
+    buffer = HelpfulVoteBuffer()
+    done = threading.Event()
+
+    def flusher():
+        while not done.wait(flush_interval):
+            with SessionLocal() as db:
+                buffer.flush(db)
+
+    started = time.perf_counter()
+    thread = threading.Thread(target=flusher)
+    thread.start()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(lambda user_id: buffer.add(review_id, user_id), user_ids))
+    done.set()
+    thread.join()
+    with SessionLocal() as db:
+        buffer.flush(db)
+    return time.perf_counter() - started
+
+
+def helpful_votes(review_id: int) -> int:
+    with SessionLocal() as db:
+        return db.execute(
+            select(ProductReview.helpful_votes).where(ProductReview.id == review_id)
+        ).scalar()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clicks", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument(
+        "--flush-interval", type=float, default=0.2, help="seconds between flushes"
+    )
+    args = parser.parse_args()
+
+    ids, user_ids, (per_click_review, buffered_review) = create_fixture(args.clicks)
+    try:
+        results = [
+            (
+                "row per click",
+                per_click_review,
+                run_per_click(per_click_review, user_ids, args.threads),
+            ),
+            (
+                "buffered",
+                buffered_review,
+                run_buffered(
+                    buffered_review, user_ids, args.threads, args.flush_interval
+                ),
+            ),
+        ]
+        for name, review_id, elapsed in results:
+            print(
+                f"{name:>14}: {args.clicks / elapsed:10.0f} clicks/s "
+                f"({elapsed:.2f}s, helpful_votes={helpful_votes(review_id)})"
+            )
+    finally:
+        drop_fixture(ids, user_ids, [per_click_review, buffered_review])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import os
+from decimal import Decimal
+import pytest
+from sqlalchemy import text
+
+# Tests run against a scratch PostgreSQL database whose tables are dropped
+# and recreated, never point TEST_DATABASE_URL at real data. Without it
+# the database tests are skipped.
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+os.environ["DATABASE_URL"] = TEST_DATABASE_URL or "postgresql+psycopg2:///unset"
+
+for name, value in {
+    "SECRET_KEY": "test",
+    "MAIL_USERNAME": "test",
+    "MAIL_PASSWORD": "test",
+    "MAIL_FROM": "shop@example.com",
+    "MAIL_SERVER": "localhost",
+    "MAIL_FROM_NAME": "Shop",
+    "STRIPE_SECRET_KEY": "sk_test",
+    "STRIPE_PUBLISHABLE_KEY": "pk_test",
+    "STRIPE_WEBHOOK_SECRET": "whsec_test",
+    "PAYPAL_CLIENT_ID": "test",
+    "PAYPAL_CLIENT_SECRET": "test",
+    "PAYPAL_WEBHOOK_ID": "WH-TEST",
+    "API_URL": "http://testserver",
+    "WORKER_ID": "1",
+    "EMAIL_WORKER_IN_API": "false",
+    "OUTBOX_DISPATCH_IN_API": "false",
+}.items():
+    os.environ.setdefault(name, value)
+
+
+@pytest.fixture(scope="session")
+def engine():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL is not set")
+    from app.db.database import Base, engine
+
+    # Importing the app registers every model
+    import app.main  # noqa: F401
+
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    return engine
+
+
+@pytest.fixture
+def db(engine):
+    from app.db.database import Base, SessionLocal
+    from app.utils.rates import rate_cache
+
+    session = SessionLocal()
+    yield session
+    session.close()
+
+    tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+    with engine.begin() as conn:
+        conn.execute(text(f"TRUNCATE {tables} RESTART IDENTITY CASCADE"))
+    rate_cache.invalidate()
+
+
+@pytest.fixture
+def user(db):
+    from app.models.user import User
+
+    user = User(
+        email="customer@example.com",
+        username="customer",
+        hashed_password="x",
+        is_active=True,
+    )
+    db.add(user)
+    db.commit()
+    return user
+
+
+@pytest.fixture
+def make_product(db):
+    """Create an active product, with its category and brand"""
+    from app.models.brand import Brand
+    from app.models.category import Category
+    from app.models.product import Product
+
+    category = Category(name="Category", slug="category")
+    brand = Brand(name="Brand", slug="brand")
+    db.add_all([category, brand])
+    db.commit()
+
+    def make_product(stock: int = 10, price: Decimal = Decimal("10.00")):
+        number = db.query(Product).count() + 1
+        product = Product(
+            name=f"Product {number}",
+            slug=f"product-{number}",
+            sku=f"SKU-{number}",
+            price=price,
+            stock=stock,
+            category_id=category.id,
+            brand_id=brand.id,
+        )
+        db.add(product)
+        db.commit()
+        return product
+
+    return make_product
+
+
+@pytest.fixture
+def address(db, user):
+    from app.models.user import Address, Country, State
+
+    country = Country(name="United States", code="USA")
+    db.add(country)
+    db.flush()
+    state = State(name="California", code="CA", country_id=country.id)
+    db.add(state)
+    db.flush()
+    address = Address(
+        user_id=user.id,
+        address_line_1="1 Main St",
+        state_id=state.id,
+        country_id=country.id,
+    )
+    db.add(address)
+    db.commit()
+    return address
+
+
+@pytest.fixture
+def make_order(db, user, address):
+    """Create an order row without items"""
+    from app.models.order import Order, OrderStatus, PaymentMethod, PaymentStatus
+
+    def make_order(
+        total_amount: Decimal = Decimal("10.00"),
+        payment_method: PaymentMethod = PaymentMethod.CREDIT_CARD,
+        **values,
+    ):
+        number = db.query(Order).count() + 1
+        values = {
+            "status": OrderStatus.PENDING,
+            "payment_status": PaymentStatus.PENDING,
+            "shipping_address_id": address.id,
+            "billing_address_id": address.id,
+            "is_active": True,
+            **values,
+        }
+        order = Order(
+            user_id=user.id,
+            order_number=f"TEST-{number}",
+            total_amount=total_amount,
+            payment_method=payment_method,
+            **values,
+        )
+        db.add(order)
+        db.commit()
+        return order
+
+    return make_order
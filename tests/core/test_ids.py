@@ -0,0 +1,16 @@
+from app.core.ids import MAX_WORKER_ID, SnowflakeGenerator, default_worker_id
+
+
+def test_missing_worker_id_is_derived_instead_of_failing():
+    for environment in ("production", "development"):
+        derived = default_worker_id(None, environment)
+        assert 0 <= derived <= MAX_WORKER_ID
+        assert default_worker_id(None, environment) == derived
+    assert default_worker_id(7, "production") == 7
+
+
+def test_ids_of_different_workers_do_not_collide():
+    first, second = SnowflakeGenerator(1), SnowflakeGenerator(2)
+    ids = [generator.next_id() for _ in range(5000) for generator in (first, second)]
+
+    assert len(set(ids)) == len(ids)
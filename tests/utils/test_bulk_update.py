@@ -0,0 +1,35 @@
+from datetime import datetime
+from decimal import Decimal
+from app.models.product import Product
+from app.utils.bulk_update import update_by_sku
+
+FIELDS = ("price", "discount_price", "stock")
+
+
+def test_discount_price_is_checked_against_the_stored_price(db, make_product):
+    discounted, priced, valid = (make_product(price=Decimal("10.00")) for _ in range(3))
+    discounted.discount_price = Decimal("8.00")
+    db.commit()
+
+    updated, unknown, rejected = update_by_sku(
+        db,
+        Product,
+        [
+            # Below the stored discount price
+            {"sku": discounted.sku, "price": Decimal("5.00")},
+            # Above the stored price
+            {"sku": priced.sku, "discount_price": Decimal("12.00")},
+            {"sku": valid.sku, "discount_price": Decimal("9.00"), "stock": 3},
+            {"sku": "MISSING", "stock": 1},
+        ],
+        FIELDS,
+        datetime.utcnow(),
+    )
+    db.commit()
+
+    assert [row.sku for row in updated] == [valid.sku]
+    assert unknown == ["MISSING"]
+    assert rejected == [discounted.sku, priced.sku]
+    db.expire_all()
+    assert (valid.discount_price, valid.stock) == (Decimal("9.00"), 3)
+    assert discounted.price == Decimal("10.00")
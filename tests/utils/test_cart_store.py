@@ -0,0 +1,65 @@
+import os
+import uuid
+import pytest
+from app.utils.cart_store import MemoryCartStore
+
+# Tests of the Redis store run against this server, for example
+# redis://localhost:6379/15, and are skipped without it. Keys are created
+# under a random prefix and deleted afterwards.
+TEST_REDIS_URL = os.environ.get("TEST_REDIS_URL")
+
+
+@pytest.fixture(params=["memory", "redis"])
+def store(request, monkeypatch):
+    if request.param == "memory":
+        yield MemoryCartStore(3600)
+        return
+
+    if not TEST_REDIS_URL:
+        pytest.skip("TEST_REDIS_URL is not set")
+    from app.utils.cart_store.redis_store import RedisCartStore
+
+    prefix = f"test-cart-{uuid.uuid4().hex}:"
+    monkeypatch.setenv("REDIS_URL", TEST_REDIS_URL)
+    monkeypatch.setenv("REDIS_KEY_PREFIX", prefix)
+    store = RedisCartStore()
+    yield store
+    keys = list(store.client.scan_iter(f"{prefix}*"))
+    if keys:
+        store.client.delete(*keys)
+
+
+def test_add_quantity_is_capped(store):
+    assert store.add_quantity("user:1", "1", 60, 99) == 60
+    assert store.add_quantity("user:1", "1", 60, 99) == 99
+    assert store.get_lines("user:1") == {"1": 99}
+
+
+def test_load_lines_keeps_a_cart_already_in_the_store(store):
+    store.load_lines("user:1", {"1": 2, "2:5": 1})
+    store.load_lines("user:1", {"3": 4})
+
+    assert store.get_lines("user:1") == {"1": 2, "2:5": 1}
+
+
+def test_empty_carts_stay_in_the_store(store):
+    assert store.get_lines("user:1") is None
+    store.load_lines("user:1", {})
+    store.add_quantity("user:2", "1", 1, 99)
+    store.set_quantity("user:2", "1", 0)
+    store.add_quantity("user:3", "1", 1, 99)
+    store.clear("user:3")
+
+    # An empty cart is known, a miss would reload the saved cart
+    assert [store.get_lines(f"user:{n}") for n in (1, 2, 3)] == [{}, {}, {}]
+    store.delete("user:3")
+    assert store.get_lines("user:3") is None
+
+
+def test_dirty_carts_are_popped_once(store):
+    store.mark_dirty(["user:1", "user:2"])
+    store.mark_dirty(["user:1"])
+
+    popped = store.pop_dirty(10)
+    assert sorted(popped) == ["user:1", "user:2"]
+    assert store.pop_dirty(10) == []
@@ -0,0 +1,96 @@
+import pytest
+from app.models.product import ProductVariant
+from app.models.user import Cart, CartItem
+from app.utils import carts
+from app.utils.cart_store import MemoryCartStore, line_key
+from app.utils.carts import (
+    MAX_CART_LINE_QUANTITY,
+    add_to_cart,
+    cart_lines,
+    guest_cart_key,
+    merge_carts,
+    save_carts,
+    user_cart_key,
+)
+from app.utils.pricing import PriceResolver
+
+
+@pytest.fixture
+def store():
+    return MemoryCartStore(3600)
+
+
+def saved_items(db):
+    return sorted(
+        (item.product_sku, item.quantity)
+        for item in db.query(CartItem).join(Cart, Cart.id == CartItem.cart_id)
+    )
+
+
+def test_save_carts_writes_changed_user_carts(db, store, user, make_product):
+    product = make_product()
+    add_to_cart(
+        db, store, PriceResolver(db), user_cart_key(user.id), product.id, None, 2
+    )
+    # Guest carts are not persisted
+    add_to_cart(db, store, PriceResolver(db), guest_cart_key("t"), product.id, None, 1)
+
+    assert save_carts(db, store) == 1
+    assert saved_items(db) == [(product.sku, 2)]
+    assert save_carts(db, store) == 0
+
+
+def test_failed_save_marks_carts_dirty_again(
+    db, store, user, make_product, monkeypatch
+):
+    product = make_product()
+    cart_key = user_cart_key(user.id)
+    add_to_cart(db, store, PriceResolver(db), cart_key, product.id, None, 2)
+
+    def failing(resolver, lines):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(carts, "price_cart", failing)
+    with pytest.raises(RuntimeError):
+        save_carts(db, store)
+    monkeypatch.undo()
+
+    assert saved_items(db) == []
+    assert save_carts(db, store) == 1
+    assert saved_items(db) == [(product.sku, 2)]
+
+
+def test_merge_carts_adds_guest_lines_to_the_saved_cart(db, store, user, make_product):
+    first, second = make_product(), make_product()
+    user_key, guest_key = user_cart_key(user.id), guest_cart_key("t")
+    add_to_cart(db, store, PriceResolver(db), user_key, first.id, None, 90)
+    save_carts(db, store)
+
+    # A new process has nothing in its store, the user cart comes from the db
+    store = MemoryCartStore(3600)
+    add_to_cart(db, store, PriceResolver(db), guest_key, first.id, None, 20)
+    add_to_cart(db, store, PriceResolver(db), guest_key, second.id, None, 1)
+
+    assert merge_carts(db, store, guest_key, user_key) == 2
+    assert store.get_lines(guest_key) is None
+    assert store.get_lines(user_key) == {
+        line_key(first.id): MAX_CART_LINE_QUANTITY,
+        line_key(second.id): 1,
+    }
+    assert store.pop_dirty(10) == [user_key]
+
+
+def test_saved_variant_lines_are_found_again_by_sku(db, store, user, make_product):
+    product = make_product()
+    variant = ProductVariant(
+        product_id=product.id, name="Red", sku="VARIANT-RED", price=product.price
+    )
+    db.add(variant)
+    db.commit()
+    cart_key = user_cart_key(user.id)
+    add_to_cart(db, store, PriceResolver(db), cart_key, product.id, variant.id, 3)
+    save_carts(db, store)
+
+    assert cart_lines(db, MemoryCartStore(3600), cart_key) == {
+        line_key(product.id, variant.id): 3
+    }
@@ -0,0 +1,108 @@
+import asyncio
+import socket
+from datetime import datetime, timedelta
+import pytest
+from aiosmtpd.controller import Controller
+from app.core.settings import settings
+from app.models.email import QueuedEmail
+from app.utils.email_queue import (
+    EMAIL_BACKOFF_BASE,
+    EMAIL_BACKOFF_MAX,
+    SMTPPool,
+    enqueue_email,
+    process_email_queue,
+    retry_delay,
+)
+
+
+class RecordingHandler:
+    """Accepts mail, refusing recipients named bad@ (550) and busy@ (451)"""
+
+    def __init__(self):
+        self.received = []
+        self.sessions = set()
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("bad@"):
+            return "550 No such user"
+        if address.startswith("busy@"):
+            return "451 Mailbox busy, try again later"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        self.sessions.add(id(session))
+        self.received.extend(envelope.rcpt_tos)
+        return "250 Message accepted"
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    """Local SMTP server the email settings point at"""
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    for name, value in {
+        "MAIL_SERVER": "127.0.0.1",
+        "MAIL_PORT": port,
+        "MAIL_STARTTLS": False,
+        "MAIL_SSL_TLS": False,
+        "MAIL_USE_CREDENTIALS": False,
+    }.items():
+        monkeypatch.setattr(settings, name, value)
+    yield handler
+    controller.stop()
+
+
+def queue_emails(db, *recipients: str) -> None:
+    for email_to in recipients:
+        enqueue_email(
+            db, email_to, "Code", "verification_code", {"verification_code": "1"}
+        )
+    db.commit()
+
+
+def drain(pool_size: int = 2, batch_size: int = 10) -> int:
+    async def run() -> int:
+        pool = SMTPPool(size=pool_size)
+        try:
+            return await process_email_queue(pool, batch_size)
+        finally:
+            await pool.close()
+
+    return asyncio.run(run())
+
+
+def test_emails_reuse_pooled_connections(db, smtp_server):
+    recipients = [f"user{i}@example.com" for i in range(25)]
+    queue_emails(db, *recipients)
+
+    assert drain(pool_size=2, batch_size=10) == 25
+
+    assert sorted(smtp_server.received) == sorted(recipients)
+    assert len(smtp_server.sessions) <= 2
+    assert db.query(QueuedEmail).count() == 0
+
+
+def test_permanent_refusal_is_given_up_and_temporary_one_retried(db, smtp_server):
+    queue_emails(db, "bad@example.com", "busy@example.com", "ok@example.com")
+    started = datetime.utcnow()
+
+    drain()
+
+    assert smtp_server.received == ["ok@example.com"]
+    emails = {email.email_to: email for email in db.query(QueuedEmail)}
+    bad, busy = emails["bad@example.com"], emails["busy@example.com"]
+    assert bad.failed_at is not None
+    assert busy.failed_at is None
+    assert busy.attempts == 1
+    assert busy.available_at >= started + timedelta(seconds=retry_delay(1))
+
+
+def test_retry_delay_doubles_up_to_the_maximum():
+    assert retry_delay(1) == EMAIL_BACKOFF_BASE
+    assert retry_delay(2) == EMAIL_BACKOFF_BASE * 2
+    assert retry_delay(50) == EMAIL_BACKOFF_MAX
@@ -0,0 +1,64 @@
+from app.core.events import ORDER_STATUS_CHANGED, USER_REGISTERED, USER_UPDATED
+from app.models.email import QueuedEmail
+from app.models.order import OrderStatus, PaymentStatus
+from app.utils.outbox import dispatch_outbox, enqueue_event
+
+
+def queued(db):
+    return [(email.template_name, email.subject) for email in db.query(QueuedEmail)]
+
+
+def status_changed(order, to_status, to_payment_status=PaymentStatus.PENDING):
+    return {
+        "order_id": order.id,
+        "from_status": order.status.value,
+        "to_status": to_status.value,
+        "from_payment_status": order.payment_status.value,
+        "to_payment_status": to_payment_status.value,
+    }
+
+
+def test_order_status_changes_email_the_customer(db, make_order):
+    shipped, paid, unchanged = make_order(), make_order(), make_order()
+    enqueue_event(
+        db, ORDER_STATUS_CHANGED, status_changed(shipped, OrderStatus.SHIPPED)
+    )
+    enqueue_event(
+        db,
+        ORDER_STATUS_CHANGED,
+        status_changed(paid, OrderStatus.PENDING, PaymentStatus.PAID),
+    )
+    enqueue_event(
+        db,
+        ORDER_STATUS_CHANGED,
+        status_changed(unchanged, OrderStatus.PENDING, PaymentStatus.FAILED),
+    )
+    db.commit()
+
+    assert dispatch_outbox(db) == 3
+    assert queued(db) == [
+        ("order_status", "Your order has shipped"),
+        ("order_status", "Payment received for your order"),
+    ]
+
+
+def test_registered_user_gets_the_verification_email(db, user):
+    user.verification_code = "123456"
+    db.commit()
+    enqueue_event(db, USER_REGISTERED, {"user_id": user.id})
+    db.commit()
+
+    dispatch_outbox(db)
+
+    email = db.query(QueuedEmail).one()
+    assert (email.email_to, email.template_name) == (user.email, "verify_email")
+    assert email.data["verification_url"].endswith("code=123456")
+
+
+def test_password_change_notifies_the_user(db, user):
+    enqueue_event(db, USER_UPDATED, {"user_id": user.id, "fields": ["username"]})
+    enqueue_event(db, USER_UPDATED, {"user_id": user.id, "fields": ["password"]})
+    db.commit()
+
+    assert dispatch_outbox(db) == 2
+    assert queued(db) == [("password_changed", "Your password was changed")]
@@ -0,0 +1,76 @@
+import hashlib
+from datetime import datetime, timedelta
+import pytest
+from fastapi import APIRouter, FastAPI
+from fastapi.testclient import TestClient
+from app.core.security import create_access_token
+from app.models.idempotency import IdempotencyKey
+from app.utils import idempotency
+from app.utils.idempotency import IDEMPOTENCY_LEASE_SECONDS, IdempotentRoute
+
+
+@pytest.fixture
+def client(db):
+    """App with one idempotent route that counts how often it runs"""
+    router = APIRouter(route_class=IdempotentRoute)
+    calls = []
+
+    @router.post("/charge")
+    def charge():
+        calls.append(1)
+        return {"call": len(calls)}
+
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+def headers(user_id: int, key: str = "key-1", login: int = 1) -> dict:
+    token = create_access_token({"sub": str(user_id), "login": login})
+    return {"Authorization": f"Bearer {token}", "Idempotency-Key": key}
+
+
+def test_key_is_scoped_to_the_user_not_the_token(client):
+    first = client.post("/charge", json={}, headers=headers(1))
+    # A new token of the same user, as after logging in again
+    retry = client.post("/charge", json={}, headers=headers(1, login=2))
+    other_user = client.post("/charge", json={}, headers=headers(2))
+
+    assert first.json() == {"call": 1}
+    assert retry.json() == {"call": 1}
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert other_user.json() == {"call": 2}
+
+
+def test_requests_without_valid_token_are_not_stored(client, db):
+    client.post("/charge", json={}, headers={"Idempotency-Key": "key-1"})
+    client.post(
+        "/charge",
+        json={},
+        headers={"Authorization": "Bearer invalid", "Idempotency-Key": "key-1"},
+    )
+
+    assert db.query(IdempotencyKey).count() == 0
+
+
+def test_abandoned_claim_is_taken_over_after_the_lease(client, db, monkeypatch):
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_WAIT_SECONDS", 0)
+    now = datetime.utcnow()
+    for key, age in (("stale", IDEMPOTENCY_LEASE_SECONDS + 1), ("fresh", 0)):
+        db.add(
+            IdempotencyKey(
+                owner="1",
+                scope="POST /charge",
+                key=key,
+                request_hash=hashlib.sha256(b"{}").hexdigest(),
+                created_at=now - timedelta(seconds=age),
+                expires_at=now + timedelta(hours=1),
+            )
+        )
+    db.commit()
+
+    taken_over = client.post("/charge", json={}, headers=headers(1, "stale"))
+    in_progress = client.post("/charge", json={}, headers=headers(1, "fresh"))
+
+    assert taken_over.json() == {"call": 1}
+    assert in_progress.status_code == 409
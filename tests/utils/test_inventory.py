@@ -0,0 +1,190 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import func, select
+from app.db.database import SessionLocal
+from app.models.order import (
+    Order,
+    OrderStatus,
+    PaymentMethod,
+    PaymentStatus,
+    StockReservation,
+)
+from app.models.product import Product, ProductStockShard
+from app.utils.inventory import (
+    InsufficientStockError,
+    pop_sharded_stock,
+    rebalance_stock_shards,
+    reserve_stock,
+    set_stock,
+)
+from app.utils.order_lifecycle import expire_pending_orders
+
+THREADS = 12
+
+
+def place_order(user_id: int, number: str, lines) -> bool:
+    """Create an order and reserve its lines in one transaction"""
+    with SessionLocal() as db:
+        order = Order(
+            user_id=user_id,
+            order_number=number,
+            total_amount=0,
+            status=OrderStatus.PENDING,
+            payment_status=PaymentStatus.PENDING,
+            payment_method=PaymentMethod.CREDIT_CARD,
+            is_active=True,
+        )
+        db.add(order)
+        db.flush()
+        try:
+            reserve_stock(db, order.id, lines)
+        except InsufficientStockError:
+            db.rollback()
+            return False
+        db.commit()
+        return True
+
+
+def hammer(user_id: int, attempts: int, lines_for) -> int:
+    """Place orders from THREADS threads released at once, returns successes"""
+    barrier = threading.Barrier(THREADS)
+
+    def worker(thread_no: int) -> int:
+        barrier.wait()
+        return sum(
+            place_order(user_id, f"T{thread_no}-{i}", lines_for(thread_no))
+            for i in range(attempts)
+        )
+
+    with ThreadPoolExecutor(THREADS) as pool:
+        return sum(pool.map(worker, range(THREADS)))
+
+
+def reserved_quantity(db, product_id: int) -> int:
+    return db.execute(
+        select(func.coalesce(func.sum(StockReservation.quantity), 0)).where(
+            StockReservation.product_id == product_id
+        )
+    ).scalar()
+
+
+def test_concurrent_orders_never_oversell_one_sku(db, user, make_product):
+    product = make_product(stock=50)
+
+    placed = hammer(user.id, 10, lambda thread_no: [(product.id, None, 1)])
+
+    db.expire_all()
+    assert placed == 50
+    assert db.get(Product, product.id).stock == 0
+    assert reserved_quantity(db, product.id) == 50
+
+
+def test_multi_line_orders_in_opposite_order_do_not_deadlock(db, user, make_product):
+    first, second = make_product(stock=30), make_product(stock=30)
+
+    def lines_for(thread_no: int):
+        lines = [(first.id, None, 2), (second.id, None, 1)]
+        return lines if thread_no % 2 else lines[::-1]
+
+    placed = hammer(user.id, 5, lines_for)
+
+    db.expire_all()
+    assert placed == 15
+    assert db.get(Product, first.id).stock == 0
+    assert db.get(Product, second.id).stock == 15
+
+
+def test_failed_reservation_takes_nothing(db, user, make_product):
+    product, scarce = make_product(stock=5), make_product(stock=1)
+
+    assert not place_order(user.id, "N1", [(product.id, None, 2), (scarce.id, None, 2)])
+
+    db.expire_all()
+    assert db.get(Product, product.id).stock == 5
+    assert reserved_quantity(db, product.id) == 0
+
+
+def test_expiry_is_disabled_by_default(db, user, make_product):
+    product = make_product(stock=5)
+    place_order(user.id, "N1", [(product.id, None, 2)])
+    db.query(Order).update({"created_at": datetime.utcnow() - timedelta(days=1)})
+    db.commit()
+
+    assert expire_pending_orders(db) == 0
+
+
+def test_expiry_releases_only_online_orders_holding_stock(
+    db, user, make_product, make_order
+):
+    product = make_product(stock=5)
+    place_order(user.id, "CARD", [(product.id, None, 2)])
+    bank = make_order(payment_method=PaymentMethod.BANK_TRANSFER)
+    reserve_stock(db, bank.id, [(product.id, None, 1)])
+    db.commit()
+    unreserved = make_order()
+    db.query(Order).update({"created_at": datetime.utcnow() - timedelta(hours=1)})
+    db.commit()
+
+    assert expire_pending_orders(db, ttl_minutes=30) == 1
+
+    db.expire_all()
+    statuses = {order.order_number: order.status for order in db.query(Order)}
+    assert statuses["CARD"] == OrderStatus.CANCELLED
+    assert statuses[bank.order_number] == OrderStatus.PENDING
+    assert statuses[unreserved.order_number] == OrderStatus.PENDING
+    assert db.get(Product, product.id).stock == 4
+
+
+def shard_stock(db, product_id: int) -> list:
+    return (
+        db.execute(
+            select(ProductStockShard.stock)
+            .where(ProductStockShard.product_id == product_id)
+            .order_by(ProductStockShard.shard_no)
+        )
+        .scalars()
+        .all()
+    )
+
+
+def test_available_stock_includes_shards(db, make_product):
+    product = make_product(stock=10)
+    rebalance_stock_shards(db, product.id, 4)
+    db.commit()
+    db.query(Product).filter(Product.id == product.id).update({"stock": 3})
+    db.commit()
+
+    db.expire_all()
+    assert shard_stock(db, product.id) == [3, 3, 2, 2]
+    assert db.get(Product, product.id).available_stock == 13
+
+
+def test_set_stock_replaces_sharded_stock(db, make_product):
+    sharded, plain = make_product(stock=10), make_product(stock=10)
+    rebalance_stock_shards(db, sharded.id, 4)
+    db.commit()
+
+    set_stock(db, sharded.id, 5)
+    set_stock(db, plain.id, 5)
+    db.commit()
+
+    db.expire_all()
+    assert shard_stock(db, sharded.id) == [2, 1, 1, 1]
+    assert db.get(Product, sharded.id).stock == 0
+    assert db.get(Product, sharded.id).available_stock == 5
+    assert db.get(Product, plain.id).stock == 5
+
+
+def test_pop_sharded_stock_leaves_other_updates(db, make_product):
+    sharded, plain = make_product(stock=10), make_product(stock=10)
+    rebalance_stock_shards(db, sharded.id, 2)
+    db.commit()
+    updates = [
+        {"sku": sharded.sku, "stock": 4, "price": None},
+        {"sku": plain.sku, "stock": 6, "price": None},
+        {"sku": sharded.sku, "stock": 7, "price": None},
+    ]
+
+    assert pop_sharded_stock(db, updates) == {sharded.id: 7}
+    assert [update["stock"] for update in updates] == [None, 6, None]
@@ -0,0 +1,69 @@
+from collections import defaultdict
+import pytest
+from sqlalchemy import text
+from app.core import events
+from app.db.database import SessionLocal
+from app.models.outbox import OutboxEvent
+from app.utils.outbox import dispatch_outbox, enqueue_event
+
+
+@pytest.fixture
+def subscribers(monkeypatch):
+    """Empty handler registry for the test"""
+    monkeypatch.setattr(events, "_handlers", defaultdict(list))
+    return events
+
+
+def test_events_are_written_in_the_callers_transaction(db, subscribers):
+    enqueue_event(db, "order.created", {"order_id": 1})
+    db.rollback()
+    enqueue_event(db, "order.created", {"order_id": 2})
+    db.commit()
+
+    assert [event.payload for event in db.query(OutboxEvent)] == [{"order_id": 2}]
+
+
+def test_delivered_events_are_deleted(db, subscribers):
+    received = []
+    subscribers.subscribe(
+        "order.created", lambda event, payload: received.append(payload)
+    )
+    enqueue_event(db, "order.created", {"order_id": 1})
+    db.commit()
+
+    assert dispatch_outbox(db) == 1
+    assert received == [{"order_id": 1}]
+    assert db.query(OutboxEvent).count() == 0
+
+
+def test_failed_events_are_pushed_back(db, subscribers):
+    def failing(event, payload):
+        raise RuntimeError("unavailable")
+
+    subscribers.subscribe("order.created", failing)
+    enqueue_event(db, "order.created", {"order_id": 1})
+    db.commit()
+
+    assert dispatch_outbox(db) == 0
+    event = db.query(OutboxEvent).one()
+    assert (event.attempts, event.last_error) == (1, "unavailable")
+    assert dispatch_outbox(db) == 0
+
+
+def test_handlers_run_without_row_locks(db, subscribers):
+    locked = []
+
+    def handler(event, payload):
+        # Another transaction can lock the claimed row while the handler runs
+        with SessionLocal() as other:
+            other.execute(text("SET lock_timeout = '1s'"))
+            locked.append(
+                other.execute(text("SELECT id FROM outbox FOR UPDATE NOWAIT")).scalar()
+            )
+
+    subscribers.subscribe("order.created", handler)
+    enqueue_event(db, "order.created", {"order_id": 1})
+    db.commit()
+
+    assert dispatch_outbox(db) == 1
+    assert locked and locked[0] is not None
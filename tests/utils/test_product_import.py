@@ -0,0 +1,52 @@
+import io
+import json
+import pytest
+from app.utils.product_import import import_products
+
+HEADER = b"name,slug,sku,price,category_id,brand_id\n"
+
+
+@pytest.fixture
+def row(make_product):
+    """Encoded import row of a new product in CSV or JSONL"""
+    product = make_product()
+
+    def row(fmt: str, sku: str) -> bytes:
+        record = {
+            "name": sku,
+            "slug": sku.lower(),
+            "sku": sku,
+            "price": 10,
+            "category_id": product.category_id,
+            "brand_id": product.brand_id,
+        }
+        if fmt == "csv":
+            return (",".join(str(value) for value in record.values()) + "\n").encode()
+        return json.dumps(record).encode() + b"\n"
+
+    return row
+
+
+@pytest.mark.parametrize("fmt", ["csv", "jsonl"])
+def test_invalid_utf8_only_fails_its_row(db, row, fmt):
+    content = row(fmt, "IMPORT-1") + b"\xff\xfe broken\n" + row(fmt, "IMPORT-2")
+    if fmt == "csv":
+        content = HEADER + content
+
+    report = import_products(db, io.BytesIO(content), fmt).to_dict()
+
+    assert (report["created"], report["failed"]) == (2, 1)
+    assert report["errors"][0]["row"] == (3 if fmt == "csv" else 2)
+    assert "not valid UTF-8" in report["errors"][0]["errors"][0]
+
+
+def test_unparsable_csv_keeps_earlier_rows_and_reports_where_it_stopped(db, row):
+    # Fields larger than csv.field_size_limit() stop the reader
+    huge = b'"' + b"x" * 200_000 + b'",x,x,1,1,1\n'
+    content = HEADER + row("csv", "IMPORT-1") + huge + row("csv", "IMPORT-2")
+
+    report = import_products(db, io.BytesIO(content), "csv").to_dict()
+
+    assert (report["created"], report["failed"]) == (1, 1)
+    assert report["errors"][0]["row"] == 3
+    assert "cannot be read" in report["errors"][0]["errors"][0]
@@ -0,0 +1,47 @@
+from decimal import Decimal
+from app.models.promotion import Promotion, PromotionType
+from app.utils.promotions import (
+    AppliedPromotion,
+    redeem_promotions,
+    release_promotions,
+)
+
+
+def make_promotion(db, usage_limit=None):
+    promotion = Promotion(
+        name=f"Promotion {usage_limit}",
+        type=PromotionType.AMOUNT_OFF,
+        value=Decimal("1.00"),
+        usage_limit=usage_limit,
+    )
+    db.add(promotion)
+    db.commit()
+    return promotion
+
+
+def applied(promotion):
+    return AppliedPromotion(
+        promotion_id=promotion.id,
+        name=promotion.name,
+        code=None,
+        amount=Decimal("1.00"),
+        has_usage_limit=promotion.usage_limit is not None,
+    )
+
+
+def test_only_counted_uses_are_released_once(db, make_order):
+    limited, unlimited = make_promotion(db, usage_limit=10), make_promotion(db)
+    order = make_order()
+    redeem_promotions(db, order.id, [applied(limited), applied(unlimited)])
+    db.commit()
+    # Limited after the order was placed, its use was never counted
+    unlimited.usage_limit = 10
+    unlimited.used_count = 3
+    db.commit()
+
+    release_promotions(db, [order.id])
+    release_promotions(db, [order.id])
+    db.commit()
+
+    db.expire_all()
+    assert (limited.used_count, unlimited.used_count) == (0, 3)
@@ -0,0 +1,22 @@
+from app.models.product import ProductReview, ReviewHelpfulVote
+from app.utils.vote_buffer import HELPFUL_VOTE_MAX_ATTEMPTS, HelpfulVoteBuffer
+
+
+def test_failing_vote_does_not_hold_back_the_batch(db, user, make_product):
+    review = ProductReview(product_id=make_product().id, user_id=user.id, rating=5)
+    db.add(review)
+    db.commit()
+    buffer = HelpfulVoteBuffer()
+    buffer.add(review.id, user.id)
+    # The review does not exist, as if it was deleted meanwhile
+    buffer.add(review.id + 1, user.id)
+
+    assert buffer.flush(db) == 1
+    db.expire_all()
+    assert review.helpful_votes == 1
+    assert db.query(ReviewHelpfulVote).count() == 1
+
+    for _ in range(HELPFUL_VOTE_MAX_ATTEMPTS - 1):
+        assert buffer.pending_count == 1
+        assert buffer.flush(db) == 0
+    assert buffer.pending_count == 0